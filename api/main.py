@@ -4,44 +4,85 @@ FastAPI-сервис AI: один эндпоинт чата.
 """
 import sys
 import threading
+import time
 from pathlib import Path
 
+_import_started = time.perf_counter()
+
 root = Path(__file__).resolve().parent.parent
 if str(root) not in sys.path:
     sys.path.insert(0, str(root))
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from api.schemas import ChatRequest, ChatResponse, ProductOut
-from chat.chat_engine import run_chat
+from api.schemas import ChatBatchRequest, ChatBatchResponse, ChatRequest, ChatResponse, ProductOut
+from chat.pipeline import ChatOverloaded, pipeline_stats, run_chat_async, run_chat_batch_async, shutdown_executor
+from config import CHAT_BATCH_MAX_QUERIES
+from observability.metrics import CONTENT_TYPE, embed_batcher_stats, render_metrics
+from observability.timing import server_timing, span, trace
+from chat.response_cache import get_response_cache, response_key
+from data_access.categories_loader import CategoryRefresher
+from data_access.db import dispose_engines, pool_stats
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+_IMPORT_SECONDS = time.perf_counter() - _import_started
 
 
 def _build_index_in_background() -> None:
-    """Строит индекс в фоне (для Render: DATABASE_URL доступен только в runtime)."""
+    """Строит индекс в фоне (для Render: DATABASE_URL доступен только в runtime), затем прогревает поиск."""
+    from retrieval.warmup import get_warmup_state
+    state = get_warmup_state()
+    state.set_status("index", "building")
     try:
         from index.build_index import build
         build()
     except Exception as e:
         logger.exception("Background index build failed: %s", e)
+        state.set_status("index", "failed", error=str(e))
+        return
+    _warm_up_in_background()
+
+
+def _warm_up_in_background() -> None:
+    """Загружает категории, индекс и модель и гоняет пробные запросы до первого /chat."""
+    try:
+        from retrieval.warmup import warm_up
+        warm_up()
+    except Exception as e:
+        logger.exception("Search runtime warm-up failed: %s", e)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logger.info("AI_pospro service starting")
-    from config import META_PATH, FAISS_INDEX_PATH, INDEX_DIR
-    from index.faiss_store import VECTORS_NPY_PATH
-    index_exists = META_PATH.exists() and (FAISS_INDEX_PATH.exists() or VECTORS_NPY_PATH.exists())
-    if not index_exists:
+    logger.info("AI_pospro service starting (modules imported in %.2fs)", _IMPORT_SECONDS)
+    from index.versions import index_available
+    from retrieval.live_stock import StockRefresher
+    from retrieval.runtime import IndexWatcher
+    if not index_available():
         logger.info("Index not found, building in background (may take ~10 min)")
-        t = threading.Thread(target=_build_index_in_background, daemon=True)
-        t.start()
+        threading.Thread(target=_build_index_in_background, name="index-build", daemon=True).start()
+    else:
+        threading.Thread(target=_warm_up_in_background, name="warm-up", daemon=True).start()
+    refresher = CategoryRefresher()
+    refresher.start()
+    # Новые версии индекса (сборка в другом процессе или по расписанию) подхватываются без перезапуска
+    watcher = IndexWatcher()
+    watcher.start()
+    # Цены, остатки и видимость между сборками — без пересчёта векторов
+    stock_refresher = StockRefresher()
+    stock_refresher.start()
     yield
+    stock_refresher.stop()
+    watcher.stop()
+    refresher.stop()
+    shutdown_executor()
+    dispose_engines()
     logger.info("AI_pospro service shutting down")
 
 
@@ -60,27 +101,116 @@ app.add_middleware(
 )
 
 
+def _index_info() -> dict | None:
+    from retrieval.runtime import get_runtime
+    snap = get_runtime().current()
+    if snap is None:
+        return None
+    return {"version": snap.index_version, "snapshot": snap.version, "size": snap.size}
+
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    from retrieval.warmup import get_warmup_state
+    cache = get_response_cache()
+    return {
+        "status": "ok",
+        "ready": get_warmup_state().ready,
+        "index": _index_info(),
+        "pipeline": pipeline_stats(),
+        "db": pool_stats(),
+        "response_cache": cache.stats() if cache is not None else None,
+        "embed_batcher": embed_batcher_stats(),
+    }
+
+
+@app.get("/ready")
+def ready():
+    """
+    Готовность к трафику: 200 — индекс и модель загружены и прогреты пробными запросами,
+    503 — ещё грузится (в теле — статус и длительность каждой фазы). /health — только «процесс жив».
+    """
+    from retrieval.warmup import get_warmup_state
+    stats = get_warmup_state().stats()
+    return JSONResponse(stats, status_code=200 if stats["ready"] else 503)
+
+
+def _cache_versions() -> tuple[int, int]:
+    """(версия снимка индекса, версия снимка категорий) — часть ключа кэша ответов."""
+    from data_access.categories_loader import current_category_version
+    from retrieval.runtime import get_runtime
+    snap = get_runtime().snapshot()
+    return (snap.version if snap is not None else 0, current_category_version())
 
 
 @app.post("/chat", response_model=ChatResponse)
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest):
     """
     Запрос к ИИ: подбор товаров по смыслу + фильтры.
     Возвращает текст ответа, список товаров (id, name, price, url, image_url, score) и опционально уточняющий вопрос.
+    Повторный запрос с теми же текстом и фильтрами отдаётся из кэша готовым JSON (заголовок X-Cache: hit).
+    Заголовок Server-Timing — длительность этапов этого запроса, мс.
+    503 — сервис перегружен, 504 — запрос не уложился в AI_CHAT_TIMEOUT.
     """
-    result = run_chat(
-        request.query,
-        price_min=request.price_min,
-        price_max=request.price_max,
-        category_id=request.category_id,
-        brand_id=request.brand_id,
-        in_stock_only=request.in_stock_only,
-    )
-    return ChatResponse(
-        message=result["message"],
-        products=[ProductOut(**p) for p in result["products"]],
-        clarifying_question=result.get("clarifying_question"),
+    filters = {
+        "price_min": request.price_min,
+        "price_max": request.price_max,
+        "category_id": request.category_id,
+        "brand_id": request.brand_id,
+        "in_stock_only": request.in_stock_only,
+    }
+    with trace() as stages, span("total"):
+        body = None
+        cache = get_response_cache()
+        if cache is not None:
+            key = response_key(request.query, filters)
+            versions = await asyncio.to_thread(_cache_versions)
+            body = cache.get(key, versions)
+        hit = body is not None
+        if not hit:
+            try:
+                result = await run_chat_async(request.query, **filters)
+            except ChatOverloaded:
+                raise HTTPException(status_code=503, detail="Сервис перегружен, повторите запрос позже")
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504, detail="Превышено время обработки запроса")
+            body = ChatResponse(
+                message=result["message"],
+                products=[ProductOut(**p) for p in result["products"]],
+                clarifying_question=result.get("clarifying_question"),
+            ).model_dump_json().encode("utf-8")
+            if cache is not None:
+                cache.put(key, versions, body)
+    # Разбивка по этапам этого запроса (budget, embed, vector_search, rerank, llm, ...) — видна в DevTools
+    headers = {"X-Cache": "hit" if hit else "miss", "Server-Timing": server_timing(stages)}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/metrics")
+def metrics():
+    """Метрики в текстовом формате Prometheus: гистограммы этапов, состояние индекса, кэшей и очереди."""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+
+@app.post("/chat/batch", response_model=ChatBatchResponse)
+async def chat_batch(request: ChatBatchRequest):
+    """
+    Пакет запросов (офлайн-оценка, прогрев кэшей): все запросы кодируются одним вызовом модели,
+    поиск идёт по одному снимку индекса. Ответы — в порядке запросов, плюс сводка по времени.
+    Кэш ответов не используется. 413 — больше AI_CHAT_BATCH_MAX_QUERIES запросов.
+    """
+    if len(request.items) > CHAT_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"Не больше {CHAT_BATCH_MAX_QUERIES} запросов в пакете")
+    items = [item.model_dump() for item in request.items]
+    results, timing = await run_chat_batch_async(items, request.workers)
+    return ChatBatchResponse(
+        results=[
+            ChatResponse(
+                message=r["message"],
+                products=[ProductOut(**p) for p in r["products"]],
+                clarifying_question=r.get("clarifying_question"),
+            )
+            for r in results
+        ],
+        timing=timing,
     )
@@ -30,3 +30,25 @@ class ChatResponse(BaseModel):
     message: str = Field(..., description="Текстовый ответ")
     products: List[ProductOut] = Field(default_factory=list, description="Рекомендованные товары")
     clarifying_question: str | None = Field(None, description="Уточняющий вопрос при необходимости")
+
+
+class ChatBatchRequest(BaseModel):
+    """Пакет запросов к чату: ответы возвращаются в том же порядке."""
+    items: List[ChatRequest] = Field(..., min_length=1, description="Запросы с фильтрами")
+    workers: int | None = Field(None, ge=1, le=64, description="Потоков поиска (по умолчанию AI_BATCH_WORKERS)")
+
+
+class ChatBatchTiming(BaseModel):
+    """Сводка по времени пакета, миллисекунды."""
+    queries: int
+    workers: int
+    prepare_ms: float
+    retrieve_ms: float
+    finalize_ms: float
+    total_ms: float
+    per_query_ms: float
+
+
+class ChatBatchResponse(BaseModel):
+    results: List[ChatResponse] = Field(default_factory=list, description="Ответы в порядке запросов")
+    timing: ChatBatchTiming
@@ -0,0 +1,90 @@
+"""
+Харнесс ANN-бэкендов: recall@k относительно точного flat-индекса, латентность поиска и время сборки.
+Бэкенды faiss (hnsw, ivf_flat, ivf_pq) проверяются, только если установлен faiss-cpu.
+Запуск из корня AI_pospro: python -m benchmarks.bench_ann [--products 50000] [--backends kmeans,hnsw]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+import numpy as np
+
+from benchmarks.synthetic import clustered_vectors, noisy_queries
+from index.faiss_store import BACKENDS, HAS_FAISS, apply_search_params, add_vectors, describe_index, search
+from index.numpy_index import KMeansIndex
+
+
+def _measure(index, queries: np.ndarray, truth: list[set[int]], k: int, rows: np.ndarray | None = None) -> dict:
+    times, hits = [], 0
+    for q, want in zip(queries, truth):
+        t0 = time.perf_counter()
+        _, got = search(index, q, k, rows=rows)
+        times.append((time.perf_counter() - t0) * 1000)
+        hits += len(want & set(np.asarray(got).tolist()))
+    times.sort()
+    return {
+        "recall": hits / max(1, sum(len(t) for t in truth)),
+        "p50_ms": times[len(times) // 2],
+        "p95_ms": times[int(len(times) * 0.95)],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--nprobe", default="1,4,8,16,32", help="значения nprobe для ivf/kmeans")
+    parser.add_argument("--ef-search", default="16,32,64,128", help="значения efSearch для hnsw")
+    parser.add_argument("--filtered-share", type=float, default=0.3, help="доля строк, проходящих фильтр")
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.products, args.dim)
+    queries = noisy_queries(vectors, args.queries)
+    meta = [{}] * len(vectors)
+    rows = np.flatnonzero(np.random.default_rng(2).random(len(vectors)) < args.filtered_share)
+
+    flat = add_vectors(vectors, meta, backend="flat")
+    truth = [set(search(flat, q, args.k)[1].tolist()) for q in queries]
+    truth_rows = [set(search(flat, q, args.k, rows=rows)[1].tolist()) for q in queries]
+
+    print(f"products={args.products} dim={args.dim} k={args.k} faiss={'yes' if HAS_FAISS else 'no'}")
+    print(f"{'backend':<10}{'build, s':>10}{'recall@k':>10}{'p50, ms':>9}{'p95, ms':>9}{'filt. recall':>14}{'filt. p50':>11}  params")
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        if backend in ("hnsw", "ivf_flat", "ivf_pq") and not HAS_FAISS:
+            print(f"{backend:<10}  skipped (faiss not installed)")
+            continue
+        t0 = time.perf_counter()
+        index = add_vectors(vectors, meta, backend=backend)
+        build_s = time.perf_counter() - t0
+        for search_params in _sweep(backend, args):
+            if isinstance(index, KMeansIndex):
+                index.nprobe = search_params.get("nprobe", index.nprobe)
+            elif search_params:
+                apply_search_params(index, search_params)
+            full = _measure(index, queries, truth, args.k)
+            filt = _measure(index, queries, truth_rows, args.k, rows=rows)
+            print(
+                f"{backend:<10}{build_s:>10.2f}{full['recall']:>10.4f}{full['p50_ms']:>9.2f}{full['p95_ms']:>9.2f}"
+                f"{filt['recall']:>14.4f}{filt['p50_ms']:>11.2f}  {describe_index(index)}"
+            )
+
+
+def _sweep(backend: str, args) -> list[dict]:
+    """Наборы параметров поиска для одного построенного индекса."""
+    if backend in ("kmeans", "ivf_flat", "ivf_pq"):
+        return [{"nprobe": int(v)} for v in args.nprobe.split(",")]
+    if backend == "hnsw":
+        return [{"efSearch": int(v)} for v in args.ef_search.split(",")]
+    return [{}]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Бенчмарк загрузки каталога: прежняя схема (товары, затем изображения и характеристики запросами
+с IN-списком всех id) против одного запроса с агрегацией по товару (iter_catalog).
+По умолчанию генерирует каталог в SQLite; --url — замер на существующей БД (например, копии PostgreSQL).
+Запуск из корня AI_pospro: python -m benchmarks.bench_catalog_query [--products 50000]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from sqlalchemy import create_engine, text
+
+from data_access.catalog_loader import _catalog_item, iter_catalog
+
+_SCHEMA = [
+    "CREATE TABLE category (id INTEGER PRIMARY KEY, name TEXT, slug TEXT, parent_id INTEGER, \"order\" INTEGER)",
+    "CREATE TABLE brand (id INTEGER PRIMARY KEY, name TEXT)",
+    """CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, description TEXT, price NUMERIC, quantity INTEGER,
+       slug TEXT, category_id INTEGER, brand_id INTEGER, is_visible BOOLEAN, is_draft BOOLEAN)""",
+    "CREATE TABLE product_media (id INTEGER PRIMARY KEY, product_id INTEGER, url TEXT, media_type TEXT, \"order\" INTEGER)",
+    "CREATE INDEX ix_media_product ON product_media (product_id)",
+    "CREATE TABLE characteristics_list (id INTEGER PRIMARY KEY, characteristic_key TEXT)",
+    """CREATE TABLE product_characteristic (id INTEGER PRIMARY KEY, product_id INTEGER, key TEXT, value TEXT,
+       sort_order INTEGER)""",
+    "CREATE INDEX ix_char_product ON product_characteristic (product_id)",
+]
+
+
+def _generate(engine, n: int, media: int, specs: int, seed: int = 0) -> None:
+    rnd = random.Random(seed)
+    with engine.begin() as conn:
+        for ddl in _SCHEMA:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO category VALUES (:id, :name, :slug, NULL, :id)"),
+                     [{"id": i, "name": f"Категория {i}", "slug": f"c{i}"} for i in range(1, 401)])
+        conn.execute(text("INSERT INTO brand VALUES (:id, :name)"),
+                     [{"id": i, "name": f"Бренд {i}"} for i in range(1, 121)])
+        conn.execute(text("INSERT INTO characteristics_list VALUES (:id, :key)"),
+                     [{"id": i, "key": f"Параметр {i}"} for i in range(1, 201)])
+        conn.execute(
+            text("INSERT INTO product VALUES (:id, :name, :descr, :price, :qty, :slug, :cat, :brand, 1, 0)"),
+            [
+                {"id": i, "name": f"Товар {i}", "descr": "Описание товара " * 5, "price": rnd.randint(1_000, 3_000_000),
+                 "qty": rnd.randint(0, 30), "slug": f"p{i}", "cat": rnd.randint(1, 400), "brand": rnd.randint(1, 120)}
+                for i in range(1, n + 1)
+            ],
+        )
+        conn.execute(
+            text("INSERT INTO product_media (product_id, url, media_type, \"order\") VALUES (:pid, :url, 'image', :o)"),
+            [{"pid": i, "url": f"/img/{i}_{o}.jpg", "o": o} for i in range(1, n + 1) for o in range(media)],
+        )
+        conn.execute(
+            text("INSERT INTO product_characteristic (product_id, key, value, sort_order) VALUES (:pid, :key, :v, :o)"),
+            [{"pid": i, "key": str(rnd.randint(1, 200)), "v": f"значение {o}", "o": o}
+             for i in range(1, n + 1) for o in range(specs)],
+        )
+
+
+def _legacy_catalog(engine) -> list[dict]:
+    """Прежняя загрузка: три запроса, id всех товаров вклеены в текст SQL."""
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT p.id, p.name, p.description, p.price, p.quantity, p.slug, p.category_id, p.brand_id,
+                   c.name AS category_name, b.name AS brand_name
+            FROM product p
+            LEFT JOIN category c ON p.category_id = c.id
+            LEFT JOIN brand b ON p.brand_id = b.id
+            WHERE p.is_visible = true AND (p.is_draft = false OR p.is_draft IS NULL)
+            ORDER BY p.id
+        """)).fetchall()
+    ids = ",".join(str(r.id) for r in rows)
+    with engine.connect() as conn:
+        media_rows = conn.execute(text(f"""
+            SELECT product_id, url FROM product_media
+            WHERE product_id IN ({ids}) AND media_type = 'image'
+            ORDER BY product_id, "order"
+        """)).fetchall()
+    image_by_id: dict[int, str] = {}
+    for r in media_rows:
+        image_by_id.setdefault(r.product_id, r.url)
+    with engine.connect() as conn:
+        char_rows = conn.execute(text(f"""
+            SELECT pc.product_id, cl.characteristic_key, pc.value
+            FROM product_characteristic pc
+            LEFT JOIN characteristics_list cl ON CAST(cl.id AS TEXT) = pc.key
+            WHERE pc.product_id IN ({ids})
+            ORDER BY pc.product_id, pc.sort_order
+        """)).fetchall()
+    specs_by_id: dict[int, list[str]] = {}
+    for r in char_rows:
+        specs_by_id.setdefault(r.product_id, []).append(f"{r.characteristic_key}: {r.value}")
+    return [_catalog_item(r, image_by_id.get(r.id), specs_by_id.get(r.id, [])) for r in rows]
+
+
+def _timed(fn) -> tuple[float, list]:
+    t0 = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - t0) * 1000, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--media", type=int, default=3)
+    parser.add_argument("--specs", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--url", help="существующая БД вместо сгенерированного SQLite")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            engine = create_engine(args.url)
+        else:
+            engine = create_engine(f"sqlite:///{Path(tmp) / 'catalog.db'}")
+            t_gen, _ = _timed(lambda: _generate(engine, args.products, args.media, args.specs))
+            print(f"generated {args.products} products in {t_gen / 1000:.1f}s")
+
+        legacy, single = [], []
+        for _ in range(args.repeat):
+            t, old = _timed(lambda: _legacy_catalog(engine))
+            legacy.append(t)
+            t, new = _timed(lambda: list(iter_catalog(engine)))
+            single.append(t)
+        if not args.url:
+            # Прежние запросы не учитывают NULL в "order" / sort_order — сверяем только на сгенерированных данных
+            assert old == new, "catalogs differ"
+        print(f"dialect={engine.dialect.name} products={len(new)}")
+        print(f"{'loader':<24}{'median, ms':>12}")
+        print(f"{'legacy IN-lists (3 q)':<24}{sorted(legacy)[len(legacy) // 2]:>12.1f}")
+        print(f"{'single query':<24}{sorted(single)[len(single) // 2]:>12.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
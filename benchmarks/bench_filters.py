@@ -0,0 +1,73 @@
+"""
+Бенчмарк фильтрации кандидатов: список dict (apply_filters по meta) против колонок MetaColumns.
+Запуск из корня AI_pospro: python -m benchmarks.bench_filters [--products 50000] [--candidates 1500]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from retrieval.filters import apply_filters
+from retrieval.meta_columns import MetaColumns
+
+
+def _make_meta(n: int, seed: int = 0) -> list[dict]:
+    rnd = random.Random(seed)
+    return [
+        {
+            "product_id": i + 1,
+            "name": f"Товар {i}",
+            "price": float(rnd.randint(1_000, 3_000_000)),
+            "quantity": rnd.choice([0, 0, rnd.randint(1, 30)]),
+            "category_id": rnd.randint(1, 400),
+            "brand_id": rnd.randint(1, 120),
+        }
+        for i in range(n)
+    ]
+
+
+def _bench(fn, repeat: int) -> float:
+    """Медиана времени одного вызова, мс."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--candidates", type=int, default=1500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    meta = _make_meta(args.products)
+    columns = MetaColumns.from_meta(meta)
+    rnd = random.Random(1)
+    indices = rnd.sample(range(args.products), min(args.candidates, args.products))
+    scores = sorted((rnd.random() for _ in indices), reverse=True)
+    filter_sets = {
+        "price": {"price_min": 100_000, "price_max": 900_000},
+        "category_branch": {"category_ids": list(range(1, 40))},
+        "brand_stock": {"brand_id": 7, "in_stock_only": True},
+        "all": {"price_max": 1_500_000, "category_ids": list(range(1, 80)), "in_stock_only": True},
+    }
+    print(f"products={args.products} candidates={len(indices)}")
+    print(f"{'filters':<16}{'dicts, ms':>12}{'columns, ms':>14}{'speedup':>10}")
+    for name, filters in filter_sets.items():
+        assert apply_filters(meta, indices, scores, **filters) == apply_filters(columns, indices, scores, **filters)
+        t_dict = _bench(lambda: apply_filters(meta, indices, scores, **filters), args.repeat)
+        t_cols = _bench(lambda: apply_filters(columns, indices, scores, **filters), args.repeat)
+        print(f"{name:<16}{t_dict:>12.3f}{t_cols:>14.3f}{t_dict / t_cols:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
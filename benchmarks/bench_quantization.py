@@ -0,0 +1,66 @@
+"""
+Сравнение хранения векторов numpy-индекса: float32 (эталон), float16 и int8 с пересчётом по float32.
+Печатает recall@k относительно float32, медиану/p95 латентности и объём матрицы, по которой идёт скан.
+Запуск из корня AI_pospro: python -m benchmarks.bench_quantization [--products 50000] [--dim 384]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from benchmarks.synthetic import clustered_vectors, noisy_queries
+from index.faiss_store import NumpyIndex, load_numpy_index, save_index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.products, args.dim)
+    queries = noisy_queries(vectors, args.queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        save_index(NumpyIndex(vectors), [{}] * len(vectors), directory=directory)
+        baseline = NumpyIndex(vectors)
+        truth = [set(baseline.search(q, args.k)[1].tolist()) for q in queries]
+        variants = [
+            ("float32", False),
+            ("float32", True),
+            ("float16", True),
+            ("int8", True),
+        ]
+        print(f"products={args.products} dim={args.dim} k={args.k} rescore_factor={args.rescore_factor}")
+        print(f"{'storage':<10}{'mmap':>6}{'recall@k':>10}{'p50, ms':>10}{'p95, ms':>10}{'scan, MB':>10}")
+        for storage, mmap in variants:
+            index = load_numpy_index(directory, storage=storage, mmap=mmap)
+            index.rescore_factor = args.rescore_factor
+            index.search(queries[0], args.k)  # прогрев страниц memmap
+            times, hits = [], 0
+            for q, want in zip(queries, truth):
+                t0 = time.perf_counter()
+                _, got = index.search(q, args.k)
+                times.append((time.perf_counter() - t0) * 1000)
+                hits += len(want & set(got.tolist()))
+            times.sort()
+            scanned = index.codes if index.codes is not None else index.vectors
+            print(
+                f"{storage:<10}{'yes' if mmap else 'no':>6}{hits / (args.k * len(queries)):>10.4f}"
+                f"{times[len(times) // 2]:>10.2f}{times[int(len(times) * 0.95)]:>10.2f}"
+                f"{scanned.nbytes / 2**20:>10.1f}"
+            )
+            del index, scanned
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Офлайн-набор бенчмарков всего поиска: без БД и без загрузки модели.
+Для каждого размера синтетического каталога и каждого бэкенда индекса: пропускная способность build,
+перцентили латентности search_products по набору фильтров и run_chat, объём индекса и пик RSS.
+Результаты пишутся в JSON (--out), --baseline сравнивает с прошлым прогоном.
+Запуск из корня AI_pospro: python -m benchmarks.bench_suite [--sizes 1000,50000,500000] [--backends flat,kmeans]
+"""
+import argparse
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from benchmarks.synthetic import HashingEmbedder, synthetic_catalog, synthetic_categories, synthetic_queries
+from chat.chat_engine import run_chat
+from config import FAISS_INDEX_PATH
+from data_access.categories_loader import get_descendant_ids, refresh_categories
+from index.build_index import build
+from index.embedding_store import EmbeddingStore
+from index.faiss_store import BACKENDS, HAS_FAISS, describe_index, load_index, load_numpy_index
+from index.lexical import LEXICAL_PATH, load_lexical
+from index.numpy_index import NumpyIndex
+from index.partitions import PARTITIONS_PATH, load_partitions
+from retrieval.runtime import SearchRuntime, set_runtime
+from retrieval.search import search_products
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RESULTS_DIR = _root / "benchmarks" / "results"
+
+
+def _load_categories_offline(categories: list[dict[str, Any]]) -> None:
+    """Снимок категорий из SQLite в памяти — тем же refresh_categories, что и в сервисе."""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE category (id INTEGER PRIMARY KEY, name TEXT, slug TEXT, parent_id INTEGER, "order" INTEGER)'))
+        conn.execute(
+            text('INSERT INTO category VALUES (:id, :name, :slug, :parent_id, :id)'),
+            categories,
+        )
+    refresh_categories(engine)
+    engine.dispose()
+
+
+def _filter_mixes(categories: list[dict[str, Any]]) -> dict[str, Callable[[int], dict[str, Any]]]:
+    """Наборы фильтров: i-й запрос получает i-й вариант (ветка, лист, бренд), чтобы прогоны были сравнимы."""
+    roots = [c["id"] for c in categories if c["parent_id"] is None]
+    parents = {c["parent_id"] for c in categories}
+    leaves = [c["id"] for c in categories if c["id"] not in parents]
+    branches = [get_descendant_ids(r) for r in roots]
+    return {
+        "none": lambda i: {},
+        "branch": lambda i: {"category_ids": branches[i % len(branches)]},
+        "leaf": lambda i: {"category_id": leaves[(i * 7) % len(leaves)]},
+        "price": lambda i: {"price_max": float((1 + i % 5) * 100_000)},
+        "brand_stock": lambda i: {"brand_id": 1 + i % 40, "in_stock_only": True},
+        "combined": lambda i: {
+            "category_ids": branches[i % len(branches)], "price_max": 500_000.0, "in_stock_only": True,
+        },
+    }
+
+
+def _percentiles(times_ms: list[float]) -> dict[str, float]:
+    t = np.asarray(times_ms)
+    return {
+        "count": len(times_ms),
+        "mean_ms": round(float(t.mean()), 3),
+        "p50_ms": round(float(np.percentile(t, 50)), 3),
+        "p95_ms": round(float(np.percentile(t, 95)), 3),
+        "p99_ms": round(float(np.percentile(t, 99)), 3),
+        "qps": round(1000.0 / float(t.mean()), 1) if t.mean() > 0 else None,
+    }
+
+
+def _timed(fn: Callable[[int], Any], count: int) -> list[float]:
+    out = []
+    for i in range(count):
+        t0 = time.perf_counter()
+        fn(i)
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def _nbytes(obj: Any, depth: int = 2) -> int:
+    """Объём numpy-массивов объекта (и вложенных объектов/словарей на depth уровней)."""
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if depth == 0:
+        return 0
+    if isinstance(obj, dict):
+        return sum(_nbytes(v, depth - 1) for v in obj.values())
+    if hasattr(obj, "__dict__"):
+        return sum(_nbytes(v, depth - 1) for v in vars(obj).values())
+    return 0
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux — килобайты, macOS — байты
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def _loader(directory: Path, storage: str):
+    def load():
+        index, meta = load_index(directory)
+        if storage != "float32" and isinstance(index, NumpyIndex):
+            index = load_numpy_index(directory, storage=storage)
+        return index, meta
+    return load
+
+
+def _measure(
+    directory: Path,
+    storage: str,
+    embedder,
+    queries: list[str],
+    chat_queries: list[str],
+    mixes: dict[str, Callable[[int], dict[str, Any]]],
+    top_k: int,
+) -> dict[str, Any]:
+    runtime = SearchRuntime(
+        loader=_loader(directory, storage),
+        embedder_factory=lambda: embedder,
+        partitions_loader=lambda: load_partitions(directory / PARTITIONS_PATH.name),
+        lexical_loader=lambda: load_lexical(directory / LEXICAL_PATH.name),
+    )
+    set_runtime(runtime)
+    t0 = time.perf_counter()
+    snap = runtime.snapshot()
+    load_s = time.perf_counter() - t0
+    search_products(queries[0], top_k=top_k)  # прогрев страниц memmap
+    search = {
+        name: _percentiles(_timed(lambda i: search_products(queries[i], top_k=top_k, **mix(i)), len(queries)))
+        for name, mix in mixes.items()
+    }
+    chat = _percentiles(_timed(lambda i: run_chat(chat_queries[i]), len(chat_queries)))
+    faiss_file = directory / FAISS_INDEX_PATH.name
+    index_bytes = _nbytes(snap.index) or (faiss_file.stat().st_size if faiss_file.exists() else 0)
+    return {
+        "params": describe_index(snap.index),
+        "load_s": round(load_s, 3),
+        "search": search,
+        "chat": chat,
+        "memory": {
+            "index_mb": round(index_bytes / 2**20, 2),
+            "columns_mb": round(_nbytes(snap.columns) / 2**20, 2),
+            "lexical_mb": round(_nbytes(snap.lexical, depth=3) / 2**20, 2),
+            "peak_rss_mb": _peak_rss_mb(),
+        },
+    }
+
+
+def run_suite(
+    sizes: list[int],
+    backends: list[str],
+    storages: list[str],
+    *,
+    queries: int = 200,
+    chat_queries: int = 50,
+    dim: int = 384,
+    top_k: int = 100,
+    seed: int = 0,
+    workdir: Path | None = None,
+    log: Callable[[str], None] = lambda line: None,
+) -> list[dict[str, Any]]:
+    """Прогон всех комбинаций размер × бэкенд × хранение; каждая строка результата — одна комбинация."""
+    embedder = HashingEmbedder(dim)
+    categories = synthetic_categories()
+    _load_categories_offline(categories)
+    mixes = _filter_mixes(categories)
+    search_queries = synthetic_queries(queries, categories, seed=seed + 1)
+    chat_texts = synthetic_queries(chat_queries, categories, seed=seed + 2)
+    runs: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        try:
+            for size in sizes:
+                for backend in backends:
+                    directory = Path(tmp) / f"{size}-{backend}"
+                    store = EmbeddingStore(directory / "embeddings.sqlite")
+                    t0 = time.perf_counter()
+                    try:
+                        stats = build(
+                            synthetic_catalog(size, categories, seed=seed), categories=categories,
+                            embedder=embedder, store=store, directory=directory / "index", backend=backend,
+                        )
+                    finally:
+                        store.close()
+                    build_s = time.perf_counter() - t0
+                    for storage in storages:
+                        if storage != "float32" and (backend != "flat" or HAS_FAISS):
+                            continue  # сжатое хранение есть только у точного numpy-индекса
+                        result = _measure(
+                            directory / "index", storage, embedder, search_queries, chat_texts, mixes, top_k,
+                        )
+                        run = {
+                            "products": size,
+                            "backend": backend,
+                            "storage": storage,
+                            "build": {
+                                "seconds": round(build_s, 3),
+                                "products_per_s": round(size / build_s, 1),
+                                "encoded": stats["encoded"] if stats else 0,
+                            },
+                            **result,
+                        }
+                        runs.append(run)
+                        log(_summary_line(run))
+        finally:
+            set_runtime(None)
+    return runs
+
+
+def _summary_line(run: dict[str, Any]) -> str:
+    s = run["search"]
+    return (
+        f"{run['products']:>8}  {run['backend']:<9}{run['storage']:<8}"
+        f"{run['build']['products_per_s']:>10.0f}"
+        f"{s['none']['p50_ms']:>9.2f}{s['none']['p95_ms']:>9.2f}"
+        f"{s['combined']['p50_ms']:>9.2f}{s['combined']['p95_ms']:>9.2f}"
+        f"{run['chat']['p50_ms']:>9.2f}{run['chat']['p95_ms']:>9.2f}"
+        f"{run['memory']['index_mb']:>10.1f}"
+    )
+
+
+def _compare(runs: list[dict[str, Any]], baseline: list[dict[str, Any]]) -> list[str]:
+    """Изменение p50/p95 относительно прошлого прогона для совпадающих (размер, бэкенд, хранение, фильтр)."""
+    def key(r: dict[str, Any]) -> tuple:
+        return r["products"], r["backend"], r["storage"]
+
+    old = {key(r): r for r in baseline}
+    lines = []
+    for run in runs:
+        prev = old.get(key(run))
+        if prev is None:
+            continue
+        cases = [(f"search/{m}", run["search"][m], prev["search"].get(m)) for m in run["search"]]
+        cases.append(("chat", run["chat"], prev.get("chat")))
+        for name, cur, was in cases:
+            if not was:
+                continue
+            deltas = [
+                f"{p} {was[p]:.2f} -> {cur[p]:.2f} ({(cur[p] / was[p] - 1) * 100 if was[p] else 0.0:+.0f}%)"
+                for p in ("p50_ms", "p95_ms")
+            ]
+            lines.append(f"{run['products']:>8}  {run['backend']:<9}{run['storage']:<8}{name:<20}" + "  ".join(deltas))
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,50000", help="размеры каталога через запятую (например 1000,50000,500000)")
+    default_backends = [b for b in BACKENDS if HAS_FAISS or b in ("flat", "kmeans")]
+    parser.add_argument("--backends", default=",".join(default_backends))
+    parser.add_argument("--storages", default="float32,int8", help="хранение векторов numpy-индекса (flat)")
+    parser.add_argument("--queries", type=int, default=200, help="запросов search_products на каждый набор фильтров")
+    parser.add_argument("--chat-queries", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=None, help="JSON с результатами (по умолчанию benchmarks/results/)")
+    parser.add_argument("--baseline", type=Path, default=None, help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--verbose", action="store_true", help="не приглушать логи сборки и поиска")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    skipped = [b for b in backends if b not in ("flat", "kmeans") and not HAS_FAISS]
+    if skipped:
+        print(f"faiss not installed, skipping backends: {', '.join(skipped)}")
+        backends = [b for b in backends if b not in skipped]
+
+    print(f"{'products':>8}  {'backend':<9}{'storage':<8}{'build/s':>10}{'p50':>9}{'p95':>9}"
+          f"{'filt.p50':>9}{'filt.p95':>9}{'chat.p50':>9}{'chat.p95':>9}{'index, MB':>10}")
+    runs = run_suite(
+        [int(s) for s in args.sizes.split(",") if s.strip()],
+        backends,
+        [s.strip() for s in args.storages.split(",") if s.strip()],
+        queries=args.queries,
+        chat_queries=args.chat_queries,
+        dim=args.dim,
+        top_k=args.top_k,
+        seed=args.seed,
+        log=print,
+    )
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "faiss": HAS_FAISS,
+            "platform": platform.platform(),
+        },
+        "args": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "embedder": HashingEmbedder(args.dim).model_name,
+        "runs": runs,
+    }
+    out = args.out or RESULTS_DIR / f"suite-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"results: {out}")
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["runs"]
+        for line in _compare(runs, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Синтетические данные для бенчмарков (без БД и без загрузки модели): векторы, дерево категорий,
+каталог в формате iter_catalog, запросы покупателей и детерминированный эмбеддер на хешах слов.
+"""
+import random
+import zlib
+from typing import Any, Iterator
+
+import numpy as np
+
+from retrieval.embedder import normalize
+from retrieval.tokenizer import tokenize
+
+
+def clustered_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Векторы вокруг центров «категорий» — ближе к реальным эмбеддингам, чем равномерный шум."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(8, n // 200), dim))
+    labels = rng.integers(0, len(centers), size=n)
+    return normalize(centers[labels] + 0.6 * rng.normal(size=(n, dim)))
+
+
+def noisy_queries(vectors: np.ndarray, count: int, noise: float = 0.4, seed: int = 1) -> np.ndarray:
+    """Запросы рядом с существующими товарами (как «похожая формулировка»)."""
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(0, len(vectors), count)]
+    return normalize(picked + noise * rng.normal(size=picked.shape))
+
+
+# Корневые категории -> виды товаров (второй уровень); листья — вид + исполнение
+_TREE = {
+    "Холодильное оборудование": ["Холодильный шкаф", "Морозильный ларь", "Витрина холодильная", "Льдогенератор",
+                                 "Шкаф шоковой заморозки", "Холодильный стол"],
+    "Тепловое оборудование": ["Плита электрическая", "Пароконвектомат", "Фритюрница", "Жарочная поверхность",
+                              "Мармит", "Печь для пиццы"],
+    "Кассовое оборудование": ["Онлайн-касса", "Фискальный регистратор", "POS-терминал", "Денежный ящик",
+                              "Дисплей покупателя", "Сканер штрихкода"],
+    "Весовое оборудование": ["Весы торговые", "Весы с печатью этикеток", "Весы платформенные", "Весы порционные",
+                             "Весы лабораторные", "Весы крановые"],
+    "Посудомоечное оборудование": ["Посудомоечная машина", "Стаканомоечная машина", "Котломоечная машина",
+                                   "Ванна моечная", "Умягчитель воды", "Сушилка для посуды"],
+    "Электромеханическое оборудование": ["Мясорубка", "Овощерезка", "Тестомес", "Слайсер", "Блендер",
+                                         "Миксер планетарный"],
+    "Барное оборудование": ["Кофемашина", "Кофемолка", "Соковыжималка", "Блендер барный", "Диспенсер сока",
+                            "Термопот"],
+    "Нейтральное оборудование": ["Стол производственный", "Стеллаж кухонный", "Полка настенная", "Зонт вытяжной",
+                                 "Тележка сервировочная", "Шкаф для посуды"],
+    "Упаковочное оборудование": ["Вакуумный упаковщик", "Термоусадочная машина", "Запайщик лотков",
+                                 "Дозатор жидкости", "Маркиратор", "Упаковщик стрейч"],
+    "Торговая мебель": ["Стеллаж торговый", "Прилавок", "Кассовый бокс", "Витрина островная", "Корзина покупательская",
+                        "Ресепшн"],
+}
+_VARIANTS = ["из нержавеющей стали", "с подсветкой", "для кафе", "для магазина", "серии Pro", "серии Eco",
+             "на колёсах", "с таймером", "премиум", "компакт", "380 В", "220 В"]
+_BRANDS = ["Polair", "Abat", "Atesy", "Hurakan", "Rational", "Unox", "Sirman", "Robot Coupe", "Fimar", "Atol",
+           "Штрих-М", "Меркурий", "Mertech", "CAS", "Масса-К", "Hobart", "Winterhalter", "Smeg", "Bartscher",
+           "Gastrorag", "Viatto", "Kocateq", "Carboma", "Ariada", "Frigorex", "Italfrost", "Tefcold", "Liebherr",
+           "Saeco", "La Cimbali", "Bezzera", "Mazzer", "Santos", "Zumex", "Vortmax", "Cooleq", "Eqta", "Convito",
+           "Hualian", "Jejak"]
+_ADJECTIVES = ["надёжный", "тихий", "мощный", "экономичный", "лёгкий в уходе", "с гарантией", "в наличии",
+               "с доставкой", "для общепита", "для ресторана", "для столовой", "для пекарни"]
+_SPECS = [("Мощность", "кВт", 0.2, 12.0), ("Объём", "л", 5, 1400), ("Напряжение", "В", 220, 380),
+          ("Вес", "кг", 2, 350), ("Ширина", "мм", 300, 2400), ("Производительность", "кг/ч", 5, 600)]
+# Ценовой диапазон корня (множитель к базовой цене)
+_PRICE_SCALE = [3.0, 2.5, 0.6, 0.4, 2.0, 0.8, 1.2, 0.5, 0.9, 0.7]
+
+
+def synthetic_categories(variants_per_kind: int = 6) -> list[dict[str, Any]]:
+    """
+    Дерево категорий в формате load_categories: 10 корней × 6 видов × variants_per_kind исполнений
+    (при 6 — 430 категорий, три уровня, как в рабочем каталоге).
+    """
+    categories: list[dict[str, Any]] = []
+    next_id = 1
+    for root_name, kinds in _TREE.items():
+        root_id = next_id
+        next_id += 1
+        categories.append({"id": root_id, "name": root_name, "slug": f"c{root_id}", "parent_id": None})
+        for kind in kinds:
+            kind_id = next_id
+            next_id += 1
+            categories.append({"id": kind_id, "name": kind, "slug": f"c{kind_id}", "parent_id": root_id})
+            for variant in _VARIANTS[:variants_per_kind]:
+                categories.append(
+                    {"id": next_id, "name": f"{kind} {variant}", "slug": f"c{next_id}", "parent_id": kind_id}
+                )
+                next_id += 1
+    return categories
+
+
+def _leaves(categories: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    parents = {c["parent_id"] for c in categories}
+    return [c for c in categories if c["id"] not in parents]
+
+
+def _root_index(categories: list[dict[str, Any]]) -> dict[int, int]:
+    """category id -> порядковый номер корня (для ценового диапазона)."""
+    by_id = {c["id"]: c for c in categories}
+    roots = [c["id"] for c in categories if c["parent_id"] is None]
+    out: dict[int, int] = {}
+    for c in categories:
+        r = c
+        while r["parent_id"] is not None:
+            r = by_id[r["parent_id"]]
+        out[c["id"]] = roots.index(r["id"])
+    return out
+
+
+def synthetic_catalog(n: int, categories: list[dict[str, Any]], seed: int = 0) -> Iterator[dict[str, Any]]:
+    """
+    n товаров в формате iter_catalog, детерминированно по seed (генератор можно пройти заново).
+    Размеры категорий неравномерны (степенной закон), цены — логнормальные в диапазоне корня,
+    около трети товаров не в наличии.
+    """
+    rnd = random.Random(seed)
+    leaves = _leaves(categories)
+    roots = _root_index(categories)
+    order = list(range(len(leaves)))
+    rnd.shuffle(order)
+    weights = [0.0] * len(leaves)
+    for rank, i in enumerate(order):
+        weights[i] = 1.0 / (rank + 1) ** 0.8
+    picked = rnd.choices(leaves, weights=weights, k=n)
+    for pid, leaf in enumerate(picked, start=1):
+        brand_id = rnd.randrange(len(_BRANDS))
+        brand = _BRANDS[brand_id]
+        model = f"{brand[:2].upper()}-{rnd.randint(10, 999)}"
+        specs = rnd.sample(_SPECS, 3)
+        specs_text = " ".join(
+            f"{name} {round(rnd.uniform(lo, hi), 1)} {unit}" for name, unit, lo, hi in specs
+        )
+        price = round(rnd.lognormvariate(12.0, 0.8) * _PRICE_SCALE[roots[leaf["id"]]], -2)
+        yield {
+            "id": pid,
+            "name": f"{leaf['name']} {brand} {model}",
+            "description": f"{leaf['name']} {' '.join(rnd.sample(_ADJECTIVES, 3))}.",
+            "category_id": leaf["id"],
+            "category_name": leaf["name"],
+            "brand_id": brand_id + 1,
+            "brand_name": brand,
+            "price": float(price),
+            "quantity": 0 if rnd.random() < 0.3 else rnd.randint(1, 40),
+            "slug": f"p{pid}",
+            "image_url": f"/uploads/p{pid}.jpg",
+            "specs_text": specs_text,
+        }
+
+
+def synthetic_queries(count: int, categories: list[dict[str, Any]], seed: int = 1) -> list[str]:
+    """Запросы покупателей: вид товара + исполнение/назначение, иногда бюджет («до 500 тысяч»)."""
+    rnd = random.Random(seed)
+    leaf_ids = {c["id"] for c in _leaves(categories)}
+    kinds = [c for c in categories if c["parent_id"] is not None and c["id"] not in leaf_ids]
+    out = []
+    for _ in range(count):
+        kind = rnd.choice(kinds)["name"].lower()
+        parts = [rnd.choice(["нужен", "ищу", "подскажите", ""]), kind, rnd.choice(_VARIANTS + _ADJECTIVES)]
+        if rnd.random() < 0.3:
+            parts.append(f"до {rnd.choice([100, 300, 500, 1000])} тысяч")
+        out.append(" ".join(p for p in parts if p))
+    return out
+
+
+class HashingEmbedder:
+    """
+    Детерминированная замена retrieval.embedder.Embedder без модели: термы текста (tokenize)
+    хешируются в dim измерений со знаком, вектор нормализуется. Тексты с общими словами близки,
+    поэтому поиск, фильтры и rerank ведут себя как на настоящих эмбеддингах, а скорость не зависит от модели.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.model_name = f"hashing-{dim}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        rows: list[int] = []
+        cols: list[int] = []
+        signs: list[float] = []
+        for i, text in enumerate(texts):
+            for term in tokenize(text):
+                h = zlib.crc32(term.encode("utf-8"))
+                rows.append(i)
+                cols.append(h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(out, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)), signs)
+        return normalize(out)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self.embed([query])[0]
+
+    def embed_queries(self, queries: list[str]) -> list[np.ndarray]:
+        return list(self.embed(queries))
@@ -3,9 +3,10 @@
 """
 import logging
 import re
+import time
 from typing import Any, List
 
-from config import MAX_PRODUCTS_IN_RESPONSE, RETRIEVAL_TOP_K
+from config import BATCH_WORKERS, MAX_PRODUCTS_IN_RESPONSE, RETRIEVAL_TOP_K
 from chat.prompts import (
     format_products_context,
     clarifying_question_no_results,
@@ -15,8 +16,10 @@ from chat.prompts import (
 from chat.llm_client import get_llm_client
 from chat.query_parse import parse_budget_from_query
 from data_access.categories_loader import get_descendant_ids
-from retrieval.search import search_products
+from observability.timing import span
+from retrieval.search import SearchSession, run_batch
 from retrieval.rerank import rerank
+from retrieval.runtime import get_runtime
 from retrieval.category_match import match_query_to_category
 
 logger = logging.getLogger(__name__)
@@ -48,8 +51,31 @@ def run_chat(
     - products: список { id, name, price, url, image_url, score }
     - clarifying_question: уточняющий вопрос или None
     """
+    plan = prepare_chat(
+        query,
+        price_min=price_min,
+        price_max=price_max,
+        category_id=category_id,
+        brand_id=brand_id,
+        in_stock_only=in_stock_only,
+    )
+    products, search_fallback_used = retrieve_products(plan)
+    return finalize_chat(plan, products, search_fallback_used)
+
+
+def prepare_chat(
+    query: str,
+    *,
+    price_min: float | None = None,
+    price_max: float | None = None,
+    category_id: int | None = None,
+    brand_id: int | None = None,
+    in_stock_only: bool = False,
+) -> dict[str, Any]:
+    """Лёгкий этап: бюджет из текста и категория по запросу. Возвращает план поиска."""
     # Извлекаем бюджет из текста («до 500 тысяч» → price_max=500000), если не передан явно
-    parsed_min, parsed_max = parse_budget_from_query(query)
+    with span("budget"):
+        parsed_min, parsed_max = parse_budget_from_query(query)
     effective_price_min = price_min if price_min is not None else parsed_min
     effective_price_max = price_max if price_max is not None else parsed_max
     if effective_price_max is not None:
@@ -62,57 +88,143 @@ def run_chat(
     matched_category_name: str | None = None
     subcategory_children: list[dict] = []
     if category_id is None:
-        cat_id, cat_name, children = match_query_to_category(query)
+        with span("category_match"):
+            cat_id, cat_name, children = match_query_to_category(query)
+            if cat_id is not None:
+                category_ids = get_descendant_ids(cat_id)
         if cat_id is not None:
-            category_ids = get_descendant_ids(cat_id)
             matched_category_name = cat_name
             subcategory_children = children
             logger.info("Matched category: %s (id=%s), %d descendants", cat_name, cat_id, len(category_ids))
 
+    return {
+        "query": query,
+        "price_min": effective_price_min,
+        "price_max": effective_price_max,
+        "category_id": category_id,
+        "category_ids": category_ids,
+        "brand_id": brand_id,
+        "in_stock_only": in_stock_only,
+        "matched_category_name": matched_category_name,
+        "subcategory_children": subcategory_children,
+    }
+
+
+def retrieve_products(plan: dict[str, Any]) -> tuple[list[dict[str, Any]], bool]:
+    """
+    Тяжёлый этап (эмбеддинг + векторный поиск). Возвращает (товары, использован ли поиск без категории).
+    Повторный поиск без категории идёт в той же сессии: запрос не кодируется и индекс не пересчитывается заново.
+    """
+    session = SearchSession.open(plan["query"])
+    if session is None:
+        return [], False
+    return _retrieve_in_session(session, plan)
+
+
+def _retrieve_in_session(session: SearchSession, plan: dict[str, Any]) -> tuple[list[dict[str, Any]], bool]:
     search_fallback_used = False
-    products = search_products(
-        query,
-        top_k=RETRIEVAL_TOP_K,
-        price_min=effective_price_min,
-        price_max=effective_price_max,
-        category_id=category_id,
-        category_ids=category_ids,
-        brand_id=brand_id,
-        in_stock_only=in_stock_only,
+    products = session.search(
+        RETRIEVAL_TOP_K,
+        price_min=plan["price_min"],
+        price_max=plan["price_max"],
+        category_id=plan["category_id"],
+        category_ids=plan["category_ids"],
+        brand_id=plan["brand_id"],
+        in_stock_only=plan["in_stock_only"],
     )
     # Если с фильтром по категории ничего не нашли — повторяем поиск без категории (только бюджет и смысл)
-    if not products and category_ids:
+    if not products and plan["category_ids"]:
         logger.info("No results with category filter, retrying without category")
         search_fallback_used = True
-        products = search_products(
-            query,
-            top_k=RETRIEVAL_TOP_K,
-            price_min=effective_price_min,
-            price_max=effective_price_max,
+        products = session.search(
+            RETRIEVAL_TOP_K,
+            price_min=plan["price_min"],
+            price_max=plan["price_max"],
             category_id=None,
             category_ids=None,
-            brand_id=brand_id,
-            in_stock_only=in_stock_only,
+            brand_id=plan["brand_id"],
+            in_stock_only=plan["in_stock_only"],
         )
-    products = rerank(query, products, top_k=MAX_PRODUCTS_IN_RESPONSE)
-
-    # Нормализуем поля для ответа API
-    products_out: List[dict[str, Any]] = []
-    for p in products:
-        products_out.append({
-            "id": p.get("product_id"),
-            "name": p.get("name"),
-            "price": p.get("price"),
-            "url": p.get("url"),
-            "image_url": p.get("image_url"),
-            "score": p.get("score"),
-        })
-
-    context = format_products_context(products_out)
-    llm = get_llm_client()
-    message = llm.reply(query, context)
-    if search_fallback_used and products_out:
-        message += "\n\nПоказаны товары по бюджету и смыслу запроса. Для точного подбора укажите категорию (например: витрина холодильная, шкаф холодильный)."
+    return products, search_fallback_used
+
+
+def run_chat_batch(
+    items: list[dict[str, Any]],
+    workers: int = BATCH_WORKERS,
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    """
+    Пакет запросов чата: items — [{"query": ..., фильтры как у run_chat}, ...].
+    Все запросы кодируются одним вызовом модели, для точного индекса скоры — одно матричное умножение
+    на порцию запросов; фильтры и fallback без категории — как у run_chat, в workers потоков.
+    Возвращает (ответы в порядке items, сводку по времени этапов).
+    """
+    t0 = time.perf_counter()
+    plans = [prepare_chat(item["query"], **{k: v for k, v in item.items() if k != "query"}) for item in items]
+    t1 = time.perf_counter()
+    retrieved = run_batch(
+        [p["query"] for p in plans],
+        lambda session, pos: _retrieve_in_session(session, plans[pos]),
+        workers,
+    )
+    t2 = time.perf_counter()
+    results = [
+        finalize_chat(plan, *(found if found is not None else ([], False)))
+        for plan, found in zip(plans, retrieved)
+    ]
+    t3 = time.perf_counter()
+    total_ms = (t3 - t0) * 1000
+    timing = {
+        "queries": len(items),
+        "workers": workers,
+        "prepare_ms": round((t1 - t0) * 1000, 2),
+        "retrieve_ms": round((t2 - t1) * 1000, 2),
+        "finalize_ms": round((t3 - t2) * 1000, 2),
+        "total_ms": round(total_ms, 2),
+        "per_query_ms": round(total_ms / len(items), 3) if items else 0.0,
+    }
+    logger.info("Chat batch: %d queries in %.1f ms", len(items), total_ms)
+    return results, timing
+
+
+def finalize_chat(
+    plan: dict[str, Any],
+    products: list[dict[str, Any]],
+    search_fallback_used: bool = False,
+) -> dict[str, Any]:
+    """Лёгкий этап и ответ LLM одним вызовом (синхронный путь: run_chat, пакет)."""
+    return reply_chat(compose_chat(plan, products, search_fallback_used))
+
+
+def compose_chat(
+    plan: dict[str, Any],
+    products: list[dict[str, Any]],
+    search_fallback_used: bool = False,
+) -> dict[str, Any]:
+    """Лёгкий этап: переранжирование, товары ответа, контекст для LLM и уточняющий вопрос."""
+    query = plan["query"]
+    matched_category_name = plan["matched_category_name"]
+    subcategory_children = plan["subcategory_children"]
+    snapshot = get_runtime().snapshot() if products else None
+    with span("rerank"):
+        products = rerank(
+            query, products, top_k=MAX_PRODUCTS_IN_RESPONSE,
+            lexical=snapshot.lexical if snapshot is not None else None,
+            columns=snapshot.columns if snapshot is not None else None,
+        )
+
+    with span("format"):
+        # Нормализуем поля для ответа API
+        products_out: List[dict[str, Any]] = []
+        for p in products:
+            products_out.append({
+                "id": p.get("product_id"),
+                "name": p.get("name"),
+                "price": p.get("price"),
+                "url": p.get("url"),
+                "image_url": p.get("image_url"),
+                "score": p.get("score"),
+            })
+        context = format_products_context(products_out)
 
     clarifying = None
     if not products_out:
@@ -126,7 +238,24 @@ def run_chat(
         )
 
     return {
-        "message": message,
+        "query": query,
+        "context": context,
         "products": products_out,
         "clarifying_question": clarifying,
+        "search_fallback_used": search_fallback_used,
+    }
+
+
+def reply_chat(draft: dict[str, Any]) -> dict[str, Any]:
+    """Текст ответа от LLM по черновику compose_chat. Может ждать сеть — в конвейере идёт в потоке, не в event loop."""
+    llm = get_llm_client()
+    with span("llm"):
+        message = llm.reply(draft["query"], draft["context"])
+    if draft["search_fallback_used"] and draft["products"]:
+        message += "\n\nПоказаны товары по бюджету и смыслу запроса. Для точного подбора укажите категорию (например: витрина холодильная, шкаф холодильный)."
+
+    return {
+        "message": message,
+        "products": draft["products"],
+        "clarifying_question": draft["clarifying_question"],
     }
@@ -0,0 +1,180 @@
+"""
+Асинхронный конвейер /chat.
+Тяжёлые этапы (эмбеддинг + векторный поиск) выполняются в отдельном пуле потоков ограниченного размера,
+подготовка (бюджет, категория) и ответ LLM — в потоках пула по умолчанию: они могут ждать БД или сеть,
+а event loop не должен ждать ни того, ни другого. В event loop — только rerank и формирование ответа.
+У каждого этапа свой лимит параллельности, у запроса — дедлайн: медленный запрос отменяется,
+а не копится в очереди.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any
+
+from config import CHAT_MAX_INFLIGHT, CHAT_TIMEOUT, SEARCH_CONCURRENCY, SEARCH_WORKERS
+from chat.chat_engine import compose_chat, prepare_chat, reply_chat, retrieve_products, run_chat_batch
+from observability.timing import observe
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOverloaded(Exception):
+    """Слишком много запросов в обработке — новый отклоняется сразу (HTTP 503)."""
+
+
+class StageLimiter:
+    """Лимит параллельности этапа + счётчики «выполняется» / «ждёт» для наблюдаемости очереди."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self._sem: asyncio.Semaphore | None = None
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.cancelled = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.limit)
+        self.waiting += 1
+        t0 = time.perf_counter()
+        try:
+            await self._sem.acquire()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.waiting -= 1
+        # Ожидание слота — отдельный этап: видно, что запрос стоял в очереди, а не считал
+        observe(f"{self.name}_wait", (time.perf_counter() - t0) * 1000)
+        self.running += 1
+        try:
+            yield
+            self.completed += 1
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.running -= 1
+            self._sem.release()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "limit": self.limit,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+        }
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_stages = {
+    "prepare": StageLimiter("prepare", CHAT_MAX_INFLIGHT),
+    "retrieve": StageLimiter("retrieve", SEARCH_CONCURRENCY),
+    "finalize": StageLimiter("finalize", CHAT_MAX_INFLIGHT),
+    "llm": StageLimiter("llm", CHAT_MAX_INFLIGHT),
+    # Пакет сам занимает свой пул потоков — одновременно выполняется один, остальные ждут
+    "batch": StageLimiter("batch", 1),
+}
+_inflight = 0
+_rejected = 0
+_timed_out = 0
+
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """Пул потоков для эмбеддинга и векторного поиска (отдельно от пула FastAPI)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def pipeline_stats() -> dict[str, Any]:
+    return {
+        "inflight": _inflight,
+        "max_inflight": CHAT_MAX_INFLIGHT,
+        "rejected": _rejected,
+        "timed_out": _timed_out,
+        "stages": {name: st.stats() for name, st in _stages.items()},
+    }
+
+
+async def run_chat_async(
+    query: str,
+    *,
+    price_min: float | None = None,
+    price_max: float | None = None,
+    category_id: int | None = None,
+    brand_id: int | None = None,
+    in_stock_only: bool = False,
+    timeout: float | None = CHAT_TIMEOUT,
+) -> dict[str, Any]:
+    """
+    То же, что run_chat, но не занимает поток на весь запрос.
+    ChatOverloaded — превышен лимит одновременных запросов; asyncio.TimeoutError — истёк дедлайн.
+    """
+    global _inflight, _rejected, _timed_out
+    if _inflight >= CHAT_MAX_INFLIGHT:
+        _rejected += 1
+        raise ChatOverloaded(f"{_inflight} chat requests in flight")
+    _inflight += 1
+    try:
+        return await asyncio.wait_for(
+            _run(query, price_min=price_min, price_max=price_max, category_id=category_id,
+                 brand_id=brand_id, in_stock_only=in_stock_only),
+            timeout=timeout,
+        )
+    except asyncio.TimeoutError:
+        _timed_out += 1
+        logger.warning("Chat request timed out after %.1fs: %r", timeout, query[:80])
+        raise
+    finally:
+        _inflight -= 1
+
+
+async def _run(query: str, **filters: Any) -> dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    async with _stages["prepare"].slot():
+        # Холодный снимок категорий грузится из БД синхронно — не в event loop
+        ctx = contextvars.copy_context()
+        plan = await loop.run_in_executor(None, functools.partial(ctx.run, prepare_chat, query, **filters))
+    async with _stages["retrieve"].slot():
+        # Отмена по дедлайну снимает задачу, ещё не начатую в пуле; контекст — чтобы этапы попали в трассу запроса
+        ctx = contextvars.copy_context()
+        products, fallback_used = await loop.run_in_executor(get_search_executor(), ctx.run, retrieve_products, plan)
+    async with _stages["finalize"].slot():
+        draft = compose_chat(plan, products, fallback_used)
+    async with _stages["llm"].slot():
+        # Внешний LLM — сетевой вызов: в потоке, чтобы /health, /ready и /metrics не ждали его
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(None, ctx.run, reply_chat, draft)
+
+
+async def run_chat_batch_async(
+    items: list[dict[str, Any]],
+    workers: int | None = None,
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    """run_chat_batch в отдельном потоке: event loop не блокируется на время пакета."""
+    async with _stages["batch"].slot():
+        if workers is None:
+            return await asyncio.to_thread(run_chat_batch, items)
+        return await asyncio.to_thread(run_chat_batch, items, workers)
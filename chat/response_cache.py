@@ -0,0 +1,139 @@
+"""
+Кэш готовых ответов /chat: нормализованный запрос + фильтры -> сериализованный JSON (bytes).
+Действует для одной пары версий (снимок индекса, снимок категорий): пересборка индекса
+или обновление категорий сбрасывает кэш. Вытеснение — LRU, TTL и лимит по объёму.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from config import CHAT_CACHE_MAX_BYTES, CHAT_CACHE_SIZE, CHAT_CACHE_TTL
+from retrieval.query_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+def response_key(query: str, filters: dict[str, Any]) -> str:
+    """Ключ: нормализованный текст и действующие фильтры (цены приводятся к float: 100 и 100.0 — одно и то же)."""
+    effective = {}
+    for name, value in sorted(filters.items()):
+        if value is None or value is False:
+            continue
+        effective[name] = float(value) if name in ("price_min", "price_max") else value
+    return json.dumps([normalize_query(query), effective], ensure_ascii=False, separators=(",", ":"))
+
+
+class ResponseCache:
+    """Ограниченный по числу записей и байтам кэш ответов для одной пары версий (индекс, категории)."""
+
+    def __init__(
+        self,
+        max_items: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 300,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._items: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._versions: tuple[int, int] | None = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str, versions: tuple[int, int]) -> bytes | None:
+        now = self._clock()
+        with self._lock:
+            self._ensure_versions(versions)
+            item = self._items.get(key) if versions == self._versions else None
+            if item is not None:
+                created, body = item
+                if now - created <= self.ttl_seconds:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return body
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, versions: tuple[int, int], body: bytes) -> None:
+        """Ответ, посчитанный на старых версиях, не сохраняется: индекс уже пересобран."""
+        if len(body) > self.max_bytes:
+            return
+        now = self._clock()
+        with self._lock:
+            self._ensure_versions(versions)
+            if versions != self._versions:
+                return
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (now, body)
+            self.bytes += len(body)
+            while len(self._items) > self.max_items or self.bytes > self.max_bytes:
+                self._drop(next(iter(self._items)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_size": self.max_items,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _ensure_versions(self, versions: tuple[int, int]) -> None:
+        # Версии только растут: более новые сбрасывают кэш, запоздавшие запросы со старыми — просто промахи
+        current = self._versions
+        if current is None or (versions != current and all(v >= c for v, c in zip(versions, current))):
+            if current is not None:
+                logger.info("Index/categories changed (%s -> %s), chat response cache cleared", current, versions)
+                self.invalidations += 1
+            self._items.clear()
+            self.bytes = 0
+            self._versions = versions
+
+    def _drop(self, key: str) -> None:
+        _, body = self._items.pop(key)
+        self.bytes -= len(body)
+
+
+_cache: ResponseCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Кэш процесса по настройкам из config; None, если AI_CHAT_CACHE_SIZE=0."""
+    global _cache
+    if CHAT_CACHE_SIZE <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    max_items=CHAT_CACHE_SIZE,
+                    max_bytes=CHAT_CACHE_MAX_BYTES,
+                    ttl_seconds=CHAT_CACHE_TTL,
+                )
+    return _cache
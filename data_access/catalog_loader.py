@@ -2,104 +2,154 @@
 Загрузка каталога товаров из БД основного сервера (PostgreSQL).
 Используется для построения индекса — прямой доступ к БД без Flask.
 """
+import json
 import logging
-from typing import Any
+from typing import Any, Iterator
 
-from sqlalchemy import create_engine, text
+import numpy as np
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
-from config import DATABASE_URL
+from config import CATALOG_CHUNK_SIZE
+from data_access.db import get_engine
 
 logger = logging.getLogger(__name__)
 
 
-def get_engine() -> Engine:
-    """Создаёт движок SQLAlchemy для подключения к БД."""
-    return create_engine(DATABASE_URL, pool_pre_ping=True)
-
-
 def load_catalog(engine: Engine | None = None) -> list[dict[str, Any]]:
     """
     Загружает все видимые товары с полями для индексации.
     Возвращает список словарей: id, name, description, category_id, category_name,
     brand_id, brand_name, price, quantity, slug, image_url, specs_text.
     """
-    eng = engine or get_engine()
+    catalog = list(iter_catalog(engine))
+    if not catalog:
+        logger.warning("No visible products found in catalog")
+        return []
+    logger.info("Loaded %d products from catalog", len(catalog))
+    return catalog
 
-    # Товары: видимые, не черновик
-    products_sql = text("""
-        SELECT p.id, p.name, p.description, p.price, p.quantity, p.slug,
-               p.category_id, p.brand_id,
-               c.name AS category_name,
-               b.name AS brand_name
-        FROM product p
-        LEFT JOIN category c ON p.category_id = c.id
-        LEFT JOIN brand b ON p.brand_id = b.id
-        WHERE p.is_visible = true AND (p.is_draft = false OR p.is_draft IS NULL)
-        ORDER BY p.id
-    """)
 
-    with eng.connect() as conn:
-        rows = conn.execute(products_sql).fetchall()
+# Колонки товара + категория и бренд: видимые, не черновик
+_PRODUCT_COLUMNS = """
+    p.id, p.name, p.description, p.price, p.quantity, p.slug,
+    p.category_id, p.brand_id,
+    c.name AS category_name,
+    b.name AS brand_name
+"""
+_PRODUCT_WHERE = "p.is_visible = true AND (p.is_draft = false OR p.is_draft IS NULL)"
+
+# PostgreSQL: первое изображение и упорядоченные характеристики — LATERAL-подзапросами в том же запросе
+_CATALOG_SQL_POSTGRES = f"""
+    SELECT {_PRODUCT_COLUMNS}, img.url AS image_url, sp.specs
+    FROM product p
+    LEFT JOIN category c ON p.category_id = c.id
+    LEFT JOIN brand b ON p.brand_id = b.id
+    LEFT JOIN LATERAL (
+        SELECT m.url FROM product_media m
+        WHERE m.product_id = p.id AND m.media_type = 'image'
+        ORDER BY m."order" NULLS LAST
+        LIMIT 1
+    ) img ON true
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_array(cl.characteristic_key, pc.value) ORDER BY pc.sort_order NULLS LAST) AS specs
+        FROM product_characteristic pc
+        LEFT JOIN characteristics_list cl ON CAST(cl.id AS TEXT) = pc.key
+        WHERE pc.product_id = p.id
+    ) sp ON true
+    WHERE {_PRODUCT_WHERE}
+    ORDER BY p.id
+"""
 
-    product_ids = [r.id for r in rows]
-    if not product_ids:
-        logger.warning("No visible products found in catalog")
-        return []
+# Остальные диалекты (SQLite в тестах и бенчмарке): те же данные коррелированными подзапросами
+_CATALOG_SQL_GENERIC = f"""
+    SELECT {_PRODUCT_COLUMNS},
+        (SELECT m.url FROM product_media m
+         WHERE m.product_id = p.id AND m.media_type = 'image'
+         ORDER BY m."order" IS NULL, m."order"
+         LIMIT 1) AS image_url,
+        (SELECT json_group_array(json_array(s.characteristic_key, s.value)) FROM (
+            SELECT cl.characteristic_key, pc.value
+            FROM product_characteristic pc
+            LEFT JOIN characteristics_list cl ON CAST(cl.id AS TEXT) = pc.key
+            WHERE pc.product_id = p.id
+            ORDER BY pc.sort_order IS NULL, pc.sort_order
+         ) s) AS specs
+    FROM product p
+    LEFT JOIN category c ON p.category_id = c.id
+    LEFT JOIN brand b ON p.brand_id = b.id
+    WHERE {_PRODUCT_WHERE}
+    ORDER BY p.id
+"""
 
-    # Первое изображение по product_id
-    ids_placeholders = ",".join(str(i) for i in product_ids)
-    media_sql = text(f"""
-        SELECT DISTINCT ON (product_id) product_id, url
-        FROM product_media
-        WHERE product_id IN ({ids_placeholders}) AND media_type = 'image'
-        ORDER BY product_id, "order" NULLS LAST
-    """)
 
+def catalog_sql(dialect: str) -> str:
+    """Запрос каталога для диалекта БД: один проход, изображение и характеристики агрегированы по товару."""
+    return _CATALOG_SQL_POSTGRES if dialect == "postgresql" else _CATALOG_SQL_GENERIC
+
+
+def iter_catalog(engine: Engine | None = None, chunk_size: int = CATALOG_CHUNK_SIZE) -> Iterator[dict[str, Any]]:
+    """
+    Потоковая загрузка каталога одним запросом: первое изображение и характеристики товара
+    агрегируются в БД, строки читаются серверным курсором партиями по chunk_size (по возрастанию id).
+    Отдаёт полностью собранные товары (те же поля, что load_catalog) по одному.
+    """
+    eng = engine or get_engine()
+    sql = text(catalog_sql(eng.dialect.name))
     with eng.connect() as conn:
-        media_rows = conn.execute(media_sql).fetchall()
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(sql)
+        for rows in result.partitions(chunk_size):
+            for r in rows:
+                yield _catalog_item(r, r.image_url, _specs(r.specs))
 
-    image_by_id = {r.product_id: r.url for r in media_rows}
 
-    # Характеристики: key из справочника + value, сгруппировать по product_id
-    chars_sql = text(f"""
-        SELECT pc.product_id, cl.characteristic_key, pc.value
-        FROM product_characteristic pc
-        LEFT JOIN characteristics_list cl ON cl.id::text = pc.key
-        WHERE pc.product_id IN ({ids_placeholders})
-        ORDER BY pc.product_id, pc.sort_order NULLS LAST
-    """)
+# Цена, остаток и видимость всех товаров — без текстов, медиа и характеристик (живое обновление индекса)
+_STOCK_SQL = f"""
+    SELECT p.id, p.price, p.quantity, CASE WHEN {_PRODUCT_WHERE} THEN 1 ELSE 0 END AS visible
+    FROM product p
+"""
 
+
+def fetch_stock(engine: Engine | None = None) -> dict[str, np.ndarray]:
+    """
+    Один запрос по всей таблице product: массивы id (int64), price (float64), quantity (int32)
+    и visible (bool: виден и не черновик — как у товаров каталога). Отсутствующая цена/остаток = 0.
+    """
+    eng = engine or get_engine()
     with eng.connect() as conn:
-        char_rows = conn.execute(chars_sql).fetchall()
-
-    specs_by_id: dict[int, list[str]] = {}
-    for r in char_rows:
-        specs_by_id.setdefault(r.product_id, []).append(f"{r.characteristic_key}: {r.value}")
-    for pid in product_ids:
-        if pid not in specs_by_id:
-            specs_by_id[pid] = []
-
-    # Собираем каталог
-    catalog = []
-    for r in rows:
-        specs_text = " ".join(specs_by_id.get(r.id, []))
-        catalog.append({
-            "id": r.id,
-            "name": r.name or "",
-            "description": (r.description or "").strip(),
-            "category_id": r.category_id,
-            "category_name": r.category_name or "",
-            "brand_id": r.brand_id,
-            "brand_name": r.brand_name or "",
-            "price": float(r.price or 0),
-            "quantity": int(r.quantity or 0),
-            "slug": r.slug or "",
-            "image_url": image_by_id.get(r.id) or "",
-            "specs_text": specs_text,
-        })
-    logger.info("Loaded %d products from catalog", len(catalog))
-    return catalog
+        rows = conn.execute(text(_STOCK_SQL)).all()
+    n = len(rows)
+    return {
+        "id": np.fromiter((r[0] for r in rows), dtype=np.int64, count=n),
+        "price": np.fromiter((float(r[1] or 0) for r in rows), dtype=np.float64, count=n),
+        "quantity": np.fromiter((int(r[2] or 0) for r in rows), dtype=np.int32, count=n),
+        "visible": np.fromiter((bool(r[3]) for r in rows), dtype=bool, count=n),
+    }
+
+
+def _specs(raw: Any) -> list[str]:
+    """Агрегат характеристик [[key, value], ...] -> ["key: value", ...]; SQLite отдаёт его строкой JSON."""
+    if raw is None:
+        return []
+    pairs = json.loads(raw) if isinstance(raw, str) else raw
+    return [f"{key}: {value}" for key, value in pairs]
+
+
+def _catalog_item(r, image_url: str | None, specs: list[str]) -> dict[str, Any]:
+    return {
+        "id": r.id,
+        "name": r.name or "",
+        "description": (r.description or "").strip(),
+        "category_id": r.category_id,
+        "category_name": r.category_name or "",
+        "brand_id": r.brand_id,
+        "brand_name": r.brand_name or "",
+        "price": float(r.price or 0),
+        "quantity": int(r.quantity or 0),
+        "slug": r.slug or "",
+        "image_url": image_url or "",
+        "specs_text": " ".join(specs),
+    }
 
 
 def build_search_text(item: dict[str, Any]) -> str:
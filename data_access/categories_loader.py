@@ -1,39 +1,154 @@
 """
 Загрузка дерева категорий из БД для определения категории по запросу и фильтрации.
+Категории хранятся неизменяемым версионным снимком: чтение на горячем пути — просто атрибут,
+обновление идёт в фоне (по интервалу или по запросу) и подменяет снимок атомарно.
 """
+import hashlib
 import logging
+import threading
+import time
+from dataclasses import dataclass
 from typing import Any
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
-from config import DATABASE_URL
+from config import CATEGORY_REFRESH_INTERVAL
+from data_access.db import get_engine
 
 logger = logging.getLogger(__name__)
 
-_categories_cache: list[dict[str, Any]] | None = None
-_children_map: dict[int, list[int]] | None = None
 
+@dataclass(frozen=True)
+class CategorySnapshot:
+    """
+    Дерево категорий одной загрузки. Не меняется после создания.
+    descendants — для каждой категории [id] + все подкатегории (рекурсивно),
+    children — дочерние категории первого уровня (id, name), checksum — хеш строк из БД.
+    """
+    categories: list[dict[str, Any]]
+    children_map: dict[int, list[int]]
+    descendants: dict[int, tuple[int, ...]]
+    children: dict[int, list[dict[str, Any]]]
+    by_id: dict[int, dict[str, Any]]
+    checksum: str
+    version: int
+    loaded_at: float
 
-def get_engine() -> Engine:
-    return create_engine(DATABASE_URL, pool_pre_ping=True)
+    @classmethod
+    def build(cls, categories: list[dict[str, Any]], checksum: str = "", version: int = 0) -> "CategorySnapshot":
+        children_map = _build_children_map(categories)
+        children: dict[int, list[dict[str, Any]]] = {}
+        for c in categories:
+            if c.get("parent_id") is not None:
+                children.setdefault(c["parent_id"], []).append({"id": c["id"], "name": c["name"]})
+        return cls(
+            categories=categories,
+            children_map=children_map,
+            descendants={c["id"]: tuple(_descendants(c["id"], children_map)) for c in categories},
+            children=children,
+            by_id={c["id"]: c for c in categories},
+            checksum=checksum,
+            version=version,
+            loaded_at=time.time(),
+        )
 
 
-def load_categories(engine: Engine | None = None) -> list[dict[str, Any]]:
+_snapshot: CategorySnapshot | None = None
+# Отпечаток таблицы category при последней полной загрузке (см. _fingerprint)
+_fingerprint_loaded: str | None = None
+_refresh_lock = threading.Lock()
+_init_lock = threading.Lock()
+
+
+def _fetch_categories(engine: Engine | None = None) -> list[dict[str, Any]]:
     """Загружает все категории: id, name, slug, parent_id."""
-    global _categories_cache
-    if _categories_cache is not None:
-        return _categories_cache
     eng = engine or get_engine()
     sql = text("SELECT id, name, slug, parent_id FROM category ORDER BY parent_id NULLS FIRST, \"order\"")
     with eng.connect() as conn:
         rows = conn.execute(sql).fetchall()
-    _categories_cache = [
+    return [
         {"id": r.id, "name": r.name or "", "slug": r.slug or "", "parent_id": r.parent_id}
         for r in rows
     ]
-    logger.info("Loaded %d categories", len(_categories_cache))
-    return _categories_cache
+
+
+# Отпечаток тех же полей, что в _checksum, считается в БД: наружу уходит одна строка, а не вся таблица
+_FINGERPRINT_SQL_POSTGRES = """
+    SELECT count(*) AS n,
+        md5(string_agg(concat(id, ':', parent_id, ':', name, ':', slug), ',' ORDER BY id)) AS digest
+    FROM category
+"""
+_FINGERPRINT_SQL_GENERIC = """
+    SELECT count(*) AS n, group_concat(r, ',') AS digest FROM (
+        SELECT id || ':' || coalesce(parent_id, '') || ':' || coalesce(name, '') || ':' || coalesce(slug, '') AS r
+        FROM category ORDER BY id
+    ) t
+"""
+
+
+def _fingerprint(engine: Engine | None = None) -> str:
+    """Дешёвый отпечаток дерева категорий: полная загрузка нужна, только если он изменился."""
+    eng = engine or get_engine()
+    postgres = eng.dialect.name == "postgresql"
+    with eng.connect() as conn:
+        row = conn.execute(text(_FINGERPRINT_SQL_POSTGRES if postgres else _FINGERPRINT_SQL_GENERIC)).one()
+    digest = row.digest or ""
+    if not postgres:
+        digest = hashlib.sha256(digest.encode("utf-8")).hexdigest()
+    return f"{row.n}:{digest}"
+
+
+def _checksum(categories: list[dict[str, Any]]) -> str:
+    h = hashlib.sha256()
+    for c in categories:
+        h.update(f"{c['id']}\x1f{c['parent_id']}\x1f{c['name']}\x1f{c['slug']}\x1e".encode("utf-8"))
+    return h.hexdigest()
+
+
+def refresh_categories(engine: Engine | None = None) -> bool:
+    """
+    Перечитывает категории и подменяет снимок, если дерево изменилось (по контрольной сумме).
+    Сначала сверяется отпечаток из БД: пока он прежний, таблица целиком не читается.
+    Возвращает True, если снимок заменён. Читатели всё это время работают со старым снимком.
+    """
+    global _snapshot, _fingerprint_loaded
+    with _refresh_lock:
+        fingerprint = _fingerprint(engine)
+        current = _snapshot
+        if current is not None and fingerprint == _fingerprint_loaded:
+            return False
+        categories = _fetch_categories(engine)
+        checksum = _checksum(categories)
+        _fingerprint_loaded = fingerprint
+        if current is not None and current.checksum == checksum:
+            return False
+        version = current.version + 1 if current is not None else 1
+        _snapshot = CategorySnapshot.build(categories, checksum=checksum, version=version)
+    logger.info("Loaded %d categories (snapshot v%d)", len(categories), version)
+    return True
+
+
+def get_category_snapshot(engine: Engine | None = None) -> CategorySnapshot:
+    """Текущий снимок; при первом обращении загружает категории из БД."""
+    snap = _snapshot
+    if snap is None:
+        with _init_lock:
+            if _snapshot is None:
+                refresh_categories(engine)
+        snap = _snapshot
+    return snap
+
+
+def current_category_version() -> int:
+    """Версия загруженного снимка без обращения к БД (0 — категории ещё не загружены)."""
+    snap = _snapshot
+    return snap.version if snap is not None else 0
+
+
+def load_categories(engine: Engine | None = None) -> list[dict[str, Any]]:
+    """Все категории текущего снимка: id, name, slug, parent_id."""
+    return get_category_snapshot(engine).categories
 
 
 def _build_children_map(categories: list[dict[str, Any]]) -> dict[int, list[int]]:
@@ -46,23 +161,68 @@ def _build_children_map(categories: list[dict[str, Any]]) -> dict[int, list[int]
     return m
 
 
-def get_descendant_ids(category_id: int, categories: list[dict[str, Any]] | None = None) -> list[int]:
-    """Возвращает [category_id] + все id подкатегорий (рекурсивно)."""
-    global _children_map
-    cats = categories or load_categories()
-    if _children_map is None:
-        _children_map = _build_children_map(cats)
+def _descendants(category_id: int, children_map: dict[int, list[int]]) -> list[int]:
     result = [category_id]
     stack = [category_id]
     while stack:
         pid = stack.pop()
-        for cid in _children_map.get(pid, []):
+        for cid in children_map.get(pid, []):
             result.append(cid)
             stack.append(cid)
     return result
 
 
+def get_descendant_ids(category_id: int, categories: list[dict[str, Any]] | None = None) -> list[int]:
+    """Возвращает [category_id] + все id подкатегорий (рекурсивно)."""
+    if categories is not None:
+        return _descendants(category_id, _build_children_map(categories))
+    ids = get_category_snapshot().descendants.get(category_id)
+    return list(ids) if ids is not None else [category_id]
+
+
 def get_children(category_id: int, categories: list[dict[str, Any]] | None = None) -> list[dict[str, Any]]:
     """Возвращает список дочерних категорий (только первый уровень) с полями id, name."""
-    cats = categories or load_categories()
-    return [{"id": c["id"], "name": c["name"]} for c in cats if c.get("parent_id") == category_id]
+    if categories is not None:
+        return [{"id": c["id"], "name": c["name"]} for c in categories if c.get("parent_id") == category_id]
+    return [dict(c) for c in get_category_snapshot().children.get(category_id, [])]
+
+
+class CategoryRefresher:
+    """
+    Фоновое обновление снимка категорий: раз в interval секунд или сразу после trigger().
+    Ошибки БД логируются, снимок при этом остаётся прежним.
+    """
+
+    def __init__(self, interval: float = CATEGORY_REFRESH_INTERVAL, engine: Engine | None = None):
+        self.interval = interval
+        self._engine = engine
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="category-refresh", daemon=True)
+            self._thread.start()
+
+    def trigger(self) -> None:
+        """Обновить вне расписания (например, после изменения каталога)."""
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval if self.interval > 0 else None)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                refresh_categories(self._engine)
+            except Exception as e:
+                logger.warning("Category refresh failed: %s", e)
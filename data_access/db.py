@@ -0,0 +1,95 @@
+"""
+Общий движок SQLAlchemy на процесс.
+Все загрузчики (каталог, категории, фоновая сборка индекса) берут соединения из одного пула,
+а не создают движок на каждый вызов — подключение и TLS к БД оплачиваются один раз.
+"""
+import logging
+import threading
+from typing import Any
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+from config import (
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_TIMEOUT_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+_engines: dict[str, Engine] = {}
+_counters: dict[str, dict[str, int]] = {}
+_lock = threading.Lock()
+
+
+def get_engine(url: str | None = None) -> Engine:
+    """Движок для url (по умолчанию DATABASE_URL); создаётся один раз и переиспользуется."""
+    url = url or DATABASE_URL
+    engine = _engines.get(url)
+    if engine is not None:
+        return engine
+    with _lock:
+        engine = _engines.get(url)
+        if engine is None:
+            engine = _create_engine(url)
+            _engines[url] = engine
+    return engine
+
+
+def _create_engine(url: str) -> Engine:
+    kwargs: dict[str, Any] = {"pool_pre_ping": True}
+    if make_url(url).get_backend_name() == "postgresql":
+        kwargs.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            kwargs["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    engine = create_engine(url, **kwargs)
+
+    counters = {"connects": 0, "checkouts": 0, "invalidated": 0}
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        counters["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        counters["checkouts"] += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_conn, record, exc):
+        counters["invalidated"] += 1
+
+    _counters[url] = counters
+    logger.info("Created DB engine for %s", engine.url.render_as_string(hide_password=True))
+    return engine
+
+
+def pool_stats() -> dict[str, dict[str, Any]]:
+    """Состояние пулов по движкам (пароль в ключе скрыт): размер, занятые/свободные соединения, счётчики."""
+    stats = {}
+    for url, engine in list(_engines.items()):
+        pool = engine.pool
+        entry: dict[str, Any] = {"pool": type(pool).__name__, **_counters.get(url, {})}
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            fn = getattr(pool, name, None)
+            if callable(fn):
+                entry[name] = fn()
+        stats[engine.url.render_as_string(hide_password=True)] = entry
+    return stats
+
+
+def dispose_engines() -> None:
+    """Закрывает все пулы (остановка сервиса, тесты)."""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _counters.clear()
@@ -3,55 +3,237 @@
 Запуск: python -m index.build_index (из корня AI_pospro) или из корня репо: python -m AI_pospro.index.build_index
 """
 import logging
+import queue
+import shutil
 import sys
+import threading
 from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import numpy as np
 
 # Корень AI_pospro в PYTHONPATH
 _root = Path(__file__).resolve().parent.parent
 if str(_root) not in sys.path:
     sys.path.insert(0, str(_root))
 
-from config import FAISS_INDEX_PATH, META_PATH
-from data_access.catalog_loader import load_catalog, build_search_text
-from index.faiss_store import add_vectors, save_index
+from config import BUILD_BATCH_SIZE, EMBEDDING_STORE_PATH, FAISS_INDEX_PATH, INDEX_BACKEND, INDEX_DIR
+from data_access.catalog_loader import build_search_text, iter_catalog
+from data_access.categories_loader import load_categories, refresh_categories
+from index.embedding_store import EmbeddingStore, embed_incremental
+from index.faiss_store import add_vectors, describe_index, save_index
+from index.lexical import LEXICAL_PATH, LexicalBuilder, save_lexical
+from index.partitions import PARTITIONS_PATH, CategoryPartitions, partition_order, save_partitions
+from index.staging import StagingWriter
+from index.versions import create_version_dir, gc_versions, publish, write_manifest
 from retrieval.embedder import Embedder
+from retrieval.runtime import get_runtime
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Сколько партий товаров загрузчик может опережать эмбеддинг
+_PREFETCH_BATCHES = 4
+# Как часто загрузчик, ждущий места в очереди, проверяет, не остановлен ли потребитель, сек
+_PUT_POLL_SECONDS = 0.1
+
+
+def _meta_item(item: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "product_id": item["id"],
+        "name": item["name"],
+        "price": item["price"],
+        "slug": item["slug"],
+        "image_url": item["image_url"],
+        "category_id": item["category_id"],
+        "category_name": item["category_name"],
+        "brand_id": item["brand_id"],
+        "brand_name": item["brand_name"],
+        "quantity": item["quantity"],
+    }
+
+
+def _field_texts(item: dict[str, Any]) -> dict[str, str]:
+    """Поля товара, по которым rerank поднимает совпадения с запросом."""
+    return {"name": item["name"], "category": item["category_name"], "specs": item["specs_text"]}
+
+
+def _prefetch_batches(items: Iterable[dict[str, Any]], batch_size: int) -> Iterator[list[dict[str, Any]]]:
+    """
+    Читает товары в отдельном потоке и отдаёт партии по batch_size:
+    пока одна партия кодируется, следующая уже загружается из БД.
+    Если потребитель остановился (ошибка эмбеддинга или записи), поток загрузчика завершается,
+    а источник закрывается — курсор iter_catalog отдаёт соединение в пул.
+    """
+    q: queue.Queue = queue.Queue(maxsize=_PREFETCH_BATCHES)
+    done = object()
+    stop = threading.Event()
+    source = iter(items)
+
+    def put(value: Any) -> bool:
+        """Кладёт в очередь, пока потребитель ждёт; False — потребитель остановился."""
+        while not stop.is_set():
+            try:
+                q.put(value, timeout=_PUT_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            batch: list[dict[str, Any]] = []
+            for item in source:
+                if stop.is_set():
+                    return
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch and not put(batch):
+                return
+            put(done)
+        except BaseException as e:
+            put(e)
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name="catalog-loader", daemon=True)
+    thread.start()
+    try:
+        while True:
+            batch = q.get()
+            if batch is done:
+                return
+            if isinstance(batch, BaseException):
+                raise batch
+            yield batch
+    finally:
+        stop.set()
+        thread.join(timeout=_PUT_POLL_SECONDS * 10)
+
+
+def build(
+    catalog: Iterable[dict[str, Any]] | None = None,
+    *,
+    categories: list[dict[str, Any]] | None = None,
+    embedder=None,
+    store: EmbeddingStore | None = None,
+    directory: Path | None = None,
+    backend: str = INDEX_BACKEND,
+) -> dict | None:
+    """
+    Загружает каталог, строит эмбеддинги и сохраняет индекс + мета.
+    Каталог читается потоково: загрузка из БД, сборка текстов и эмбеддинг партий идут одновременно,
+    векторы и метаданные сразу пишутся на диск. По тем же текстам строится лексический индекс BM25.
+    Векторы неизменившихся текстов берутся из хранилища эмбеддингов; кодируются только новые.
+    Параметры нужны для тестов и бенчмарков; по умолчанию — каталог из БД, модель и бэкенд из config, INDEX_DIR.
+    В INDEX_DIR сборка пишется новой версией (versions/<id> + manifest.json) и публикуется атомарной заменой
+    CURRENT: работающий сервис переключается на неё сам, старые версии удаляются. Явный directory — запись как есть.
+    Возвращает статистику сборки: products, reused, encoded (+ version для версионной сборки).
+    """
+    versioned = directory is None or directory == INDEX_DIR
+    root = INDEX_DIR
+    # Строки индекса упорядочиваем по дереву категорий: каждая ветка — непрерывный блок
+    if categories is None:
+        try:
+            refresh_categories()
+            categories = load_categories()
+        except Exception as e:
+            logger.warning("Categories not loaded, building without partitions: %s", e)
+            categories = []
+
+    embedder = embedder or Embedder()
+    if not versioned:
+        return _build_into(directory, catalog, categories, embedder, store, backend, manifest=False)
+
+    # Своя версия .tmp на каждую сборку: параллельные сборки (фоновая в сервисе и CLI) не делят staging
+    target = create_version_dir(root)
+    result = None
+    try:
+        result = _build_into(target, catalog, categories, embedder, store, backend, manifest=True)
+        if result is not None:
+            result["version"] = publish(target, root)
+    finally:
+        if result is None or "version" not in result:
+            # Пустая или упавшая сборка не оставляет каталог версии
+            shutil.rmtree(target, ignore_errors=True)
+    if result is None:
+        return None
+    gc_versions(root)
+    # Если сборка идёт внутри сервиса — подменяем резидентный индекс без перезапуска
+    # (другие процессы заметят новый CURRENT сами, см. IndexWatcher)
+    get_runtime().reload()
+    return result
+
+
+def _build_into(
+    target: Path,
+    catalog: Iterable[dict[str, Any]] | None,
+    categories: list[dict[str, Any]],
+    embedder,
+    store: EmbeddingStore | None,
+    backend: str,
+    *,
+    manifest: bool,
+) -> dict | None:
+    """Сборка в каталог target (промежуточные файлы — в target/staging). None — индексировать нечего."""
+    own_store = store is None
+    store = store or EmbeddingStore(EMBEDDING_STORE_PATH)
+    staging = StagingWriter(target / "staging")
+    lexical = LexicalBuilder()
+    stats = {"reused": 0, "encoded": 0}
+    non_empty = 0
+    try:
+        for batch in _prefetch_batches(catalog if catalog is not None else iter_catalog(), BUILD_BATCH_SIZE):
+            texts = [build_search_text(item) for item in batch]
+            non_empty += sum(1 for t in texts if t.strip())
+            lexical.add(texts, [_field_texts(item) for item in batch])
+            vectors, batch_stats = embed_incremental(texts, embedder, store, embedder.model_name)
+            staging.append(vectors, [_meta_item(item) for item in batch])
+            stats["reused"] += batch_stats["reused"]
+            stats["encoded"] += batch_stats["encoded"]
+            logger.info("Indexed %d products (%d reused, %d encoded)", staging.count, stats["reused"], stats["encoded"])
+
+        if staging.count == 0:
+            logger.warning("Catalog is empty, nothing to index")
+            return None
+        if non_empty == 0:
+            logger.warning("All search texts are empty")
+            return None
+
+        vectors, meta = staging.finish()
+        order = partition_order(meta, categories, id_field="product_id") if categories else None
+        if order is not None:
+            vectors = vectors[order]
+            meta = [meta[i] for i in order]
+        else:
+            vectors = np.array(vectors)
+    finally:
+        if own_store:
+            store.close()
+        staging.cleanup()
 
-def build() -> None:
-    """Загружает каталог, строит эмбеддинги и сохраняет индекс + мета."""
-    catalog = load_catalog()
-    if not catalog:
-        logger.warning("Catalog is empty, nothing to index")
-        return
-
-    texts = [build_search_text(item) for item in catalog]
-    if not any(t.strip() for t in texts):
-        logger.warning("All search texts are empty")
-        return
-
-    embedder = Embedder()
-    vectors = embedder.embed(texts)
-    meta = [
-        {
-            "product_id": item["id"],
-            "name": item["name"],
-            "price": item["price"],
-            "slug": item["slug"],
-            "image_url": item["image_url"],
-            "category_id": item["category_id"],
-            "category_name": item["category_name"],
-            "brand_id": item["brand_id"],
-            "brand_name": item["brand_name"],
-            "quantity": item["quantity"],
-        }
-        for item in catalog
-    ]
-    index = add_vectors(vectors, meta)
-    save_index(index, meta)
-    logger.info("Index built: %d products, path %s", len(meta), FAISS_INDEX_PATH)
+    logger.info("Embeddings: %d reused, %d encoded for %d products", stats["reused"], stats["encoded"], len(meta))
+    index = add_vectors(vectors, meta, backend=backend)
+    save_index(index, meta, directory=target)
+    partitions = CategoryPartitions.build([m["category_id"] for m in meta], categories) if categories else None
+    save_partitions(partitions, target / PARTITIONS_PATH.name)
+    save_lexical(lexical.finish(order), target / LEXICAL_PATH.name)
+    logger.info("Index built: %d products, path %s", len(meta), target / FAISS_INDEX_PATH.name)
+    if manifest:
+        write_manifest(
+            target,
+            products=len(meta),
+            dim=int(vectors.shape[1]),
+            model=embedder.model_name,
+            index=describe_index(index),
+            build=stats,
+        )
+    return {"products": len(meta), **stats}
 
 
 if __name__ == "__main__":
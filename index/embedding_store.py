@@ -0,0 +1,104 @@
+"""
+Постоянное хранилище эмбеддингов товаров по хешу текста: (модель, sha256(build_search_text)) -> вектор.
+Сборка индекса кодирует только новые/изменённые тексты, остальное берёт отсюда.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Ограничение SQLite на число параметров в одном запросе
+_SQL_CHUNK = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """SQLite-файл с векторами float32. Потокобезопасен (одно соединение под блокировкой)."""
+
+    def __init__(self, path: Path | str):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._db.commit()
+
+    def get_many(self, model_name: str, hashes: Iterable[str]) -> dict[str, np.ndarray]:
+        """Возвращает найденные векторы: text_hash -> (dim,)."""
+        hashes = list(hashes)
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(hashes), _SQL_CHUNK):
+                chunk = hashes[start:start + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model_name, *chunk],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model_name: str, items: dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model_name, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in items.items()],
+            )
+            self._db.commit()
+
+    def count(self, model_name: str | None = None) -> int:
+        with self._lock:
+            if model_name is None:
+                return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self._db.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model_name,)).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def embed_incremental(
+    texts: list[str],
+    embedder,
+    store: EmbeddingStore,
+    model_name: str,
+) -> tuple[np.ndarray, dict[str, int]]:
+    """
+    Векторы для texts (в том же порядке): из хранилища по хешу, недостающие — через embedder.embed.
+    Одинаковые тексты (варианты одного товара) кодируются один раз.
+    Возвращает (vectors (n, dim), {"reused": ..., "encoded": ..., "unique": ...}).
+    """
+    hashes = [text_hash(t) for t in texts]
+    unique_text: dict[str, str] = {}
+    for h, t in zip(hashes, texts):
+        unique_text.setdefault(h, t)
+
+    known = store.get_many(model_name, unique_text.keys())
+    missing = [h for h in unique_text if h not in known]
+    if missing:
+        encoded = embedder.embed([unique_text[h] for h in missing])
+        new_items = {h: encoded[i] for i, h in enumerate(missing)}
+        store.put_many(model_name, new_items)
+        known.update(new_items)
+
+    if hashes:
+        vectors = np.vstack([known[h] for h in hashes]).astype(np.float32)
+    else:
+        vectors = embedder.embed([])
+    stats = {"reused": len(unique_text) - len(missing), "encoded": len(missing), "unique": len(unique_text)}
+    return vectors, stats
@@ -1,6 +1,7 @@
 """
 Хранение и поиск по векторному индексу.
 Использует FAISS при наличии, иначе — numpy (brute-force), чтобы работало на Windows без faiss-cpu.
+Бэкенд выбирается AI_INDEX_BACKEND: flat (точный), hnsw / ivf_flat / ivf_pq (faiss), kmeans (numpy).
 """
 import json
 import logging
@@ -9,7 +10,23 @@ from typing import Any
 
 import numpy as np
 
-from config import FAISS_INDEX_PATH, META_PATH, INDEX_DIR
+from config import (
+    ANN_EXACT_ROWS,
+    FAISS_INDEX_PATH,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+    INDEX_BACKEND,
+    INDEX_DIR,
+    IVF_NLIST,
+    IVF_NPROBE,
+    META_PATH,
+    PQ_M,
+    VECTOR_MMAP,
+    VECTOR_STORAGE,
+)
+from index.numpy_index import KMeansIndex, NumpyIndex, _top_k
+from index.quantize import quantize_int8, to_float16
 
 logger = logging.getLogger(__name__)
 
@@ -22,86 +39,277 @@ except ImportError:
 
 # Для numpy-fallback храним векторы отдельно
 VECTORS_NPY_PATH = INDEX_DIR / "vectors.npy"
+# Сжатые копии векторов для numpy-индекса (AI_VECTOR_STORAGE=float16 / int8)
+VECTORS_F16_PATH = INDEX_DIR / "vectors_f16.npy"
+VECTORS_I8_PATH = INDEX_DIR / "vectors_i8.npy"
+VECTORS_I8_SCALE_PATH = INDEX_DIR / "vectors_i8_scale.npy"
+# Параметры сборки и поиска бэкенда (efSearch, nprobe и т.п.) и кластеры numpy-бэкенда kmeans
+INDEX_PARAMS_PATH = INDEX_DIR / "index_params.json"
+KMEANS_PATH = INDEX_DIR / "kmeans.npz"
 
-
-class NumpyIndex:
-    """Индекс на numpy: нормализованные векторы, поиск через dot product = cosine."""
-
-    def __init__(self, vectors: np.ndarray):
-        self.vectors = vectors.astype(np.float32)
-        self.ntotal = vectors.shape[0]
-
-    def search(self, query_vector: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
-        if query_vector.ndim == 1:
-            query_vector = query_vector.reshape(1, -1)
-        q = query_vector.astype(np.float32)
-        k = min(k, self.ntotal)
-        scores = np.dot(q, self.vectors.T)[0]
-        if k >= self.ntotal:
-            idx = np.argsort(scores)[::-1]
-            return scores[idx], idx
-        idx = np.argpartition(-scores, k)[:k]
-        idx = idx[np.argsort(-scores[idx])]
-        return scores[idx], idx
+BACKENDS = ("flat", "hnsw", "ivf_flat", "ivf_pq", "kmeans")
 
 
 def ensure_index_dir() -> None:
     INDEX_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def add_vectors(vectors: np.ndarray, meta: list[dict[str, Any]]):
+def add_vectors(vectors: np.ndarray, meta: list[dict[str, Any]], backend: str = INDEX_BACKEND):
     """
     Создаёт индекс из векторов (нормализованы для cosine).
-    Возвращает faiss.IndexFlatIP или NumpyIndex.
+    Возвращает faiss-индекс (IndexFlatIP, HNSW, IVF) или NumpyIndex / KMeansIndex.
     """
     if len(vectors) != len(meta):
         raise ValueError("vectors and meta length mismatch")
-    if HAS_FAISS:
-        index = faiss.IndexFlatIP(vectors.shape[1])
-        index.add(vectors.astype(np.float32))
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if backend not in BACKENDS:
+        logger.warning("Unknown index backend %r, using flat", backend)
+        backend = "flat"
+    if backend in ("hnsw", "ivf_flat", "ivf_pq") and not HAS_FAISS:
+        logger.warning("Backend %s needs faiss, using numpy kmeans instead", backend)
+        backend = "kmeans"
+    if backend == "kmeans":
+        return KMeansIndex.train(vectors, nlist=_nlist(len(vectors)), nprobe=IVF_NPROBE, exact_rows_max=ANN_EXACT_ROWS)
+    if not HAS_FAISS:
+        return NumpyIndex(vectors)
+    if backend != "flat":
+        try:
+            return _build_faiss_ann(vectors, backend)
+        except RuntimeError as e:
+            # Например, слишком мало точек для обучения IVF/PQ на маленьком каталоге
+            logger.warning("Failed to build %s index (%s), using flat", backend, e)
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    return index
+
+
+def flat_vectors(index) -> np.ndarray | None:
+    """
+    Матрица float32 (ntotal, dim) точного индекса — для скоров всех строк одним умножением
+    (пакетный поиск, повторные поиски в сессии): векторы NumpyIndex без сжатия или хранилище
+    faiss IndexFlatIP без копирования. None — индекс приближённый или сжатый (поиск только через search).
+    """
+    if type(index) is NumpyIndex:
+        return index.vectors if index.codes is None else None
+    if HAS_FAISS and isinstance(index, faiss.IndexFlat) and index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        try:
+            return faiss.rev_swig_ptr(index.get_xb(), index.ntotal * index.d).reshape(index.ntotal, index.d)
+        except (AttributeError, TypeError):
+            return None
+    return None
+
+
+def _nlist(n: int) -> int:
+    """Число кластеров IVF/kmeans: из настроек или ~4·sqrt(n), но не больше n/39 (нужно для обучения)."""
+    if IVF_NLIST > 0:
+        return IVF_NLIST
+    return max(1, min(int(4 * np.sqrt(n)), n // 39 or 1))
+
+
+def _build_faiss_ann(vectors: np.ndarray, backend: str):
+    dim = vectors.shape[1]
+    if backend == "hnsw":
+        index = faiss.index_factory(dim, f"HNSW{HNSW_M},Flat", faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.add(vectors)
+        index.hnsw.efSearch = HNSW_EF_SEARCH
         return index
-    return NumpyIndex(vectors)
+    nlist = _nlist(len(vectors))
+    spec = f"IVF{nlist},Flat" if backend == "ivf_flat" else f"IVF{nlist},PQ{PQ_M}"
+    index = faiss.index_factory(dim, spec, faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    index.add(vectors)
+    ivf = faiss.extract_index_ivf(index)
+    ivf.nprobe = IVF_NPROBE
+    ivf.make_direct_map()
+    return index
+
+
+def describe_index(index) -> dict[str, Any]:
+    """Бэкенд и параметры индекса (сохраняются рядом с ним в index_params.json)."""
+    if isinstance(index, KMeansIndex):
+        return index.params
+    if isinstance(index, NumpyIndex):
+        return {"backend": "flat", "storage": index.storage}
+    if hasattr(index, "hnsw"):
+        return {
+            "backend": "hnsw",
+            "M": HNSW_M,
+            "efConstruction": index.hnsw.efConstruction,
+            "efSearch": index.hnsw.efSearch,
+        }
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except (RuntimeError, AttributeError):
+        return {"backend": "flat"}
+    params = {"backend": "ivf_flat", "nlist": ivf.nlist, "nprobe": ivf.nprobe}
+    if isinstance(ivf, faiss.IndexIVFPQ):
+        params.update(backend="ivf_pq", pq_m=ivf.pq.M)
+    return params
+
 
+def apply_search_params(index, params: dict[str, Any]) -> None:
+    """Восстанавливает параметры поиска из index_params.json после загрузки."""
+    if HAS_FAISS and not isinstance(index, NumpyIndex):
+        if "efSearch" in params and hasattr(index, "hnsw"):
+            index.hnsw.efSearch = int(params["efSearch"])
+        if "nprobe" in params:
+            ivf = faiss.extract_index_ivf(index)
+            ivf.nprobe = int(params["nprobe"])
+            ivf.make_direct_map()
 
-def search(index, query_vector: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
-    """Поиск top-k. index — faiss.IndexFlatIP или NumpyIndex."""
+
+def search(
+    index, query_vector: np.ndarray, k: int, rows: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Поиск top-k. index — faiss.IndexFlatIP или NumpyIndex.
+    rows — массив допустимых строк (предфильтр по цене/категории/бренду/наличию): поиск идёт
+    только по ним, без перебора с запасом и последующей фильтрации.
+    """
+    if rows is not None and len(rows) == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
     if HAS_FAISS and hasattr(index, "ntotal") and not isinstance(index, NumpyIndex):
         if query_vector.ndim == 1:
             query_vector = query_vector.reshape(1, -1)
         query_vector = query_vector.astype(np.float32)
+        if rows is not None:
+            return _faiss_search_rows(index, query_vector, k, np.asarray(rows, dtype=np.int64))
         distances, indices = index.search(query_vector, min(k, index.ntotal))
         return distances[0], indices[0]
-    return index.search(query_vector, k)
+    return index.search(query_vector, k, rows=rows)
+
 
+def _faiss_search_rows(index, query_vector: np.ndarray, k: int, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    FAISS-поиск только по строкам rows: IDSelector внутри скана, иначе — точный перебор подмножества.
+    Для ANN-индексов небольшие наборы строк (до AI_ANN_EXACT_ROWS) считаются точно:
+    в nprobe кластерах / графе HNSW их может просто не оказаться.
+    """
+    k = min(k, len(rows))
+    is_ann = not isinstance(index, faiss.IndexFlat)
+    if not (is_ann and len(rows) <= ANN_EXACT_ROWS):
+        try:
+            sel = faiss.IDSelectorBatch(rows)
+            if hasattr(index, "hnsw"):
+                params = faiss.SearchParametersHNSW(sel=sel, efSearch=max(index.hnsw.efSearch, k))
+            elif is_ann:
+                params = faiss.SearchParametersIVF(sel=sel, nprobe=faiss.extract_index_ivf(index).nprobe)
+            else:
+                params = faiss.SearchParameters(sel=sel)
+            distances, indices = index.search(query_vector, k, params=params)
+            keep = indices[0] >= 0
+            return distances[0][keep], indices[0][keep]
+        except (AttributeError, TypeError, RuntimeError):
+            pass
+    # Точный перебор подмножества (и старый faiss без SearchParameters)
+    subset = index.reconstruct_batch(rows)
+    scores = subset @ query_vector[0]
+    idx = _top_k(scores, k)
+    return scores[idx], rows[idx]
 
-def save_index(index, meta: list[dict[str, Any]]) -> None:
-    """Сохраняет индекс и метаданные."""
-    ensure_index_dir()
-    with open(META_PATH, "w", encoding="utf-8") as f:
+
+def save_index(index, meta: list[dict[str, Any]], directory: Path | None = None) -> None:
+    """Сохраняет индекс и метаданные (по умолчанию в INDEX_DIR)."""
+    directory = directory or INDEX_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / META_PATH.name, "w", encoding="utf-8") as f:
         json.dump(meta, f, ensure_ascii=False, indent=2)
+    params = describe_index(index)
+    with open(directory / INDEX_PARAMS_PATH.name, "w", encoding="utf-8") as f:
+        json.dump(params, f)
     if HAS_FAISS and hasattr(index, "ntotal") and not isinstance(index, NumpyIndex):
-        faiss.write_index(index, str(FAISS_INDEX_PATH))
-        logger.info("Saved FAISS index (%d vectors) and meta to %s", index.ntotal, INDEX_DIR)
+        faiss.write_index(index, str(directory / FAISS_INDEX_PATH.name))
+        logger.info("Saved FAISS index (%d vectors, %s) and meta to %s", index.ntotal, params, directory)
     else:
-        np.save(str(VECTORS_NPY_PATH), index.vectors)
-        logger.info("Saved numpy index (%d vectors) and meta to %s", index.ntotal, INDEX_DIR)
+        np.save(str(directory / VECTORS_NPY_PATH.name), index.vectors)
+        if isinstance(index, KMeansIndex):
+            np.savez(
+                str(directory / KMEANS_PATH.name),
+                centroids=index.centroids, list_offsets=index.list_offsets, list_rows=index.list_rows,
+            )
+        else:
+            _save_quantized(index.vectors, directory)
+        logger.info("Saved numpy index (%d vectors, %s) and meta to %s", index.ntotal, params, directory)
+
+
+def _save_quantized(vectors: np.ndarray, directory: Path) -> None:
+    """Сжатая копия под AI_VECTOR_STORAGE, чтобы при загрузке её можно было отобразить в память."""
+    if VECTOR_STORAGE == "float16":
+        np.save(str(directory / VECTORS_F16_PATH.name), to_float16(vectors))
+    elif VECTOR_STORAGE == "int8":
+        codes, scale = quantize_int8(vectors)
+        np.save(str(directory / VECTORS_I8_PATH.name), codes)
+        np.save(str(directory / VECTORS_I8_SCALE_PATH.name), scale)
+
+
+def load_numpy_index(
+    directory: Path | None = None,
+    storage: str = VECTOR_STORAGE,
+    mmap: bool = VECTOR_MMAP,
+) -> NumpyIndex | None:
+    """
+    Загружает numpy-индекс. mmap=True — векторы отображаются в память только для чтения
+    (страницы общие для всех воркеров uvicorn). При сжатом хранении float32-файл отображается
+    всегда: он нужен лишь для пересчёта немногих кандидатов.
+    """
+    directory = directory or INDEX_DIR
+    path = directory / VECTORS_NPY_PATH.name
+    if not path.exists():
+        return None
+    params = load_index_params(directory)
+    kmeans_path = directory / KMEANS_PATH.name
+    if params.get("backend") == "kmeans" and kmeans_path.exists():
+        vectors = np.load(str(path), mmap_mode="r" if mmap else None)
+        with np.load(str(kmeans_path)) as km:
+            return KMeansIndex(
+                vectors, km["centroids"], km["list_offsets"], km["list_rows"],
+                nprobe=int(params.get("nprobe", IVF_NPROBE)), exact_rows_max=ANN_EXACT_ROWS,
+            )
+    mmap_mode = "r" if mmap or storage != "float32" else None
+    vectors = np.load(str(path), mmap_mode=mmap_mode)
+    if storage == "float16":
+        f16_path = directory / VECTORS_F16_PATH.name
+        codes = np.load(str(f16_path), mmap_mode="r" if mmap else None) if f16_path.exists() else to_float16(vectors)
+        return NumpyIndex(vectors, codes=codes)
+    if storage == "int8":
+        i8_path = directory / VECTORS_I8_PATH.name
+        scale_path = directory / VECTORS_I8_SCALE_PATH.name
+        if i8_path.exists() and scale_path.exists():
+            codes = np.load(str(i8_path), mmap_mode="r" if mmap else None)
+            scale = np.load(str(scale_path))
+        else:
+            codes, scale = quantize_int8(vectors)
+        return NumpyIndex(vectors, codes=codes, scale=scale)
+    return NumpyIndex(vectors)
+
+
+def load_index_params(directory: Path | None = None) -> dict[str, Any]:
+    path = (directory or INDEX_DIR) / INDEX_PARAMS_PATH.name
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
 
-def load_index() -> tuple[Any, list[dict[str, Any]]]:
-    """Загружает индекс и метаданные. Если файлов нет — (None, [])."""
-    if not META_PATH.exists():
-        logger.warning("Meta file not found at %s", META_PATH)
+def load_index(directory: Path | None = None) -> tuple[Any, list[dict[str, Any]]]:
+    """Загружает индекс и метаданные (по умолчанию из INDEX_DIR). Если файлов нет — (None, [])."""
+    directory = directory or INDEX_DIR
+    meta_path = directory / META_PATH.name
+    if not meta_path.exists():
+        logger.warning("Meta file not found at %s", meta_path)
         return None, []
-    with open(META_PATH, "r", encoding="utf-8") as f:
+    with open(meta_path, "r", encoding="utf-8") as f:
         meta = json.load(f)
-    if HAS_FAISS and FAISS_INDEX_PATH.exists():
-        index = faiss.read_index(str(FAISS_INDEX_PATH))
+    faiss_path = directory / FAISS_INDEX_PATH.name
+    if HAS_FAISS and faiss_path.exists():
+        index = faiss.read_index(str(faiss_path))
+        apply_search_params(index, load_index_params(directory))
         if index.ntotal != len(meta):
             logger.warning("Index size %d != meta size %d", index.ntotal, len(meta))
         return index, meta
-    if VECTORS_NPY_PATH.exists():
-        vectors = np.load(str(VECTORS_NPY_PATH))
-        index = NumpyIndex(vectors)
+    index = load_numpy_index(directory)
+    if index is not None:
         if index.ntotal != len(meta):
             logger.warning("Vectors rows %d != meta size %d", index.ntotal, len(meta))
         return index, meta
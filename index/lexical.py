@@ -0,0 +1,196 @@
+"""
+Лексический индекс BM25 по тем же текстам, что и эмбеддинги (build_search_text).
+Постинги хранятся компактно (CSR): для терма — отрезок массивов doc_ids / weights,
+вес BM25 каждой пары (терм, товар) считается один раз при загрузке, поиск — сумма весов по термам запроса.
+Нужен для точных совпадений (артикулы, коды моделей) и не зависит от порядка слов.
+Там же хранятся id термов полей товара (название, категория, характеристики) для rerank.
+"""
+import logging
+from pathlib import Path
+
+import numpy as np
+
+from config import INDEX_DIR
+from index.numpy_index import _top_k
+from retrieval.tokenizer import tokenize
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_PATH = INDEX_DIR / "lexical.npz"
+
+# Параметры BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Поля товара, для которых хранятся id термов (для rerank): название, категория, характеристики
+FIELDS = ("name", "category", "specs")
+
+
+class FieldTokens:
+    """Уникальные id термов одного поля по строкам индекса (CSR): строка i — ids[indptr[i]:indptr[i + 1]]."""
+
+    def __init__(self, indptr: np.ndarray, ids: np.ndarray):
+        self.indptr = indptr
+        self.ids = ids
+
+    def count_matches(self, rows: np.ndarray, term_ids: np.ndarray) -> np.ndarray:
+        """Сколько термов term_ids есть в поле каждой из строк rows."""
+        starts = self.indptr[rows]
+        lens = self.indptr[rows + 1] - starts
+        total = int(lens.sum())
+        if total == 0 or len(term_ids) == 0:
+            return np.zeros(len(rows), dtype=np.int64)
+        owner = np.repeat(np.arange(len(rows)), lens)
+        # Позиции токенов всех строк подряд: начало строки + смещение внутри неё
+        offsets = np.arange(total) - np.repeat(np.cumsum(lens) - lens, lens) + np.repeat(starts, lens)
+        hit = np.isin(self.ids[offsets], term_ids)
+        return np.bincount(owner[hit], minlength=len(rows))
+
+
+class LexicalBuilder:
+    """Накопление термов товаров при сборке (партиями, в порядке поступления)."""
+
+    def __init__(self):
+        self.vocab: dict[str, int] = {}
+        self._docs: list[tuple[np.ndarray, np.ndarray]] = []
+        self._fields: dict[str, list[np.ndarray]] = {f: [] for f in FIELDS}
+
+    def add(self, texts: list[str], fields: list[dict[str, str]] | None = None) -> None:
+        """texts — тексты для BM25; fields — тексты полей товара (name, category, specs) для rerank."""
+        for i, text in enumerate(texts):
+            counts: dict[int, int] = {}
+            for term in tokenize(text):
+                tid = self.vocab.setdefault(term, len(self.vocab))
+                counts[tid] = counts.get(tid, 0) + 1
+            self._docs.append((
+                np.fromiter(counts.keys(), dtype=np.int32, count=len(counts)),
+                np.fromiter(counts.values(), dtype=np.uint16, count=len(counts)),
+            ))
+            item_fields = fields[i] if fields is not None else {}
+            for f in FIELDS:
+                ids = {self.vocab.setdefault(t, len(self.vocab)) for t in tokenize(item_fields.get(f) or "")}
+                self._fields[f].append(np.array(sorted(ids), dtype=np.int32))
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def finish(self, order: list[int] | None = None) -> "BM25Index":
+        """order — перестановка товаров (строки индекса после partition_order); None — как добавлялись."""
+        docs = self._docs if order is None else [self._docs[i] for i in order]
+        n = len(docs)
+        lengths = np.array([len(t) for t, _ in docs], dtype=np.int64)
+        doc_ids = np.repeat(np.arange(n, dtype=np.int32), lengths)
+        term_ids = np.concatenate([t for t, _ in docs]) if n else np.zeros(0, dtype=np.int32)
+        tf = np.concatenate([c for _, c in docs]) if n else np.zeros(0, dtype=np.uint16)
+        doc_len = np.array([int(c.sum()) for _, c in docs], dtype=np.float32)
+        # Постинги по термам: стабильная сортировка сохраняет doc_ids по возрастанию внутри терма
+        by_term = np.argsort(term_ids, kind="stable")
+        indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.vocab)), out=indptr[1:])
+        vocab = np.array(sorted(self.vocab, key=self.vocab.get), dtype=str)
+        fields = {}
+        for f, per_doc in self._fields.items():
+            per_doc = per_doc if order is None else [per_doc[i] for i in order]
+            field_indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum([len(ids) for ids in per_doc], out=field_indptr[1:])
+            ids = np.concatenate(per_doc) if n else np.zeros(0, dtype=np.int32)
+            fields[f] = FieldTokens(field_indptr, ids)
+        return BM25Index(vocab, indptr, doc_ids[by_term], tf[by_term], doc_len, fields)
+
+
+class BM25Index:
+    """
+    vocab — термы (позиция = id), indptr — границы постингов терма, doc_ids / tf — строки индекса и частоты,
+    doc_len — число термов товара. weights — готовые веса BM25 для каждого постинга.
+    fields — id термов полей товара для rerank (пусто у индексов, собранных без полей).
+    """
+
+    def __init__(
+        self,
+        vocab: np.ndarray,
+        indptr: np.ndarray,
+        doc_ids: np.ndarray,
+        tf: np.ndarray,
+        doc_len: np.ndarray,
+        fields: dict[str, FieldTokens] | None = None,
+    ):
+        self.vocab = vocab
+        self.fields = fields or {}
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tf = tf
+        self.doc_len = doc_len
+        self.size = len(doc_len)
+        self._term_ids = {str(t): i for i, t in enumerate(vocab.tolist())}
+        self.weights = self._weights()
+
+    def _weights(self) -> np.ndarray:
+        if self.size == 0:
+            return np.zeros(0, dtype=np.float32)
+        df = np.diff(self.indptr).astype(np.float32)
+        idf = np.log1p((self.size - df + 0.5) / (df + 0.5))
+        avgdl = max(float(self.doc_len.mean()), 1.0)
+        term_of = np.repeat(np.arange(len(df)), np.diff(self.indptr))
+        tf = self.tf.astype(np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[self.doc_ids] / avgdl)
+        return (idf[term_of] * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+
+    def term_ids(self, terms: list[str]) -> np.ndarray:
+        """id известных индексу термов (без повторов); неизвестные пропускаются."""
+        ids = {self._term_ids[t] for t in terms if t in self._term_ids}
+        return np.array(sorted(ids), dtype=np.int32)
+
+    def scores(self, terms: list[str]) -> np.ndarray:
+        """BM25 всех строк для термов запроса (уже прошедших tokenize); 0 — нет совпадений."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(terms):
+            tid = self._term_ids.get(term)
+            if tid is None:
+                continue
+            lo, hi = self.indptr[tid], self.indptr[tid + 1]
+            # Внутри терма товар встречается один раз, поэтому сложение по индексам без np.add.at
+            scores[self.doc_ids[lo:hi]] += self.weights[lo:hi]
+        return scores
+
+    def search(
+        self, terms: list[str], k: int, rows: np.ndarray | None = None, scores: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k товаров по BM25 для термов запроса. rows — допустимые строки (предфильтр),
+        scores — уже посчитанные self.scores(terms) (повторный поиск с другими фильтрами).
+        Возвращает (scores, indices) как векторный search; товары без совпадений не попадают.
+        """
+        if scores is None:
+            scores = self.scores(terms)
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            candidates = rows[scores[rows] > 0]
+        else:
+            candidates = np.flatnonzero(scores)
+        sub = scores[candidates]
+        idx = _top_k(sub, min(k, len(sub)))
+        return sub[idx], candidates[idx]
+
+
+def save_lexical(index: BM25Index | None, path: Path = LEXICAL_PATH) -> None:
+    """Сохраняет лексический индекс рядом с векторным; None — удаляет устаревший файл."""
+    if index is None:
+        path.unlink(missing_ok=True)
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrays = {"vocab": index.vocab, "indptr": index.indptr, "doc_ids": index.doc_ids, "tf": index.tf, "doc_len": index.doc_len}
+    for f, tokens in index.fields.items():
+        arrays[f"{f}_indptr"] = tokens.indptr
+        arrays[f"{f}_ids"] = tokens.ids
+    np.savez(str(path), **arrays)
+    logger.info("Saved lexical index: %d terms, %d postings to %s", len(index.vocab), len(index.doc_ids), path)
+
+
+def load_lexical(path: Path = LEXICAL_PATH) -> BM25Index | None:
+    if not path.exists():
+        return None
+    with np.load(str(path)) as data:
+        fields = {
+            f: FieldTokens(data[f"{f}_indptr"], data[f"{f}_ids"]) for f in FIELDS if f"{f}_indptr" in data.files
+        }
+        return BM25Index(data["vocab"], data["indptr"], data["doc_ids"], data["tf"], data["doc_len"], fields)
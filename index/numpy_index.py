@@ -0,0 +1,183 @@
+"""
+Индексы на чистом numpy (без faiss): точный перебор NumpyIndex и грубое k-means-разбиение KMeansIndex.
+"""
+import logging
+
+import numpy as np
+
+from config import RESCORE_FACTOR
+from index.quantize import scan_scores
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк сканировать блоком при назначении кластеров
+_ASSIGN_BLOCK = 16384
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Позиции k наибольших scores по убыванию."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    idx = np.argpartition(-scores, k)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+class NumpyIndex:
+    """
+    Индекс на numpy: нормализованные векторы, поиск через dot product = cosine.
+    codes — сжатая копия (float16 или int8 + scale по измерениям): грубый скан идёт по ней,
+    затем top (k * rescore_factor) кандидатов пересчитываются точно по float32 vectors.
+    vectors может быть np.memmap — тогда с диска читаются только строки кандидатов.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        codes: np.ndarray | None = None,
+        scale: np.ndarray | None = None,
+        rescore_factor: int = RESCORE_FACTOR,
+    ):
+        # astype копирует всегда; memmap и готовый float32 используем как есть
+        self.vectors = vectors if vectors.dtype == np.float32 else vectors.astype(np.float32)
+        self.ntotal = vectors.shape[0]
+        self.codes = codes
+        self.scale = scale
+        self.rescore_factor = max(1, rescore_factor)
+
+    @property
+    def storage(self) -> str:
+        return "float32" if self.codes is None else str(self.codes.dtype)
+
+    def search(
+        self, query_vector: np.ndarray, k: int, rows: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Точный top-k. rows — допустимые строки по возрастанию (предфильтр): скоринг идёт только
+        по ним, поэтому результат — точный top-k среди прошедших фильтры.
+        """
+        if query_vector.ndim == 1:
+            query_vector = query_vector.reshape(1, -1)
+        q = query_vector.astype(np.float32)[0]
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+        if self.codes is not None:
+            return self._search_quantized(q, k, rows)
+        if rows is None:
+            scores = self.vectors @ q
+            idx = _top_k(scores, min(k, self.ntotal))
+            return scores[idx], idx
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+            # Непрерывный блок (ветка категорий): срез без копирования
+            scores = self.vectors[rows[0]:rows[-1] + 1] @ q
+        elif len(rows) * 2 > self.ntotal:
+            # Большая доля строк: одно умножение по всей матрице дешевле, чем сбор подмножества
+            scores = (self.vectors @ q)[rows]
+        else:
+            scores = self.vectors[rows] @ q
+        idx = _top_k(scores, min(k, len(rows)))
+        return scores[idx], rows[idx]
+
+    def _search_quantized(self, q: np.ndarray, k: int, rows: np.ndarray | None) -> tuple[np.ndarray, np.ndarray]:
+        qc = q * self.scale if self.scale is not None else q
+        coarse = scan_scores(self.codes, qc, rows)
+        n = len(coarse)
+        cand = _top_k(coarse, min(k * self.rescore_factor, n))
+        cand_rows = cand if rows is None else rows[cand]
+        # Пересчёт по float32: строки по возрастанию — последовательное чтение memmap
+        order = np.argsort(cand_rows)
+        exact = np.empty(len(cand_rows), dtype=np.float32)
+        exact[order] = self.vectors[cand_rows[order]] @ q
+        idx = _top_k(exact, min(k, len(exact)))
+        return exact[idx], cand_rows[idx]
+
+
+class KMeansIndex(NumpyIndex):
+    """
+    ANN на numpy: векторы разбиты сферическим k-means на nlist кластеров (как IVF в faiss).
+    Запрос сканирует только nprobe ближайших кластеров; небольшие отфильтрованные наборы строк
+    (до exact_rows_max) считаются точно.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_rows: np.ndarray,
+        nprobe: int = 8,
+        exact_rows_max: int = 20000,
+    ):
+        super().__init__(vectors)
+        self.centroids = centroids.astype(np.float32)
+        self.list_offsets = list_offsets.astype(np.int64)
+        self.list_rows = list_rows.astype(np.int64)
+        self.nprobe = nprobe
+        self.exact_rows_max = exact_rows_max
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def params(self) -> dict:
+        return {"backend": "kmeans", "nlist": self.nlist, "nprobe": self.nprobe}
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        nlist: int,
+        nprobe: int = 8,
+        iters: int = 10,
+        sample_size: int = 50_000,
+        seed: int = 0,
+        exact_rows_max: int = 20000,
+    ) -> "KMeansIndex":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        nlist = max(1, min(nlist, n))
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, size=min(sample_size, n), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iters):
+            assign = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Пустой кластер — новый центр из случайной точки выборки
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = (sums / np.where(norms == 0, 1, norms)).astype(np.float32)
+        assign = _assign(vectors, centroids)
+        list_rows = np.argsort(assign, kind="stable")
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        return cls(vectors, centroids, list_offsets, list_rows, nprobe=nprobe, exact_rows_max=exact_rows_max)
+
+    def search(
+        self, query_vector: np.ndarray, k: int, rows: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if rows is not None and len(rows) <= self.exact_rows_max:
+            return super().search(query_vector, k, rows=rows)
+        q = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        probe = _top_k(self.centroids @ q, min(self.nprobe, self.nlist))
+        cand = np.concatenate([self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe])
+        if rows is not None:
+            cand = cand[np.isin(cand, rows)]
+        if len(cand) < k:
+            # В ближайших кластерах мало строк — точный перебор вместо неполного ответа
+            return super().search(query_vector, k, rows=rows)
+        cand.sort()
+        scores = self.vectors[cand] @ q
+        idx = _top_k(scores, min(k, len(cand)))
+        return scores[idx], cand[idx]
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Номер ближайшего (по cosine) центра для каждой строки, блоками."""
+    out = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _ASSIGN_BLOCK):
+        block = np.asarray(vectors[start:start + _ASSIGN_BLOCK], dtype=np.float32)
+        out[start:start + _ASSIGN_BLOCK] = np.argmax(block @ centroids.T, axis=1)
+    return out
@@ -0,0 +1,165 @@
+"""
+Разбиение индекса по дереву категорий.
+При сборке строки индекса упорядочиваются обходом дерева в глубину, поэтому товары любой ветки
+лежат непрерывным блоком. Поиск внутри ветки сканирует только этот блок, а не весь каталог.
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from config import INDEX_DIR
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS_PATH = INDEX_DIR / "partitions.json"
+
+# Для скольких верхних уровней дерева хранить диапазон ветки и таблицу потомков (0 — корневые, 1 — средние)
+PARTITION_LEVELS = 2
+
+
+def _dfs_order(categories: list[dict[str, Any]]) -> tuple[dict[int, int], dict[int, int], dict[int, list[int]]]:
+    """(позиция категории в обходе, глубина, parent -> children) для дерева категорий."""
+    children: dict[int, list[int]] = {}
+    ids = {c["id"] for c in categories}
+    roots: list[int] = []
+    for c in categories:
+        pid = c.get("parent_id")
+        if pid is not None and pid in ids:
+            children.setdefault(pid, []).append(c["id"])
+        else:
+            roots.append(c["id"])
+    position: dict[int, int] = {}
+    depth: dict[int, int] = {}
+    stack = [(r, 0) for r in reversed(roots)]
+    while stack:
+        cid, d = stack.pop()
+        if cid in position:
+            continue
+        position[cid] = len(position)
+        depth[cid] = d
+        for ch in reversed(children.get(cid, [])):
+            stack.append((ch, d + 1))
+    return position, depth, children
+
+
+def partition_order(
+    catalog: list[dict[str, Any]], categories: list[dict[str, Any]], id_field: str = "id",
+) -> list[int]:
+    """
+    Перестановка товаров каталога: по позиции категории в обходе дерева, затем по id товара.
+    Товары без категории или с категорией вне дерева — в конце.
+    """
+    position, _, _ = _dfs_order(categories)
+    tail = len(position)
+
+    def key(i: int) -> tuple[int, int, int]:
+        cid = catalog[i].get("category_id")
+        return (position.get(cid, tail), cid if cid is not None else -1, catalog[i].get(id_field) or 0)
+
+    return sorted(range(len(catalog)), key=key)
+
+
+class CategoryPartitions:
+    """
+    own — собственный блок строк категории [start, end) (товары именно этой категории);
+    branches — блок всей ветки для категорий верхних уровней;
+    descendants — категория + все потомки для тех же категорий.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        own: dict[int, tuple[int, int]],
+        branches: dict[int, tuple[int, int]],
+        descendants: dict[int, list[int]],
+    ):
+        self.size = size
+        self.own = own
+        self.branches = branches
+        self.descendants = descendants
+        self._descendant_sets = {cid: frozenset(ids) for cid, ids in descendants.items()}
+
+    @classmethod
+    def build(cls, category_ids: list[int | None], categories: list[dict[str, Any]]) -> "CategoryPartitions":
+        """category_ids — category_id строк индекса, уже упорядоченных partition_order."""
+        own: dict[int, tuple[int, int]] = {}
+        start = 0
+        for i in range(1, len(category_ids) + 1):
+            if i == len(category_ids) or category_ids[i] != category_ids[start]:
+                cid = category_ids[start]
+                if cid is not None:
+                    own[cid] = (start, i)
+                start = i
+
+        position, depth, children = _dfs_order(categories)
+        branches: dict[int, tuple[int, int]] = {}
+        descendants: dict[int, list[int]] = {}
+        for cid, d in depth.items():
+            if d >= PARTITION_LEVELS:
+                continue
+            ids = [cid]
+            stack = [cid]
+            while stack:
+                for ch in children.get(stack.pop(), []):
+                    ids.append(ch)
+                    stack.append(ch)
+            descendants[cid] = ids
+            blocks = [own[i] for i in ids if i in own]
+            if blocks:
+                branches[cid] = (min(b[0] for b in blocks), max(b[1] for b in blocks))
+            else:
+                branches[cid] = (0, 0)
+        return cls(len(category_ids), own, branches, descendants)
+
+    def rows_for(self, category_ids: list[int]) -> np.ndarray:
+        """
+        Строки индекса для набора категорий. Целая ветка верхнего уровня — один непрерывный блок,
+        иначе — объединение собственных блоков категорий.
+        """
+        if category_ids:
+            first = category_ids[0]
+            branch = self.branches.get(first)
+            if branch is not None and self._descendant_sets[first] == frozenset(category_ids):
+                return np.arange(branch[0], branch[1], dtype=np.int64)
+        blocks = sorted(self.own[c] for c in set(category_ids) if c in self.own)
+        if not blocks:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.arange(s, e, dtype=np.int64) for s, e in blocks])
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "size": self.size,
+            "own": {str(k): list(v) for k, v in self.own.items()},
+            "branches": {str(k): list(v) for k, v in self.branches.items()},
+            "descendants": {str(k): v for k, v in self.descendants.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "CategoryPartitions":
+        return cls(
+            size=int(data["size"]),
+            own={int(k): (v[0], v[1]) for k, v in data["own"].items()},
+            branches={int(k): (v[0], v[1]) for k, v in data["branches"].items()},
+            descendants={int(k): v for k, v in data["descendants"].items()},
+        )
+
+
+def save_partitions(partitions: CategoryPartitions | None, path: Path = PARTITIONS_PATH) -> None:
+    """Сохраняет разбиение рядом с индексом; None — удаляет устаревший файл."""
+    if partitions is None:
+        path.unlink(missing_ok=True)
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(partitions.to_dict(), f)
+    logger.info("Saved %d category partitions to %s", len(partitions.branches), path)
+
+
+def load_partitions(path: Path = PARTITIONS_PATH) -> CategoryPartitions | None:
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return CategoryPartitions.from_dict(json.load(f))
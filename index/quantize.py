@@ -0,0 +1,51 @@
+"""
+Сжатое хранение векторов для numpy-индекса: float16 и int8 (скалярная квантизация по измерениям).
+Грубый скан идёт по сжатой матрице блоками, точный порядок top-k восстанавливается пересчётом по float32.
+"""
+import numpy as np
+
+# Строк в одном блоке скана: временная float32-копия блока ~ BLOCK_ROWS * dim * 4 байт
+BLOCK_ROWS = 16384
+
+STORAGE_TYPES = ("float32", "float16", "int8")
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Симметричная квантизация по измерениям: x[:, d] ≈ codes[:, d] * scale[d].
+    Возвращает (codes int8 (n, dim), scale float32 (dim,)).
+    """
+    n, dim = vectors.shape
+    max_abs = np.zeros(dim, dtype=np.float32)
+    for start in range(0, n, BLOCK_ROWS):
+        block = np.abs(np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32))
+        np.maximum(max_abs, block.max(axis=0), out=max_abs)
+    scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    codes = np.empty((n, dim), dtype=np.int8)
+    for start in range(0, n, BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+        codes[start:start + BLOCK_ROWS] = np.clip(np.rint(block / scale), -127, 127)
+    return codes, scale
+
+
+def to_float16(vectors: np.ndarray) -> np.ndarray:
+    return np.asarray(vectors).astype(np.float16)
+
+
+def scan_scores(codes: np.ndarray, q: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+    """
+    Приближённые скоры q · x по сжатой матрице (для int8 q уже умножен на scale).
+    rows — подмножество строк по возрастанию; считается блоками, без копии всей матрицы во float32.
+    """
+    if rows is None:
+        n = codes.shape[0]
+        out = np.empty(n, dtype=np.float32)
+        for start in range(0, n, BLOCK_ROWS):
+            out[start:start + BLOCK_ROWS] = codes[start:start + BLOCK_ROWS].astype(np.float32) @ q
+        return out
+    if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+        return scan_scores(codes[rows[0]:rows[-1] + 1], q)
+    out = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), BLOCK_ROWS):
+        out[start:start + BLOCK_ROWS] = codes[rows[start:start + BLOCK_ROWS]].astype(np.float32) @ q
+    return out
@@ -0,0 +1,59 @@
+"""
+Промежуточная запись сборки: векторы и метаданные дописываются на диск партиями по мере эмбеддинга,
+чтобы при потоковой сборке в памяти не копился весь каталог.
+"""
+import json
+import shutil
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+
+class StagingWriter:
+    """vectors.f32 — сырые float32 построчно, meta.jsonl — одна строка JSON на товар."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        if directory.exists():
+            shutil.rmtree(directory)
+        directory.mkdir(parents=True)
+        self._vectors_path = directory / "vectors.f32"
+        self._meta_path = directory / "meta.jsonl"
+        self._vectors = open(self._vectors_path, "wb")
+        self._meta = open(self._meta_path, "w", encoding="utf-8")
+        self.count = 0
+        self.dim: int | None = None
+
+    def append(self, vectors: np.ndarray, meta: list[dict[str, Any]]) -> None:
+        if len(vectors) != len(meta):
+            raise ValueError("vectors and meta length mismatch")
+        if len(meta) == 0:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"vector dim {vectors.shape[1]} != {self.dim}")
+        self._vectors.write(vectors.tobytes())
+        for m in meta:
+            self._meta.write(json.dumps(m, ensure_ascii=False))
+            self._meta.write("\n")
+        self.count += len(meta)
+
+    def finish(self) -> tuple[np.ndarray, list[dict[str, Any]]]:
+        """Закрывает файлы; векторы возвращаются как memmap (n, dim) только для чтения."""
+        self._vectors.close()
+        self._meta.close()
+        if self.count == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float32), []
+        vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = [json.loads(line) for line in f]
+        return vectors, meta
+
+    def cleanup(self) -> None:
+        for f in (self._vectors, self._meta):
+            if not f.closed:
+                f.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,192 @@
+"""
+Версии индекса на диске. Каждая сборка пишется в свой каталог INDEX_DIR/versions/<id>.tmp,
+получает manifest.json (размеры, модель, размерность, контрольные суммы файлов) и публикуется
+переименованием каталога и атомарной заменой указателя INDEX_DIR/CURRENT. Читатели открывают только
+опубликованные каталоги, которые больше не меняются: новая meta.json никогда не встречается со старыми векторами.
+Без CURRENT (индекс собран до версий) читается плоский INDEX_DIR, как раньше.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from config import FAISS_INDEX_PATH, INDEX_DIR, INDEX_KEEP_VERSIONS, META_PATH
+from index.faiss_store import (
+    INDEX_PARAMS_PATH,
+    KMEANS_PATH,
+    VECTORS_F16_PATH,
+    VECTORS_I8_PATH,
+    VECTORS_I8_SCALE_PATH,
+    VECTORS_NPY_PATH,
+)
+from index.lexical import LEXICAL_PATH
+from index.partitions import PARTITIONS_PATH
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+_TMP_SUFFIX = ".tmp"
+# Недописанные сборки старше этого удаляются при сборке мусора (упавший процесс сборки)
+_STALE_TMP_SECONDS = 24 * 3600
+
+# Файлы плоского INDEX_DIR до версий: удаляются после первой публикации версии
+_LEGACY_FILES = tuple(p.name for p in (
+    META_PATH, FAISS_INDEX_PATH, VECTORS_NPY_PATH, VECTORS_F16_PATH, VECTORS_I8_PATH, VECTORS_I8_SCALE_PATH,
+    INDEX_PARAMS_PATH, KMEANS_PATH, PARTITIONS_PATH, LEXICAL_PATH,
+))
+
+
+def create_version_dir(root: Path = INDEX_DIR) -> Path:
+    """Новый каталог для сборки: versions/<время UTC>.tmp (id сортируются по времени)."""
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    directory = root / VERSIONS_DIR / f"{version}{_TMP_SUFFIX}"
+    directory.mkdir(parents=True)
+    return directory
+
+
+def _version_name(directory: Path) -> str:
+    name = directory.name
+    return name[:-len(_TMP_SUFFIX)] if name.endswith(_TMP_SUFFIX) else name
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _write_atomic(path: Path, data: str) -> None:
+    tmp = path.with_name(path.name + _TMP_SUFFIX)
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def write_manifest(directory: Path, **info: Any) -> dict[str, Any]:
+    """manifest.json по всем файлам каталога: размер и sha256 каждого + переданные поля (products, model, dim, ...)."""
+    files = {
+        p.name: {"bytes": p.stat().st_size, "sha256": _sha256(p)}
+        for p in sorted(directory.iterdir())
+        if p.is_file() and p.name != MANIFEST_FILE
+    }
+    manifest = {
+        "version": _version_name(directory),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **info,
+        "files": files,
+    }
+    _write_atomic(directory / MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False, indent=2))
+    return manifest
+
+
+def read_manifest(directory: Path) -> dict[str, Any] | None:
+    path = directory / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def verify_version(directory: Path, checksums: bool = False) -> dict[str, Any]:
+    """
+    Проверяет каталог версии по манифесту: все файлы на месте и нужного размера
+    (checksums=True — ещё и sha256, это чтение всех файлов). ValueError — версия повреждена.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise ValueError(f"no {MANIFEST_FILE} in {directory}")
+    for name, expected in manifest["files"].items():
+        path = directory / name
+        if not path.exists():
+            raise ValueError(f"{name} is missing in {directory}")
+        if path.stat().st_size != expected["bytes"]:
+            raise ValueError(f"{name} size {path.stat().st_size} != {expected['bytes']} in {directory}")
+        if checksums and _sha256(path) != expected["sha256"]:
+            raise ValueError(f"{name} checksum mismatch in {directory}")
+    return manifest
+
+
+def publish(directory: Path, root: Path = INDEX_DIR) -> str:
+    """Делает собранную версию активной: каталог .tmp переименовывается, CURRENT атомарно заменяется."""
+    version = _version_name(directory)
+    final = directory.with_name(version)
+    if directory != final:
+        os.replace(directory, final)
+    _write_atomic(root / CURRENT_FILE, version + "\n")
+    logger.info("Published index version %s", version)
+    return version
+
+
+def current_version(root: Path = INDEX_DIR) -> str | None:
+    try:
+        return (root / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve_index_dir(root: Path = INDEX_DIR) -> tuple[str | None, Path]:
+    """(id активной версии, её каталог); без опубликованных версий — (None, root)."""
+    version = current_version(root)
+    if version is not None:
+        directory = root / VERSIONS_DIR / version
+        if directory.is_dir():
+            return version, directory
+        logger.warning("CURRENT points to missing index version %s", version)
+    return None, root
+
+
+def index_available(root: Path = INDEX_DIR) -> bool:
+    """Есть ли что загружать: опубликованная версия или индекс в плоском INDEX_DIR."""
+    version, directory = resolve_index_dir(root)
+    if version is not None:
+        return True
+    return (directory / META_PATH.name).exists() and (
+        (directory / FAISS_INDEX_PATH.name).exists() or (directory / VECTORS_NPY_PATH.name).exists()
+    )
+
+
+def gc_versions(root: Path = INDEX_DIR, keep: int = INDEX_KEEP_VERSIONS) -> list[str]:
+    """
+    Удаляет старые версии: остаются активная и самые новые до keep штук.
+    Запросы, ещё работающие со старым снимком, не ломаются: отображённые в память файлы остаются
+    доступны процессу до закрытия (на Windows такие каталоги не удалятся — повтор при следующей сборке).
+    """
+    versions_dir = root / VERSIONS_DIR
+    if not versions_dir.is_dir():
+        return []
+    current = current_version(root)
+    now = time.time()
+    published = sorted((p for p in versions_dir.iterdir() if p.is_dir() and not p.name.endswith(_TMP_SUFFIX)),
+                       key=lambda p: p.name, reverse=True)
+    keep_names = {current} | {p.name for p in published[:max(1, keep)]}
+    removed = []
+    for p in versions_dir.iterdir():
+        if not p.is_dir():
+            continue
+        if p.name.endswith(_TMP_SUFFIX):
+            if now - p.stat().st_mtime < _STALE_TMP_SECONDS:
+                continue  # сборка, возможно, ещё идёт
+        elif p.name in keep_names:
+            continue
+        shutil.rmtree(p, ignore_errors=True)
+        removed.append(p.name)
+    if current is not None:
+        for name in _LEGACY_FILES:
+            try:
+                (root / name).unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning("Could not remove legacy index file %s: %s", name, e)
+    if removed:
+        logger.info("Removed old index versions: %s", ", ".join(sorted(removed)))
+    return removed
@@ -0,0 +1 @@
+# observability
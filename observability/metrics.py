@@ -0,0 +1,135 @@
+"""
+Метрики сервиса в текстовом формате Prometheus (GET /metrics): гистограммы этапов из timing
+и размеров батчей эмбеддинга, gauges состояния — размер и возраст индекса, время загрузки модели,
+размеры кэшей, очереди /chat и планировщика батчей.
+Без prometheus_client: формат простой, а зависимость не нужна ради одного эндпоинта.
+"""
+import time
+from typing import Iterable
+
+from observability.timing import histograms
+
+PREFIX = "ai"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _histogram_lines() -> list[str]:
+    name = f"{PREFIX}_stage_duration_seconds"
+    lines = [
+        f"# HELP {name} Latency of /chat and search stages.",
+        f"# TYPE {name} histogram",
+    ]
+    for stage, hist in sorted(histograms().items()):
+        buckets, count, total_ms = hist.snapshot()
+        for le_ms, cumulative in buckets:
+            lines.append(f"{name}_bucket{_labels({'stage': stage, 'le': _fmt(le_ms / 1000)})} {cumulative}")
+        lines.append(f"{name}_bucket{_labels({'stage': stage, 'le': '+Inf'})} {count}")
+        lines.append(f"{name}_sum{_labels({'stage': stage})} {_fmt(total_ms / 1000)}")
+        lines.append(f"{name}_count{_labels({'stage': stage})} {count}")
+    return lines
+
+
+def embed_batcher_stats() -> dict | None:
+    """Статистика планировщика батчей эмбеддинга; None — модель не загружена или батчинг выключен."""
+    from retrieval.runtime import get_runtime
+    embedder = get_runtime().current_embedder()
+    stats = getattr(embedder, "batcher_stats", None)
+    return stats() if stats is not None else None
+
+
+def _batch_size_lines() -> list[str]:
+    stats = embed_batcher_stats()
+    if stats is None:
+        return []
+    name = f"{PREFIX}_embed_batch_size"
+    lines = [
+        f"# HELP {name} Queries per model call of the embedding batcher.",
+        f"# TYPE {name} histogram",
+    ]
+    # Корзины планировщика уже накопительные: le_N — батчи размером не больше N
+    for key, cumulative in stats["batch_size_histogram"].items():
+        le = "+Inf" if key == "le_inf" else key[len("le_"):]
+        lines.append(f"{name}_bucket{_labels({'le': le})} {cumulative}")
+    lines.append(f"{name}_sum {stats['items']}")
+    lines.append(f"{name}_count {stats['batches']}")
+    return lines
+
+
+def _gauges() -> Iterable[tuple[str, str, str, float | None, dict[str, str]]]:
+    """(имя, тип, описание, значение, метки); None — значение пока неизвестно (метрика пропускается)."""
+    from chat.pipeline import pipeline_stats
+    from chat.response_cache import get_response_cache
+    from data_access.categories_loader import current_category_version
+    from retrieval.query_cache import get_query_cache
+    from retrieval.runtime import get_runtime
+    from retrieval.warmup import get_warmup_state
+
+    runtime = get_runtime()
+    snap = runtime.current()
+    yield "ready", "gauge", "1 when the index and model are loaded and warmed up.", int(get_warmup_state().ready), {}
+    yield "index_size", "gauge", "Products in the loaded index snapshot.", snap.size if snap else 0, {}
+    yield "index_version", "gauge", "Version of the loaded index snapshot.", snap.version if snap else 0, {}
+    yield ("index_age_seconds", "gauge", "Seconds since the index snapshot was loaded.",
+           time.time() - snap.loaded_at if snap else None, {})
+    yield "index_load_seconds", "gauge", "Duration of the last index load.", runtime.index_load_seconds, {}
+    yield "model_load_seconds", "gauge", "Duration of the embedding model load.", runtime.embedder_load_seconds, {}
+    yield "categories_version", "gauge", "Version of the category snapshot.", current_category_version(), {}
+
+    for cache_name, cache in (("query_embedding", get_query_cache()), ("response", get_response_cache())):
+        if cache is None:
+            continue
+        stats = cache.stats()
+        labels = {"cache": cache_name}
+        yield "cache_items", "gauge", "Entries in the cache.", stats["size"], labels
+        yield "cache_max_items", "gauge", "Cache capacity in entries.", stats["max_size"], labels
+        if "bytes" in stats:
+            yield "cache_bytes", "gauge", "Bytes held by the cache.", stats["bytes"], labels
+        yield "cache_hits_total", "counter", "Cache hits.", stats["hits"], labels
+        yield "cache_misses_total", "counter", "Cache misses.", stats["misses"], labels
+        yield "cache_evictions_total", "counter", "Cache evictions.", stats["evictions"], labels
+
+    batcher = embed_batcher_stats()
+    if batcher is not None:
+        yield "embed_queue_depth", "gauge", "Queries waiting in the embedding batcher.", batcher["queue_depth"], {}
+
+    pipeline = pipeline_stats()
+    yield "chat_inflight", "gauge", "Chat requests in flight.", pipeline["inflight"], {}
+    yield "chat_rejected_total", "counter", "Chat requests rejected as overloaded.", pipeline["rejected"], {}
+    yield "chat_timed_out_total", "counter", "Chat requests past the deadline.", pipeline["timed_out"], {}
+    for stage, st in pipeline["stages"].items():
+        labels = {"stage": stage}
+        yield "stage_running", "gauge", "Pipeline stage tasks running.", st["running"], labels
+        yield "stage_waiting", "gauge", "Pipeline stage tasks waiting for a slot.", st["waiting"], labels
+
+
+def render_metrics() -> str:
+    lines = _histogram_lines() + _batch_size_lines()
+    # Все сэмплы одной метрики должны идти одной группой после её HELP/TYPE
+    families: dict[str, tuple[str, str, list[str]]] = {}
+    for short, kind, help_text, value, labels in _gauges():
+        if value is None:
+            continue
+        name = f"{PREFIX}_{short}"
+        family = families.setdefault(name, (kind, help_text, []))
+        family[2].append(f"{name}{_labels(labels)} {_fmt(value)}")
+    for name, (kind, help_text, samples) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,90 @@
+"""
+Замеры этапов запроса: span(name) пишет длительность в гистограмму этапа (для /metrics)
+и, если запрос трассируется (trace()), — в разбивку этого запроса (для заголовка Server-Timing).
+Трасса живёт в contextvar: в пул потоков её нужно передавать через contextvars.copy_context().run.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+# Верхние границы корзин гистограмм, мс
+BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Накопительная гистограмма латентности в формате Prometheus (корзины le, сумма, количество)."""
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.sum += ms
+            for i, le in enumerate(self.buckets):
+                if ms <= le:
+                    self.counts[i] += 1
+                    break
+
+    def snapshot(self) -> tuple[list[tuple[float, int]], int, float]:
+        """([(le, накопленное число наблюдений ≤ le), ...], count, sum) — согласованно под блокировкой."""
+        with self._lock:
+            cumulative, total = [], 0
+            for le, c in zip(self.buckets, self.counts):
+                total += c
+                cumulative.append((le, total))
+            return cumulative, self.count, self.sum
+
+
+_histograms: dict[str, Histogram] = {}
+_histograms_lock = threading.Lock()
+_trace: ContextVar[dict[str, float] | None] = ContextVar("stage_trace", default=None)
+
+
+def observe(stage: str, ms: float) -> None:
+    """Записывает длительность этапа в гистограмму и в трассу текущего запроса."""
+    hist = _histograms.get(stage)
+    if hist is None:
+        with _histograms_lock:
+            hist = _histograms.setdefault(stage, Histogram())
+    hist.observe(ms)
+    trace = _trace.get()
+    if trace is not None:
+        # Повторный этап (поиск без категории после пустого результата) суммируется
+        trace[stage] = trace.get(stage, 0.0) + ms
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, (time.perf_counter() - t0) * 1000)
+
+
+@contextmanager
+def trace() -> Iterator[dict[str, float]]:
+    """Трассирует этапы внутри блока: отдаёт dict этап -> мс, заполняемый по ходу запроса."""
+    stages: dict[str, float] = {}
+    token = _trace.set(stages)
+    try:
+        yield stages
+    finally:
+        _trace.reset(token)
+
+
+def server_timing(stages: dict[str, float]) -> str:
+    """Значение заголовка Server-Timing: «embed;dur=1.23, vector_search;dur=0.45»."""
+    return ", ".join(f"{name};dur={ms:.2f}" for name, ms in stages.items())
+
+
+def histograms() -> dict[str, Histogram]:
+    with _histograms_lock:
+        return dict(_histograms)
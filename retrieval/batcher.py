@@ -0,0 +1,122 @@
+"""
+Микро-батчинг эмбеддингов: запросы из параллельных потоков копятся несколько миллисекунд
+(или до размера батча) и кодируются одним вызовом модели. Каждый вызывающий получает свой вектор.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы размеров батча (накопительная, как в Prometheus: le_N — батчей размером <= N)
+_HISTOGRAM_BOUNDS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class EmbeddingBatcher:
+    """
+    Планировщик с одним рабочим потоком.
+    encode — функция «список текстов -> матрица (n, dim)», вызывается только из рабочего потока.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self._encode = encode
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: queue.Queue[tuple[str, Future] | None] = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self._histogram = {b: 0 for b in _HISTOGRAM_BOUNDS}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """Ставит текст в очередь; Future вернёт нормализованный вектор (dim,)."""
+        if self._closed:
+            raise RuntimeError("EmbeddingBatcher is closed")
+        fut: Future = Future()
+        self._queue.put((text, fut))
+        return fut
+
+    def embed_many(self, texts: List[str]) -> List[np.ndarray]:
+        """Ставит все тексты в очередь сразу (попадут в один батч) и ждёт результаты по порядку."""
+        futures = [self.submit(t) for t in texts]
+        return [f.result() for f in futures]
+
+    def close(self) -> None:
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            histogram = {f"le_{b}": n for b, n in self._histogram.items()}
+            histogram["le_inf"] = self.batches
+            return {
+                "queue_depth": self.queue_depth,
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "batch_size_histogram": histogram,
+            }
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch: list[tuple[str, Future]]) -> None:
+        # Одинаковые тексты в батче кодируются один раз
+        unique: dict[str, int] = {}
+        for text, _ in batch:
+            unique.setdefault(text, len(unique))
+        try:
+            vectors = self._encode(list(unique))
+        except Exception as e:
+            logger.exception("Batched embedding failed: %s", e)
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        for text, fut in batch:
+            fut.set_result(vectors[unique[text]])
+        self._record(len(batch))
+
+    def _record(self, size: int) -> None:
+        with self._stats_lock:
+            self.batches += 1
+            self.items += size
+            for b in _HISTOGRAM_BOUNDS:
+                if size <= b:
+                    self._histogram[b] += 1
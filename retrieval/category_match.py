@@ -2,44 +2,103 @@
 Определение категории по тексту запроса (холодильник → Холодильное оборудование и т.д.).
 """
 import logging
-import re
 from typing import Any
 
-from data_access.categories_loader import load_categories, get_children
+from data_access.categories_loader import load_categories
+from retrieval.tokenizer import query_words, words
 
 logger = logging.getLogger(__name__)
 
-# Слова запроса, не несущие типа товара
-STOPWORDS = {
-    "до", "для", "тысяч", "тыс", "бюджет", "млн", "миллион", "от", "и", "в", "на", "с", "по", "не",
-    "какой", "какая", "какие", "нужен", "нужна", "нужно", "хочу", "ищу", "подскажите", "кофейни", "кофейня",
-    "руб", "тг", "тенге", "цена", "стоимость", "примерно", "около",
-}
 
+def _query_terms(query: str) -> list[str]:
+    return query_words(query)
 
-def _normalize_word(w: str) -> str:
-    return w.lower().strip()
 
+def _category_terms(name: str) -> list[str]:
+    return [w for w in words(name) if len(w) >= 3]
 
-def _query_terms(query: str) -> list[str]:
-    text = re.sub(r"[^\w\s]", " ", query.lower())
-    return [w for w in text.split() if len(w) >= 3 and w not in STOPWORDS and not w.isdigit()]
 
+# Длина общего префикса, при которой слова считаются формами одного (холодильная/холодильное)
+MIN_PREFIX = 4
 
-def _category_terms(name: str) -> list[str]:
-    text = re.sub(r"[^\w\s]", " ", (name or "").lower())
-    return [w for w in text.split() if len(w) >= 3]
+
+def _substrings(word: str, min_len: int = 3) -> set[str]:
+    return {word[i:j] for i in range(len(word)) for j in range(i + min_len, len(word) + 1)}
+
+
+class CategoryMatcher:
+    """
+    Сопоставление запроса с категориями, построенное один раз на список категорий.
+    Слово запроса qt совпадает со словом названия ct, если одно — подстрока другого
+    или у обоих (длиной от MIN_PREFIX) общий префикс MIN_PREFIX. Для этого хранятся:
+    prefix — префикс -> категории, contains — подстрока слова категории -> категории,
+    terms — слово категории -> категории. Считаются только категории, найденные по этим таблицам.
+    Категории идентифицируются позицией в списке: при равном счёте побеждает более ранняя.
+    """
+
+    def __init__(self, categories: list[dict[str, Any]]):
+        self.categories = categories
+        self.is_parent: list[bool] = []
+        self.prefix: dict[str, set[int]] = {}
+        self.contains: dict[str, set[int]] = {}
+        self.terms: dict[str, set[int]] = {}
+        self.children: dict[int, list[dict[str, Any]]] = {}
+
+        parents = {c.get("parent_id") for c in categories if c.get("parent_id") is not None}
+        for pos, c in enumerate(categories):
+            self.is_parent.append(c["id"] in parents)
+            pid = c.get("parent_id")
+            if pid is not None:
+                self.children.setdefault(pid, []).append({"id": c["id"], "name": c["name"]})
+            for ct in set(_category_terms(c["name"])):
+                self.terms.setdefault(ct, set()).add(pos)
+                if len(ct) >= MIN_PREFIX:
+                    self.prefix.setdefault(ct[:MIN_PREFIX], set()).add(pos)
+                for sub in _substrings(ct):
+                    self.contains.setdefault(sub, set()).add(pos)
+
+    def _matching(self, qt: str) -> set[int]:
+        """Категории, у которых есть слово, совпадающее с qt."""
+        found = set(self.contains.get(qt, ()))
+        if len(qt) >= MIN_PREFIX:
+            found |= self.prefix.get(qt[:MIN_PREFIX], set())
+        for sub in _substrings(qt):
+            found |= self.terms.get(sub, set())
+        return found
+
+    def match(self, query: str) -> tuple[int | None, str | None, list[dict[str, Any]]]:
+        """Как match_query_to_category, но без обхода всех категорий."""
+        q_terms = _query_terms(query)
+        if not q_terms:
+            return None, None, []
+        # Счёт: сколько слов запроса совпадают со словами названия категории (повторы слов считаются)
+        scores: dict[int, int] = {}
+        matched: dict[str, set[int]] = {}
+        for qt in q_terms:
+            if qt not in matched:
+                matched[qt] = self._matching(qt)
+            for pos in matched[qt]:
+                scores[pos] = scores.get(pos, 0) + 1
+        if not scores:
+            return None, None, []
+        # Больше счёт лучше, при равенстве — родительская категория (чтобы искать по всей ветке), затем порядок в списке
+        best = min(scores, key=lambda pos: (-scores[pos], not self.is_parent[pos], pos))
+        c = self.categories[best]
+        return c["id"], c["name"], [dict(ch) for ch in self.children.get(c["id"], [])]
 
 
-def _words_match(qt: str, ct: str, min_prefix: int = 4) -> bool:
-    """Совпадение по подстроке или по общему префиксу (холодильная/холодильное, витрина/витрины)."""
-    if qt == ct:
-        return True
-    if qt in ct or ct in qt:
-        return True
-    if len(qt) >= min_prefix and len(ct) >= min_prefix and qt[:min_prefix] == ct[:min_prefix]:
-        return True
-    return False
+_matcher: CategoryMatcher | None = None
+
+
+def get_matcher() -> CategoryMatcher:
+    """Matcher для текущего списка категорий; пересобирается, только если список заменён."""
+    global _matcher
+    categories = load_categories()
+    matcher = _matcher
+    if matcher is None or matcher.categories is not categories:
+        matcher = CategoryMatcher(categories)
+        _matcher = matcher
+    return matcher
 
 
 def match_query_to_category(query: str) -> tuple[int | None, str | None, list[dict[str, Any]]]:
@@ -48,43 +107,6 @@ def match_query_to_category(query: str) -> tuple[int | None, str | None, list[di
     Возвращает (category_id, category_name, children) или (None, None, []).
     При равном счёте предпочитается родительская категория (чтобы искать по всей ветке).
     """
-    categories = load_categories()
-    if not categories:
-        return None, None, []
-
-    q_terms = _query_terms(query)
-    if not q_terms:
+    if not load_categories():
         return None, None, []
-
-    # Счёт: сколько слов запроса совпадают со словами названия категории (или наоборот)
-    scored: list[tuple[int, int, dict]] = []  # (score, is_parent, category)
-    children_map: dict[int, list[int]] = {}
-    for c in categories:
-        pid = c.get("parent_id")
-        if pid is not None:
-            children_map.setdefault(pid, []).append(c["id"])
-
-    for c in categories:
-        c_terms = _category_terms(c["name"])
-        if not c_terms:
-            continue
-        score = 0
-        for qt in q_terms:
-            for ct in c_terms:
-                if _words_match(qt, ct):
-                    score += 1
-                    break
-        if score > 0:
-            is_parent = 1 if c["id"] in children_map else 0
-            scored.append((score, is_parent, c))
-
-    if not scored:
-        return None, None, []
-
-    # Сортируем: сначала по score (больше лучше), затем предпочитаем родителя (is_parent=1)
-    scored.sort(key=lambda x: (-x[0], -x[1]))
-    best = scored[0][2]
-    cat_id = best["id"]
-    cat_name = best["name"]
-    children = get_children(cat_id, categories)
-    return cat_id, cat_name, children
+    return get_matcher().match(query)
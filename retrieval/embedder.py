@@ -1,33 +1,49 @@
 """
 Эмбеддинги через sentence-transformers, нормализация для косинусного поиска (FAISS Inner Product).
 """
+import importlib.util
 import logging
+import threading
+import time
 from typing import List
 
 import numpy as np
 
-from config import EMBEDDING_MODEL
+from config import EMBEDDING_MODEL, EMBED_BATCHING, EMBED_BATCH_SIZE, EMBED_BATCH_WAIT_MS
+from retrieval.batcher import EmbeddingBatcher
+from retrieval.query_cache import get_query_cache, normalize_query
 
 logger = logging.getLogger(__name__)
 
-try:
-    from sentence_transformers import SentenceTransformer
-    HAS_SENTENCE_TRANSFORMERS = True
-except ImportError:
-    HAS_SENTENCE_TRANSFORMERS = False
-    SentenceTransformer = None
+# sentence-transformers тянет torch и transformers (секунды на импорт): импортируется при загрузке модели,
+# а не при импорте модуля, чтобы сервис поднимался и отвечал на /health сразу
+HAS_SENTENCE_TRANSFORMERS = importlib.util.find_spec("sentence_transformers") is not None
 
-_model = None
+# Загруженные модели по имени: веса читаются с диска один раз на процесс
+_models: dict[str, object] = {}
+_models_lock = threading.Lock()
 
 
-def get_model():
-    global _model
-    if _model is None:
-        if not HAS_SENTENCE_TRANSFORMERS:
-            raise ImportError("sentence-transformers not installed. pip install sentence-transformers")
-        logger.info("Loading embedding model: %s", EMBEDDING_MODEL)
-        _model = SentenceTransformer(EMBEDDING_MODEL)
-    return _model
+def get_model(model_name: str | None = None):
+    name = model_name or EMBEDDING_MODEL
+    model = _models.get(name)
+    if model is not None:
+        return model
+    if not HAS_SENTENCE_TRANSFORMERS:
+        raise ImportError("sentence-transformers not installed. pip install sentence-transformers")
+    with _models_lock:
+        model = _models.get(name)
+        if model is None:
+            t0 = time.perf_counter()
+            from sentence_transformers import SentenceTransformer
+            t1 = time.perf_counter()
+            logger.info("Loading embedding model: %s", name)
+            model = SentenceTransformer(name)
+            _models[name] = model
+            logger.info(
+                "Embedding model %s ready: import %.2fs, load %.2fs", name, t1 - t0, time.perf_counter() - t1,
+            )
+    return model
 
 
 def normalize(vectors: np.ndarray) -> np.ndarray:
@@ -38,12 +54,34 @@ def normalize(vectors: np.ndarray) -> np.ndarray:
 
 
 class Embedder:
-    """Эмбеддер с нормализацией."""
+    """Эмбеддер с нормализацией. Модель общая для всех экземпляров с тем же именем."""
 
-    def __init__(self, model_name: str | None = None):
-        if not HAS_SENTENCE_TRANSFORMERS:
-            raise ImportError("sentence-transformers not installed. pip install sentence-transformers")
-        self.model = SentenceTransformer(model_name or EMBEDDING_MODEL)
+    def __init__(self, model_name: str | None = None, batching: bool = EMBED_BATCHING):
+        self.model_name = model_name or EMBEDDING_MODEL
+        self.model = get_model(self.model_name)
+        self._batching = batching
+        self._batcher: EmbeddingBatcher | None = None
+        self._batcher_lock = threading.Lock()
+
+    @property
+    def batcher(self) -> EmbeddingBatcher | None:
+        """Планировщик батчей запросов (создаётся при первом запросе, если батчинг включён)."""
+        if not self._batching:
+            return None
+        if self._batcher is None:
+            with self._batcher_lock:
+                if self._batcher is None:
+                    self._batcher = EmbeddingBatcher(
+                        self._encode_queries,
+                        max_batch_size=EMBED_BATCH_SIZE,
+                        max_wait_ms=EMBED_BATCH_WAIT_MS,
+                    )
+        return self._batcher
+
+    def batcher_stats(self) -> dict | None:
+        """Статистика планировщика батчей (очередь, размеры батчей); None — батчинг выключен или ещё не запускался."""
+        batcher = self._batcher
+        return batcher.stats() if batcher is not None else None
 
     def embed(self, texts: List[str]) -> np.ndarray:
         """Тексты -> нормализованные векторы (n, dim)."""
@@ -53,6 +91,36 @@ class Embedder:
         return normalize(vectors)
 
     def embed_query(self, query: str) -> np.ndarray:
-        """Один запрос -> вектор (dim,) нормализованный."""
-        v = self.model.encode([query], convert_to_numpy=True)
-        return normalize(v)[0]
+        """Один запрос -> вектор (dim,) нормализованный. Повторные формулировки берутся из кэша."""
+        return self.embed_queries([query])[0]
+
+    def embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """
+        Несколько запросов -> векторы в том же порядке.
+        Промахи кэша кодируются вместе (через планировщик батчей — заодно с запросами других потоков).
+        Нормализованный текст — только ключ кэша: в модель уходит исходный запрос.
+        """
+        keys = [normalize_query(q) for q in queries]
+        cache = get_query_cache()
+        out: List[np.ndarray | None] = [None] * len(keys)
+        missing: list[int] = []
+        for i, key in enumerate(keys):
+            cached = cache.get(self.model_name, key) if cache is not None else None
+            if cached is not None:
+                out[i] = cached
+            else:
+                missing.append(i)
+        if missing:
+            miss_texts = [queries[i] for i in missing]
+            # Пакет не меньше батча планировщика (пакетный поиск) кодируется сразу одним вызовом
+            batcher = self.batcher if len(miss_texts) < EMBED_BATCH_SIZE else None
+            if batcher is not None:
+                vectors = batcher.embed_many(miss_texts)
+            else:
+                vectors = list(self._encode_queries(miss_texts))
+            for i, v in zip(missing, vectors):
+                out[i] = cache.put(self.model_name, keys[i], v) if cache is not None else v
+        return out
+
+    def _encode_queries(self, texts: List[str]) -> np.ndarray:
+        return normalize(self.model.encode(texts, convert_to_numpy=True))
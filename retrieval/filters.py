@@ -4,9 +4,13 @@
 """
 from typing import Any
 
+import numpy as np
+
+from retrieval.meta_columns import MetaColumns
+
 
 def apply_filters(
-    meta: list[dict[str, Any]],
+    meta: list[dict[str, Any]] | MetaColumns,
     indices: list[int],
     scores: list[float],
     *,
@@ -17,7 +21,16 @@ def apply_filters(
     brand_id: int | None = None,
     in_stock_only: bool = False,
 ) -> tuple[list[int], list[float]]:
-    """Оставляет только те индексы, которые проходят фильтры; порядок по score сохраняется."""
+    """
+    Оставляет только те индексы, которые проходят фильтры; порядок по score сохраняется.
+    meta — список dict или MetaColumns (тогда фильтрация векторная, без обхода dict).
+    """
+    if isinstance(meta, MetaColumns):
+        return _apply_filters_columnar(
+            meta, indices, scores,
+            price_min=price_min, price_max=price_max, category_id=category_id, category_ids=category_ids,
+            brand_id=brand_id, in_stock_only=in_stock_only,
+        )
     out_idx: list[int] = []
     out_scores: list[float] = []
     for i, idx in enumerate(indices):
@@ -39,3 +52,17 @@ def apply_filters(
         out_idx.append(idx)
         out_scores.append(scores[i])
     return out_idx, out_scores
+
+
+def _apply_filters_columnar(
+    columns: MetaColumns,
+    indices: list[int],
+    scores: list[float],
+    **filters: Any,
+) -> tuple[list[int], list[float]]:
+    idx = np.asarray(indices, dtype=np.int64)
+    sc = np.asarray(scores, dtype=np.float64)
+    valid = (idx >= 0) & (idx < len(columns))
+    idx, sc = idx[valid], sc[valid]
+    keep = columns.mask(idx, **filters)
+    return idx[keep].tolist(), sc[keep].tolist()
@@ -0,0 +1,166 @@
+"""
+Живое обновление цен, остатков и видимости без пересборки индекса: один запрос к product
+(id, price, quantity, is_visible), патч колонок и meta в памяти и файл поверх версии индекса на диске.
+Векторы, BM25 и разбиение по категориям не трогаются. Новые товары появятся только после сборки.
+"""
+import io
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from sqlalchemy.engine import Engine
+
+from config import INDEX_DIR, STOCK_REFRESH_INTERVAL
+from retrieval.meta_columns import MetaColumns
+
+logger = logging.getLogger(__name__)
+
+# Последние цены/остатки рядом с CURRENT: применяются при загрузке той же версии индекса (рестарт сервиса).
+# Каталоги версий неизменяемы (manifest с размерами и sha256), поэтому meta.json не переписывается.
+LIVE_STOCK_FILE = "live_stock.npz"
+_ARRAYS = ("id", "price", "quantity", "visible")
+
+
+def apply_stock(
+    meta: list[dict[str, Any]],
+    columns: MetaColumns,
+    stock: dict[str, np.ndarray],
+) -> tuple[list[dict[str, Any]], MetaColumns, dict[str, int]]:
+    """
+    Накладывает stock (непустые массивы id, price, quantity, visible из fetch_stock) на строки индекса.
+    Исходные meta и columns не меняются: возвращаются копии, в meta заменены только изменённые dict.
+    Товар индекса, которого нет в stock, скрывается. Счётчики: сколько строк изменилось и почему.
+    """
+    n = len(columns)
+    ids = stock["id"]
+    order = np.argsort(ids, kind="stable")
+    sorted_ids = ids[order]
+    pos = np.minimum(np.searchsorted(sorted_ids, columns.product_id), len(ids) - 1)
+    found = sorted_ids[pos] == columns.product_id
+    src = order[pos]
+
+    old_price = np.fromiter((m.get("price") or 0 for m in meta), dtype=np.float64, count=n)
+    new_price = np.where(found, stock["price"][src], old_price)
+    new_quantity = np.where(found, stock["quantity"][src], columns.quantity).astype(np.int32)
+    visible = found & stock["visible"][src]
+    old_visible = np.ones(n, dtype=bool) if columns.visible is None else columns.visible
+
+    price_changed = new_price != old_price
+    quantity_changed = new_quantity != columns.quantity
+    visibility_changed = visible != old_visible
+    changed = price_changed | quantity_changed | visibility_changed
+    counts = {
+        "rows": n,
+        "changed": int(changed.sum()),
+        "price": int(price_changed.sum()),
+        "quantity": int(quantity_changed.sum()),
+        "visibility": int(visibility_changed.sum()),
+        "hidden": int(n - visible.sum()),
+        "missing": int(n - found.sum()),
+        # Видимые в БД, но не в индексе — попадут в поиск со следующей сборкой
+        "not_indexed": int(np.isin(ids[stock["visible"]], columns.product_id, invert=True).sum()),
+    }
+    if not counts["changed"]:
+        return meta, columns, counts
+
+    new_meta = list(meta)
+    for row in np.flatnonzero(price_changed | quantity_changed):
+        new_meta[row] = {**meta[row], "price": float(new_price[row]), "quantity": int(new_quantity[row])}
+    new_columns = columns.with_stock(
+        price=new_price.astype(np.float32),
+        quantity=new_quantity,
+        visible=None if visible.all() else visible,
+    )
+    return new_meta, new_columns, counts
+
+
+def save_live_stock(stock: dict[str, np.ndarray], index_version: str | None, root: Path = INDEX_DIR) -> Path:
+    """Атомарно пишет root/live_stock.npz для версии индекса index_version (None — плоский INDEX_DIR)."""
+    buf = io.BytesIO()
+    np.savez(buf, index_version=np.array(index_version or ""), **{k: stock[k] for k in _ARRAYS})
+    path = root / LIVE_STOCK_FILE
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(buf.getvalue())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def load_live_stock(index_version: str | None, root: Path = INDEX_DIR) -> dict[str, np.ndarray] | None:
+    """Сохранённые цены/остатки, если они сняты поверх этой же версии индекса; иначе None."""
+    path = root / LIVE_STOCK_FILE
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as data:
+            if str(data["index_version"]) != (index_version or ""):
+                return None
+            return {k: data[k] for k in _ARRAYS}
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Ignoring unreadable %s: %s", path, e)
+        return None
+
+
+def refresh_stock(runtime=None, engine: Engine | None = None) -> dict[str, int] | None:
+    """
+    Одно обновление: запрос к БД вне блокировок рантайма, затем патч текущего снимка
+    (SearchRuntime.update_stock). None — индекс ещё не загружен или БД вернула пустую таблицу.
+    """
+    from data_access.catalog_loader import fetch_stock
+    from retrieval.runtime import get_runtime
+
+    runtime = runtime or get_runtime()
+    if runtime.current() is None:
+        return None
+    t0 = time.perf_counter()
+    stock = fetch_stock(engine)
+    fetched = time.perf_counter() - t0
+    if not len(stock["id"]):
+        # Пустой ответ скорее означает не ту БД, чем пустой каталог: не скрываем весь индекс
+        logger.warning("Stock refresh: product table is empty, keeping current prices and stock")
+        return None
+    counts = runtime.update_stock(stock)
+    if counts is None:
+        return None
+    logger.info(
+        "Stock refresh: %d products from DB in %.2fs, %d of %d rows changed "
+        "(price %d, quantity %d, visibility %d), %d hidden, %d not indexed (%.2fs total)",
+        len(stock["id"]), fetched, counts["changed"], counts["rows"], counts["price"], counts["quantity"],
+        counts["visibility"], counts["hidden"], counts["not_indexed"], time.perf_counter() - t0,
+    )
+    return counts
+
+
+class StockRefresher:
+    """Фоновое обновление цен и остатков раз в interval секунд (0 — выключено). Ошибки БД только логируются."""
+
+    def __init__(self, interval: float = STOCK_REFRESH_INTERVAL, engine: Engine | None = None, runtime=None):
+        self.interval = interval
+        self._engine = engine
+        self._runtime = runtime
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="stock-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                refresh_stock(self._runtime, self._engine)
+            except Exception as e:
+                logger.warning("Stock refresh failed: %s", e)
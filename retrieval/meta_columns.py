@@ -0,0 +1,122 @@
+"""
+Колоночное представление метаданных индекса: типизированные массивы numpy вместо обхода списка dict.
+Фильтры по цене, категории, бренду и наличию считаются векторными масками по массиву кандидатов.
+"""
+import sys
+from typing import Any, Iterable
+
+import numpy as np
+
+# Отсутствующий category_id / brand_id (реальные id в БД положительные)
+MISSING_ID = -1
+
+# Строковые поля, которые держим в колонках (строки интернированы и общие с dict в meta)
+_STRING_FIELDS = ("name", "slug", "image_url", "category_name", "brand_name")
+
+
+def _ids(values: Iterable[Any]) -> np.ndarray:
+    return np.fromiter((MISSING_ID if v is None else int(v) for v in values), dtype=np.int32)
+
+
+class MetaColumns:
+    """
+    Метаданные построчно выровнены с векторами индекса: строка i — meta[i].
+    price float32, quantity/category_id/brand_id int32, строки — списки интернированных str.
+    visible — bool по строкам (None — видны все): товары, скрытые в БД после сборки, не проходят mask.
+    """
+
+    def __init__(
+        self,
+        product_id: np.ndarray,
+        price: np.ndarray,
+        quantity: np.ndarray,
+        category_id: np.ndarray,
+        brand_id: np.ndarray,
+        strings: dict[str, list[str]] | None = None,
+        visible: np.ndarray | None = None,
+    ):
+        self.product_id = product_id
+        self.price = price
+        self.quantity = quantity
+        self.category_id = category_id
+        self.brand_id = brand_id
+        self.strings = strings or {}
+        self.visible = visible
+
+    @classmethod
+    def from_meta(cls, meta: list[dict[str, Any]]) -> "MetaColumns":
+        strings: dict[str, list[str]] = {f: [] for f in _STRING_FIELDS}
+        for m in meta:
+            for f in _STRING_FIELDS:
+                v = m.get(f)
+                if isinstance(v, str):
+                    v = sys.intern(v)
+                    m[f] = v
+                strings[f].append(v or "")
+        return cls(
+            product_id=np.fromiter((m.get("product_id") or 0 for m in meta), dtype=np.int64, count=len(meta)),
+            price=np.fromiter((m.get("price") or 0 for m in meta), dtype=np.float32, count=len(meta)),
+            quantity=np.fromiter((m.get("quantity") or 0 for m in meta), dtype=np.int32, count=len(meta)),
+            category_id=_ids(m.get("category_id") for m in meta),
+            brand_id=_ids(m.get("brand_id") for m in meta),
+            strings=strings,
+        )
+
+    def with_stock(self, price: np.ndarray, quantity: np.ndarray, visible: np.ndarray | None) -> "MetaColumns":
+        """Копия с новыми ценами, остатками и видимостью; остальные колонки общие с исходной."""
+        return MetaColumns(
+            product_id=self.product_id,
+            price=price,
+            quantity=quantity,
+            category_id=self.category_id,
+            brand_id=self.brand_id,
+            strings=self.strings,
+            visible=visible,
+        )
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def column(self, name: str) -> list[str]:
+        return self.strings[name]
+
+    def mask(
+        self,
+        rows: np.ndarray | None = None,
+        *,
+        price_min: float | None = None,
+        price_max: float | None = None,
+        category_id: int | None = None,
+        category_ids: list[int] | np.ndarray | None = None,
+        brand_id: int | None = None,
+        in_stock_only: bool = False,
+    ) -> np.ndarray:
+        """
+        Булева маска прохождения фильтров для строк rows (или для всех строк, если rows=None).
+        Семантика та же, что у apply_filters: отсутствующая цена/остаток = 0.
+        """
+        n = len(self) if rows is None else len(rows)
+
+        def col(a: np.ndarray) -> np.ndarray:
+            return a if rows is None else a[rows]
+
+        keep = np.ones(n, dtype=bool) if self.visible is None else col(self.visible).copy()
+        if price_min is not None:
+            keep &= col(self.price) >= np.float32(price_min)
+        if price_max is not None:
+            keep &= col(self.price) <= np.float32(price_max)
+        if category_id is not None:
+            keep &= col(self.category_id) == category_id
+        if category_ids is not None:
+            keep &= np.isin(col(self.category_id), np.asarray(category_ids, dtype=np.int32))
+        if brand_id is not None:
+            keep &= col(self.brand_id) == brand_id
+        if in_stock_only:
+            keep &= col(self.quantity) > 0
+        return keep
+
+    def filter_rows(self, rows: np.ndarray, **filters: Any) -> np.ndarray:
+        """Кандидаты rows, прошедшие фильтры (порядок сохраняется). Индексы вне диапазона отбрасываются."""
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = rows[(rows >= 0) & (rows < len(self))]
+        return rows[self.mask(rows, **filters)]
@@ -0,0 +1,174 @@
+"""
+Кэш эмбеддингов запросов: нормализованный текст -> вектор.
+Память — LRU с TTL; опционально второй уровень на диске (SQLite), переживающий перезапуск.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from config import QUERY_CACHE_PATH, QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Ключ кэша: нижний регистр, схлопнутые пробелы («Моечная  ванна » -> «моечная ванна»)."""
+    return " ".join((query or "").lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Ограниченный кэш векторов запросов для одной модели.
+    Смена модели (другое model_name в get/put) очищает кэш в памяти: векторы разных моделей несовместимы.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 2048,
+        ttl_seconds: float = 86400,
+        disk_path: Path | str | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._items: OrderedDict[str, tuple[float, np.ndarray]] = OrderedDict()
+        self._model_name: str | None = None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._db: sqlite3.Connection | None = None
+        # Соединение SQLite — под своей блокировкой: чтение с диска и commit не держат _lock,
+        # который берут все попадания в память
+        self._db_lock = threading.Lock()
+        if disk_path:
+            path = Path(disk_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_vectors ("
+                "model TEXT NOT NULL, query TEXT NOT NULL, created REAL NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, query))"
+            )
+            self._db.commit()
+
+    def get(self, model_name: str, query: str) -> np.ndarray | None:
+        key = normalize_query(query)
+        now = self._clock()
+        with self._lock:
+            self._ensure_model(model_name)
+            item = self._items.get(key)
+            if item is not None:
+                created, vector = item
+                if now - created <= self.ttl_seconds:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._items[key]
+            if self._db is None:
+                self.misses += 1
+                return None
+        vector = self._disk_get(model_name, key, now)
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            # Пока читали диск, модель могла смениться — тогда вектор не кладём в память
+            if self._model_name == model_name:
+                self._remember(key, now, vector)
+            self.hits += 1
+            self.disk_hits += 1
+            return vector
+
+    def put(self, model_name: str, query: str, vector: np.ndarray) -> np.ndarray:
+        """Сохраняет вектор (копия только для чтения) и возвращает его. Запись на диск — вне блокировки памяти."""
+        key = normalize_query(query)
+        now = self._clock()
+        vector = np.array(vector, dtype=np.float32)
+        vector.flags.writeable = False
+        with self._lock:
+            self._ensure_model(model_name)
+            self._remember(key, now, vector)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_vectors (model, query, created, vector) VALUES (?, ?, ?, ?)",
+                    (model_name, key, now, vector.tobytes()),
+                )
+                self._db.commit()
+        return vector
+
+    def clear(self) -> None:
+        """Сбрасывает уровень в памяти (диск остаётся: ключи там содержат имя модели)."""
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _ensure_model(self, model_name: str) -> None:
+        if self._model_name != model_name:
+            if self._model_name is not None:
+                logger.info("Embedding model changed (%s -> %s), query cache cleared", self._model_name, model_name)
+            self._items.clear()
+            self._model_name = model_name
+
+    def _remember(self, key: str, created: float, vector: np.ndarray) -> None:
+        self._items[key] = (created, vector)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, model_name: str, key: str, now: float) -> np.ndarray | None:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT created, vector FROM query_vectors WHERE model = ? AND query = ?", (model_name, key)
+            ).fetchone()
+        if row is None or now - row[0] > self.ttl_seconds:
+            return None
+        vector = np.frombuffer(row[1], dtype=np.float32).copy()
+        vector.flags.writeable = False
+        return vector
+
+
+_cache: QueryEmbeddingCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> QueryEmbeddingCache | None:
+    """Кэш процесса по настройкам из config; None, если AI_QUERY_CACHE_SIZE=0."""
+    global _cache
+    if QUERY_CACHE_SIZE <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryEmbeddingCache(
+                    max_size=QUERY_CACHE_SIZE,
+                    ttl_seconds=QUERY_CACHE_TTL,
+                    disk_path=QUERY_CACHE_PATH or None,
+                )
+    return _cache
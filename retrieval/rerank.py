@@ -1,51 +1,68 @@
 """
-Рерайтинг результатов поиска: буст по совпадению ключевых слов запроса в названии товара.
+Рерайтинг результатов поиска: буст по совпадению термов запроса с полями товара.
+Термы полей (название, категория, характеристики) посчитаны при сборке индекса и хранятся как id,
+поэтому на запрос — только сравнение массивов id, без обработки строк товаров.
 Товары, в названии которых есть «холодильник», «кофемолка» и т.п., поднимаются выше.
 """
 import logging
-import re
 from typing import Any, List
 
+import numpy as np
+
+from index.lexical import BM25Index
+from retrieval.meta_columns import MetaColumns
+from retrieval.tokenizer import query_tokens
+
 logger = logging.getLogger(__name__)
 
-# Слова запроса, которые не считаем типом товара (фильтры, предлоги, числа)
-STOPWORDS = {
-    "до", "для", "тысяч", "тыс", "бюджет", "млн", "миллион", "от", "и", "в", "на", "с", "по", "не",
-    "что", "какой", "какая", "какие", "нужен", "нужна", "нужно", "хочу", "ищу", "подскажите",
-    "кофейни", "кофейня", "кофе", "магазин", "руб", "тг", "тенге",
-}
+# Вес одного совпавшего терма по полю: название важнее категории, категория — характеристик
+FIELD_BOOSTS = {"name": 3.0, "category": 2.0, "specs": 1.0}
 
 
-def _extract_product_terms(query: str) -> List[str]:
-    """Извлекает из запроса слова, похожие на тип товара (холодильник, кофемолка и т.д.)."""
-    text = re.sub(r"[^\w\s]", " ", query.lower())
-    words = text.split()
-    terms = []
-    for w in words:
-        w = w.strip()
-        if len(w) >= 4 and w not in STOPWORDS and not w.isdigit():
-            terms.append(w)
-    return terms
+def match_boosts(query: str, rows: np.ndarray, lexical: BM25Index) -> np.ndarray:
+    """Буст каждой строки rows: сумма по полям (число совпавших термов запроса × вес поля)."""
+    term_ids = lexical.term_ids(query_tokens(query))
+    boosts = np.zeros(len(rows), dtype=np.float64)
+    if len(term_ids) == 0:
+        return boosts
+    for field, weight in FIELD_BOOSTS.items():
+        tokens = lexical.fields.get(field)
+        if tokens is not None:
+            boosts += weight * tokens.count_matches(rows, term_ids)
+    return boosts
 
 
-def rerank(query: str, results: List[dict[str, Any]], top_k: int | None = None) -> List[dict[str, Any]]:
+def rerank(
+    query: str,
+    results: List[dict[str, Any]],
+    top_k: int | None = None,
+    *,
+    lexical: BM25Index | None = None,
+    columns: MetaColumns | None = None,
+) -> List[dict[str, Any]]:
     """
-    Переранжирование: товары, в названии которых есть ключевые слова запроса, поднимаются выше.
+    Переранжирование: сначала товары с большим бустом совпадений, внутри — по rank_score поиска
+    (балл слияния с BM25; у результатов без него — score).
+    lexical и columns — из снимка индекса, по которому искали результаты (строки — поле row).
+    Без токенов полей (старый индекс) или если снимок уже сменился — порядок по rank_score / score.
     """
     if not results:
         return []
-    terms = _extract_product_terms(query)
-    if not terms:
-        out = sorted(results, key=lambda x: x.get("score", 0), reverse=True)
-    else:
-        # Сначала товары, в названии которых есть ключевое слово (холодильник, кофемолка и т.д.), затем по score
-        out = sorted(
-            results,
-            key=lambda p: (
-                -(1 if any(t in (p.get("name") or "").lower() for t in terms) else 0),
-                -(p.get("score") or 0),
-            ),
-        )
+    scores = np.array([p.get("rank_score", p.get("score")) or 0 for p in results], dtype=np.float64)
+    boosts = np.zeros(len(results), dtype=np.float64)
+    rows = np.array([p.get("row", -1) for p in results], dtype=np.int64)
+    if lexical is not None and lexical.fields and columns is not None and _rows_match(rows, results, columns):
+        boosts = match_boosts(query, rows, lexical)
+    order = np.lexsort((-scores, -boosts))
+    out = [results[i] for i in order]
     if top_k is not None:
         out = out[:top_k]
     return out
+
+
+def _rows_match(rows: np.ndarray, results: List[dict[str, Any]], columns: MetaColumns) -> bool:
+    """Строки результатов указывают на те же товары в текущем снимке (индекс не пересобран между этапами)."""
+    if (rows < 0).any() or (rows >= len(columns.product_id)).any():
+        return False
+    ids = np.array([p.get("product_id") or 0 for p in results], dtype=np.int64)
+    return bool((columns.product_id[rows] == ids).all())
@@ -0,0 +1,269 @@
+"""
+Резидентный рантайм поиска: индекс, метаданные и модель эмбеддингов живут в памяти процесса.
+Загрузка с диска и модели — только на холодном пути (первое обращение, прогрев, пересборка).
+Снимок индекса неизменяем и заменяется атомарно: запросы читают его без блокировок.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Callable
+
+from config import INDEX_DIR, INDEX_WATCH_INTERVAL
+from index.faiss_store import load_index
+from index.lexical import LEXICAL_PATH, BM25Index, load_lexical
+from index.partitions import PARTITIONS_PATH, CategoryPartitions, load_partitions
+from index.versions import current_version, resolve_index_dir, verify_version
+from retrieval.embedder import Embedder
+from retrieval.live_stock import apply_stock, load_live_stock, save_live_stock
+from retrieval.meta_columns import MetaColumns
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """Индекс + метаданные одной сборки. Не меняется после создания."""
+    index: Any
+    meta: list[dict[str, Any]]
+    columns: MetaColumns
+    partitions: CategoryPartitions | None
+    lexical: BM25Index | None
+    version: int
+    loaded_at: float
+    # Версия на диске (каталог versions/<id>); None — плоский INDEX_DIR или свой загрузчик
+    index_version: str | None = None
+
+    @property
+    def size(self) -> int:
+        return len(self.meta)
+
+
+class SearchRuntime:
+    """
+    Общий для всех потоков FastAPI набор: снимок индекса и один эмбеддер.
+    snapshot() и embedder() на горячем пути — просто чтение атрибута.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], tuple[Any, list[dict[str, Any]]]] | None = None,
+        embedder_factory: Callable[[], Any] = Embedder,
+        partitions_loader: Callable[[], CategoryPartitions | None] | None = None,
+        lexical_loader: Callable[[], BM25Index | None] | None = None,
+        index_root: Path = INDEX_DIR,
+    ):
+        """
+        Загрузчики по умолчанию (None) читают все файлы из одного каталога — активной версии
+        в index_root (см. index.versions) или плоского index_root. Свои загрузчики — для тестов и бенчмарков.
+        """
+        self._index_root = index_root
+        self._loader = loader
+        self._partitions_loader = partitions_loader
+        self._lexical_loader = lexical_loader
+        self._embedder_factory = embedder_factory
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._snapshot: IndexSnapshot | None = None
+        self._embedder = None
+        self._version = 0
+        # Время последней загрузки снимка и модели, секунды (для /metrics)
+        self.index_load_seconds: float | None = None
+        self.embedder_load_seconds: float | None = None
+
+    def snapshot(self) -> IndexSnapshot | None:
+        """Текущий снимок; при первом обращении загружает индекс с диска. None — индекса ещё нет."""
+        snap = self._snapshot
+        if snap is not None:
+            return snap
+        with self._reload_lock:
+            if self._snapshot is None:
+                self._load_and_swap()
+            return self._snapshot
+
+    def current(self) -> IndexSnapshot | None:
+        """Текущий снимок без загрузки с диска (метрики, health)."""
+        return self._snapshot
+
+    def current_embedder(self):
+        """Эмбеддер, если модель уже загружена, без загрузки (метрики, health)."""
+        return self._embedder
+
+    def embedder(self):
+        """Общий эмбеддер процесса (модель загружается один раз)."""
+        emb = self._embedder
+        if emb is not None:
+            return emb
+        with self._lock:
+            if self._embedder is None:
+                t0 = time.perf_counter()
+                self._embedder = self._embedder_factory()
+                self.embedder_load_seconds = time.perf_counter() - t0
+                logger.info("Embedder ready in %.2fs", self.embedder_load_seconds)
+            return self._embedder
+
+    def reload(self) -> IndexSnapshot | None:
+        """Перечитывает индекс с диска и атомарно подменяет снимок. Текущие запросы дорабатывают со старым."""
+        with self._reload_lock:
+            return self._load_and_swap()
+
+    def update_stock(self, stock: dict[str, Any]) -> dict[str, int] | None:
+        """
+        Накладывает цены, остатки и видимость (массивы fetch_stock) на текущий снимок: новый снимок
+        со своей версией подменяет старый, векторы и индексы общие. Со своим загрузчиком на диск не пишет,
+        иначе сохраняет live_stock.npz — его подхватит следующая загрузка этой же версии.
+        None — снимка ещё нет.
+        """
+        with self._reload_lock:
+            snap = self._snapshot
+            if snap is None:
+                return None
+            meta, columns, counts = apply_stock(snap.meta, snap.columns, stock)
+            if meta is snap.meta:
+                return counts
+            with self._lock:
+                self._version += 1
+                self._snapshot = replace(snap, meta=meta, columns=columns, version=self._version)
+            if self._loader is None:
+                try:
+                    save_live_stock(stock, snap.index_version, self._index_root)
+                except OSError as e:
+                    logger.warning("Could not save live stock: %s", e)
+        return counts
+
+    def warm_up(self) -> None:
+        """Загружает индекс и модель заранее, чтобы первый запрос не платил за холодный старт."""
+        self.snapshot()
+        try:
+            self.embedder()
+        except ImportError as e:
+            logger.warning("Embedder not available: %s", e)
+
+    def _load_and_swap(self) -> IndexSnapshot | None:
+        t0 = time.perf_counter()
+        index_version, directory = resolve_index_dir(self._index_root)
+        if self._loader is not None:
+            index_version = None
+        elif index_version is not None:
+            try:
+                verify_version(directory)
+            except ValueError as e:
+                logger.error("Index version %s is damaged, keeping the current snapshot: %s", index_version, e)
+                return self._snapshot
+        index, meta = self._loader() if self._loader is not None else load_index(directory)
+        if index is None or not meta:
+            return self._snapshot
+        columns = MetaColumns.from_meta(meta)
+        stock = load_live_stock(index_version, self._index_root) if self._loader is None else None
+        if stock is not None:
+            # Цены и остатки новее сборки: последнее живое обновление поверх этой же версии
+            meta, columns, counts = apply_stock(meta, columns, stock)
+            logger.info("Applied saved live stock to %d of %d rows", counts["changed"], counts["rows"])
+        if self._partitions_loader is not None:
+            partitions = self._partitions_loader()
+        else:
+            partitions = load_partitions(directory / PARTITIONS_PATH.name)
+        if partitions is not None and partitions.size != len(meta):
+            logger.warning("Partitions size %d != meta size %d, ignoring partitions", partitions.size, len(meta))
+            partitions = None
+        if self._lexical_loader is not None:
+            lexical = self._lexical_loader()
+        else:
+            lexical = load_lexical(directory / LEXICAL_PATH.name)
+        if lexical is not None and lexical.size != len(meta):
+            logger.warning("Lexical index size %d != meta size %d, ignoring it", lexical.size, len(meta))
+            lexical = None
+        with self._lock:
+            self._version += 1
+            snap = IndexSnapshot(
+                index=index, meta=meta, columns=columns, partitions=partitions, lexical=lexical,
+                version=self._version, loaded_at=time.time(), index_version=index_version,
+            )
+            self._snapshot = snap
+            self.index_load_seconds = time.perf_counter() - t0
+        logger.info(
+            "Index snapshot v%d loaded: %d items from %s in %.2fs",
+            snap.version, snap.size, index_version or directory, self.index_load_seconds,
+        )
+        return snap
+
+
+_runtime: SearchRuntime | None = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> SearchRuntime:
+    """Рантайм поиска процесса (создаётся при первом обращении)."""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = SearchRuntime()
+    return _runtime
+
+
+def set_runtime(runtime: SearchRuntime | None) -> None:
+    """Подменяет рантайм процесса (тесты, бенчмарки). None — сбросить к созданию по умолчанию."""
+    global _runtime
+    with _runtime_lock:
+        _runtime = runtime
+
+
+class IndexWatcher:
+    """
+    Следит за INDEX_DIR/CURRENT: когда сборка (в этом или другом процессе) публикует новую версию,
+    рантайм перечитывает её и атомарно подменяет снимок. Запросы в работе дорабатывают со старым снимком.
+    Заодно повторяет неудачный прогрев, когда индекс появился (retry_warm_up).
+    """
+
+    def __init__(
+        self,
+        runtime: SearchRuntime | None = None,
+        interval: float = INDEX_WATCH_INTERVAL,
+        root: Path = INDEX_DIR,
+    ):
+        self._runtime = runtime
+        self.interval = interval
+        self.root = root
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._failed: str | None = None
+
+    def check(self) -> bool:
+        """Одна проверка; True — загружена новая версия. Версию, которую не удалось загрузить, не повторяет."""
+        runtime = self._runtime or get_runtime()
+        version = current_version(self.root)
+        snap = runtime.current()
+        if version is None or version == self._failed or (snap is not None and snap.index_version == version):
+            return False
+        logger.info("Index version %s published, reloading", version)
+        new = runtime.reload()
+        if new is not None and new.index_version == version:
+            return True
+        self._failed = version
+        return False
+
+    def start(self) -> None:
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="index-watch", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        from retrieval.warmup import retry_warm_up
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning("Index version check failed: %s", e)
+            try:
+                # /ready не должен навсегда остаться 503 после неудачного старта
+                retry_warm_up()
+            except Exception as e:
+                logger.warning("Warm-up retry failed: %s", e)
@@ -1,30 +1,279 @@
 """
 Поиск topK по индексу с фильтрами: цена, категория, бренд, наличие.
-Поддержка обращённого порядка слов («холодильная витрина» и «витрина холодильная» дают один результат).
+Векторный поиск дополняется лексическим (BM25): «холодильная витрина» и «витрина холодильная»
+находят одно и то же, артикулы и коды моделей совпадают напрямую.
 """
 import logging
-import re
-from typing import Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator
 
-from config import RETRIEVAL_TOP_K
-from index.faiss_store import load_index, search
-from retrieval.embedder import Embedder
-from retrieval.filters import apply_filters
+import numpy as np
+
+from config import BATCH_WORKERS, RETRIEVAL_TOP_K, RRF_K
+from index.faiss_store import _top_k, flat_vectors, search
+from observability.timing import span
+from retrieval.runtime import IndexSnapshot, get_runtime
+from retrieval.tokenizer import query_tokens
 
 logger = logging.getLogger(__name__)
 
-# Слова запроса, не несущие типа товара (для извлечения значимых слов)
-_STOPWORDS = {
-    "до", "для", "тысяч", "тыс", "бюджет", "млн", "миллион", "от", "и", "в", "на", "с", "по", "не",
-    "какой", "какая", "какие", "нужен", "нужна", "нужно", "хочу", "ищу", "подскажите", "кофейни", "кофейня",
-    "руб", "тг", "тенге", "цена", "стоимость", "примерно", "около",
-}
+# Элементов матрицы скоров (запросы × строки индекса) за один шаг пакетного поиска: ~128 МБ float32
+_BATCH_SCORE_ELEMENTS = 32 * 1024 * 1024
+
+
+def _fuse(
+    vector: tuple[list[int], list[float]], lexical: tuple[list[int], list[float]], k: int,
+) -> tuple[list[int], list[float]]:
+    """Reciprocal rank fusion: score = сумма 1 / (RRF_K + ранг) по спискам, где товар встретился."""
+    fused: dict[int, float] = {}
+    for indices, _ in (vector, lexical):
+        for rank, idx in enumerate(indices):
+            fused[idx] = fused.get(idx, 0.0) + 1.0 / (RRF_K + rank + 1)
+    order = sorted(fused, key=lambda i: -fused[i])[:k]
+    return order, [fused[i] for i in order]
+
+
+class SearchSession:
+    """
+    Поиск по одному запросу на одном снимке индекса: вектор запроса, термы и сырые скоры без фильтров
+    считаются один раз. Повторные вызовы search с другими фильтрами (поиск без категории после пустого
+    результата, ослабленный бюджет, «показать ещё») только заново фильтруют и берут top-k.
+    """
+
+    def __init__(self, query: str, snapshot: IndexSnapshot, query_vector: np.ndarray):
+        self.query = query
+        self.snapshot = snapshot
+        self.query_vector = query_vector
+        self.terms = query_tokens(query) if snapshot.lexical is not None else []
+        self._vector_scores: np.ndarray | None = None
+        self._lexical_scores: np.ndarray | None = None
+
+    @classmethod
+    def open(cls, query: str) -> "SearchSession | None":
+        """Сессия на текущем снимке; None — индекс не загружен или нет модели эмбеддингов."""
+        runtime = get_runtime()
+        with span("index_load"):
+            snapshot = runtime.snapshot()
+        if snapshot is None:
+            logger.warning("Index not loaded, returning empty results")
+            return None
+        try:
+            with span("model_load"):
+                embedder = runtime.embedder()
+        except ImportError as e:
+            logger.warning("Embedder not available: %s", e)
+            return None
+        with span("embed"):
+            query_vector = embedder.embed_query(query)
+        return cls(query, snapshot, query_vector)
+
+    def rows(
+        self,
+        *,
+        price_min: float | None = None,
+        price_max: float | None = None,
+        category_id: int | None = None,
+        category_ids: list[int] | None = None,
+        brand_id: int | None = None,
+        in_stock_only: bool = False,
+    ) -> np.ndarray | None:
+        """
+        Предфильтр: допустимые строки по колонкам метаданных (None — фильтров нет и все товары видны).
+        Скан индекса идёт только по ним, поэтому результат — точный top-k среди прошедших фильтры.
+        """
+        snapshot = self.snapshot
+        use_category_id = category_id if not category_ids else None
+        filters = {
+            "price_min": price_min,
+            "price_max": price_max,
+            "category_id": use_category_id,
+            "category_ids": category_ids,
+            "brand_id": brand_id,
+            "in_stock_only": in_stock_only,
+        }
+        if category_ids and snapshot.partitions is not None:
+            # Ветка категорий — готовый блок строк из разбиения; остальные фильтры только по нему
+            rows = snapshot.partitions.rows_for(category_ids)
+            filters["category_ids"] = None
+            return rows[snapshot.columns.mask(rows, **filters)]
+        if snapshot.columns.visible is not None or any(v not in (None, False) for v in filters.values()):
+            return np.flatnonzero(snapshot.columns.mask(**filters))
+        return None
+
+    def search(self, top_k: int = RETRIEVAL_TOP_K, *, offset: int = 0, **filters: Any) -> list[dict[str, Any]]:
+        """
+        Гибридный поиск с фильтрами (как search_products). offset — пропустить первые offset результатов
+        («показать ещё»): считается top (offset + top_k) и отрезается начало.
+        """
+        with span("filters"):
+            rows = self.rows(**filters)
+        if rows is not None and len(rows) == 0:
+            return []
+        k = offset + top_k
+        with span("vector_search"):
+            distances, indices = self._vector_top(k, rows)
+        indices_list = indices.tolist()
+        scores_list = distances.tolist()
+        # score в ответе — косинусная близость; порядок после слияния с BM25 — по rank_score
+        similarity = dict(zip(indices_list, scores_list))
+
+        # Лексический поиск по тем же строкам: точные слова и коды, порядок слов не важен
+        if self.terms:
+            with span("lexical_search"):
+                if self._lexical_scores is None:
+                    self._lexical_scores = self.snapshot.lexical.scores(self.terms)
+                lex_scores, lex_indices = self.snapshot.lexical.search(
+                    self.terms, k, rows=rows, scores=self._lexical_scores,
+                )
+                if len(lex_indices):
+                    indices_list, scores_list = _fuse(
+                        (indices_list, scores_list), (lex_indices.tolist(), lex_scores.tolist()), k,
+                    )
+        meta = self.snapshot.meta
+        ranked = [(i, sc) for i, sc in zip(indices_list, scores_list) if 0 <= i < len(meta)][offset:k]
+        missing = [i for i, _ in ranked if i not in similarity]
+        if missing:
+            # Найденные только BM25: близость считается по их векторам
+            similarity.update(zip(missing, self._similarities(missing)))
+        return _results(meta, [(i, similarity[i], sc) for i, sc in ranked])
+
+    def _similarities(self, rows: list[int]) -> list[float | None]:
+        """Косинусная близость запроса к строкам rows (векторы нормированы); None — индекс не отдаёт векторы."""
+        index = self.snapshot.index
+        idx = np.asarray(rows, dtype=np.int64)
+        if self._vector_scores is not None:
+            return self._vector_scores[idx].tolist()
+        q = np.asarray(self.query_vector, dtype=np.float32).reshape(-1)
+        try:
+            vectors = index.vectors[idx] if hasattr(index, "vectors") else index.reconstruct_batch(idx)
+        except (AttributeError, RuntimeError):
+            return [None] * len(rows)
+        return (np.asarray(vectors, dtype=np.float32) @ q).tolist()
+
+    def _vector_top(self, k: int, rows: np.ndarray | None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Векторный top-k. Для точного индекса (numpy float32 или faiss IndexFlatIP) скоры всех строк
+        считаются один раз (при первом поиске без фильтра или по большому набору строк) и дальше
+        переиспользуются; узкий блок (ветка категорий) сканируется напрямую — это дешевле полного скана.
+        """
+        index = self.snapshot.index
+        if self._vector_scores is None and (rows is None or len(rows) * 2 > index.ntotal):
+            vectors = flat_vectors(index)
+            if vectors is not None:
+                self._vector_scores = vectors @ np.asarray(self.query_vector, dtype=np.float32).reshape(-1)
+        if self._vector_scores is None:
+            return search(index, self.query_vector, k, rows=rows)
+        if rows is None:
+            idx = _top_k(self._vector_scores, min(k, len(self._vector_scores)))
+            return self._vector_scores[idx], idx
+        sub = self._vector_scores[rows]
+        idx = _top_k(sub, min(k, len(sub)))
+        return sub[idx], rows[idx]
+
+
+def open_sessions(queries: list[str]) -> Iterator[list[SearchSession]]:
+    """
+    Сессии для пакета запросов на одном снимке: все запросы кодируются одним вызовом модели,
+    для точного индекса (numpy float32 или faiss IndexFlatIP — см. flat_vectors) скоры считаются
+    одним матричным умножением на порцию запросов (порции ограничены _BATCH_SCORE_ELEMENTS).
+    Порции отдаются по очереди — память под скоры нужна только для текущей. Приближённые (HNSW, IVF,
+    kmeans) и сжатые индексы ищут по каждому запросу отдельно, в пуле потоков run_batch.
+    """
+    runtime = get_runtime()
+    snapshot = runtime.snapshot()
+    if snapshot is None:
+        logger.warning("Index not loaded, returning empty results")
+        return
+    try:
+        embedder = runtime.embedder()
+    except ImportError as e:
+        logger.warning("Embedder not available: %s", e)
+        return
+    with span("embed_batch"):
+        vectors = np.asarray(embedder.embed_queries(queries), dtype=np.float32).reshape(len(queries), -1)
+    index_vectors = flat_vectors(snapshot.index)
+    exact = index_vectors is not None
+    chunk = max(1, _BATCH_SCORE_ELEMENTS // max(len(index_vectors), 1)) if exact else max(len(queries), 1)
+    for start in range(0, len(queries), chunk):
+        qv = vectors[start:start + chunk]
+        sessions = [SearchSession(q, snapshot, v) for q, v in zip(queries[start:start + chunk], qv)]
+        if exact:
+            with span("vector_search_batch"):
+                scores = qv @ index_vectors.T
+            for session, row in zip(sessions, scores):
+                session._vector_scores = row
+        yield sessions
+
+
+def run_batch(
+    queries: list[str],
+    fn: Callable[[SearchSession, int], Any],
+    workers: int = BATCH_WORKERS,
+) -> list[Any]:
+    """
+    Для каждого запроса вызывает fn(session, позиция) — в пуле из workers потоков (numpy и faiss
+    отпускают GIL), результаты — в порядке запросов. Без индекса результат — None на позицию.
+    """
+    out: list[Any] = [None] * len(queries)
+    offset = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch-search") as pool:
+        for sessions in open_sessions(queries):
+            positions = range(offset, offset + len(sessions))
+            for pos, result in zip(positions, pool.map(fn, sessions, positions)):
+                out[pos] = result
+            offset += len(sessions)
+    return out
+
+
+def search_products_batch(
+    requests: list[dict[str, Any]],
+    top_k: int = RETRIEVAL_TOP_K,
+    workers: int = BATCH_WORKERS,
+) -> tuple[list[list[dict[str, Any]]], dict[str, Any]]:
+    """
+    Пакетный поиск: requests — [{"query": ..., фильтры как у search_products}, ...].
+    Возвращает (результаты в порядке запросов, сводку по времени пакета).
+    """
+    t0 = time.perf_counter()
+    queries = [r["query"] for r in requests]
 
+    def one(session: SearchSession, pos: int) -> list[dict[str, Any]]:
+        filters = {k: v for k, v in requests[pos].items() if k != "query"}
+        return session.search(top_k, **filters)
 
-def _query_terms(query: str) -> list[str]:
-    """Извлекает значимые слова из запроса (для обращённого варианта)."""
-    text = re.sub(r"[^\w\s]", " ", (query or "").lower())
-    return [w for w in text.split() if len(w) >= 3 and w not in _STOPWORDS and not w.isdigit()]
+    results = [r if r is not None else [] for r in run_batch(queries, one, workers)]
+    total_ms = (time.perf_counter() - t0) * 1000
+    timing = {
+        "queries": len(requests),
+        "workers": workers,
+        "total_ms": round(total_ms, 2),
+        "per_query_ms": round(total_ms / len(requests), 3) if requests else 0.0,
+    }
+    return results, timing
+
+
+def _results(
+    meta: list[dict[str, Any]], ranked: list[tuple[int, float | None, float]],
+) -> list[dict[str, Any]]:
+    """
+    Товары ответа: копия мета + строка индекса, score (косинусная близость, как в API),
+    rank_score (балл, по которому отсортирован поиск: RRF после слияния с BM25; для rerank, не для API),
+    ссылки на витрину и картинку.
+    """
+    from config import FRONTEND_BASE_URL, BACKEND_BASE_URL
+
+    results = []
+    for idx, similarity, rank_score in ranked:
+        m = meta[idx].copy()
+        m["row"] = idx
+        m["score"] = round(float(similarity), 4) if similarity is not None else None
+        m["rank_score"] = float(rank_score)
+        m["url"] = f"{FRONTEND_BASE_URL}/product/{m['slug']}" if m.get("slug") else ""
+        if m.get("image_url") and not m["image_url"].startswith("http"):
+            m["image_url"] = f"{BACKEND_BASE_URL}{m['image_url']}"
+        results.append(m)
+    return results
 
 
 def search_products(
@@ -39,74 +288,21 @@ def search_products(
     in_stock_only: bool = False,
 ) -> list[dict[str, Any]]:
     """
-    Векторный поиск по запросу с фильтрами.
+    Гибридный поиск по запросу с фильтрами: векторный top-k и BM25 top-k по тем же строкам,
+    объединённые reciprocal rank fusion (порядок — по rank_score, итоговому баллу слияния).
+    score — всегда косинусная близость запроса к товару; без лексического индекса — только векторный поиск.
     category_ids — список id категории и подкатегорий (поиск внутри ветки).
+    Для повторных поисков по тому же запросу — SearchSession.open(query).search(...).
     """
-    index, meta = load_index()
-    if index is None or not meta:
-        logger.warning("Index not loaded, returning empty results")
+    session = SearchSession.open(query)
+    if session is None:
         return []
-
-    try:
-        embedder = Embedder()
-    except ImportError as e:
-        logger.warning("Embedder not available: %s", e)
-        return []
-    qv = embedder.embed_query(query)
-    has_filters = price_min or price_max or category_id or category_ids or brand_id or in_stock_only
-    if category_ids:
-        k_search = min(max(top_k * 50, 1500), index.ntotal)
-    elif has_filters:
-        k_search = min(top_k * 5, index.ntotal)
-    else:
-        k_search = top_k
-    k_search = max(k_search, top_k)
-    distances, indices = search(index, qv, k_search)
-    indices_list = indices.tolist()
-    scores_list = distances.tolist()
-
-    # Обращённый порядок слов: «холодильная витрина» и «витрина холодильная» дают один объединённый результат
-    terms = _query_terms(query)
-    if len(terms) >= 2:
-        query_reversed = " ".join(reversed(terms))
-        if query_reversed != query.strip().lower():
-            qv2 = embedder.embed_query(query_reversed)
-            dist2, idx2 = search(index, qv2, k_search)
-            idx2_list = idx2.tolist()
-            scores2_list = dist2.tolist()
-            by_idx: dict[int, float] = {}
-            for i, idx in enumerate(indices_list):
-                by_idx[idx] = max(by_idx.get(idx, 0), scores_list[i])
-            for i, idx in enumerate(idx2_list):
-                by_idx[idx] = max(by_idx.get(idx, 0), scores2_list[i])
-            merged_idx = sorted(by_idx.keys(), key=lambda x: -by_idx[x])
-            merged_scores = [by_idx[x] for x in merged_idx]
-            indices_list = merged_idx
-            scores_list = merged_scores
-
-    use_category_id = category_id if not category_ids else None
-    filtered_idx, filtered_scores = apply_filters(
-        meta,
-        indices_list,
-        scores_list,
+    return session.search(
+        top_k,
         price_min=price_min,
         price_max=price_max,
-        category_id=use_category_id,
+        category_id=category_id,
         category_ids=category_ids,
         brand_id=brand_id,
         in_stock_only=in_stock_only,
     )
-    filtered_idx = filtered_idx[:top_k]
-    filtered_scores = filtered_scores[:top_k]
-
-    from config import FRONTEND_BASE_URL, BACKEND_BASE_URL
-
-    results = []
-    for idx, score in zip(filtered_idx, filtered_scores):
-        m = meta[idx].copy()
-        m["score"] = round(float(score), 4)
-        m["url"] = f"{FRONTEND_BASE_URL}/product/{m['slug']}" if m.get("slug") else ""
-        if m.get("image_url") and not m["image_url"].startswith("http"):
-            m["image_url"] = f"{BACKEND_BASE_URL}{m['image_url']}"
-        results.append(m)
-    return results
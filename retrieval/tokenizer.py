@@ -0,0 +1,53 @@
+"""
+Общая токенизация текста запросов и товаров: слова, служебные слова, термы лексического индекса.
+Используется при сборке индекса (BM25, токены полей товара) и в поиске, категориях и rerank.
+"""
+import re
+
+# Слова запроса, не несущие типа товара (фильтры, предлоги, вежливые обороты)
+STOPWORDS = frozenset({
+    "до", "для", "тысяч", "тыс", "бюджет", "млн", "миллион", "от", "и", "в", "на", "с", "по", "не",
+    "какой", "какая", "какие", "нужен", "нужна", "нужно", "хочу", "ищу", "подскажите", "кофейни", "кофейня",
+    "руб", "тг", "тенге", "цена", "стоимость", "примерно", "около",
+})
+
+# Буквенные слова длиннее обрезаются до префикса: грубый стемминг (холодильник / холодильная)
+STEM_LEN = 6
+
+# Слово или код из частей через - . / (RB-38, 220/380)
+_TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*")
+_SPLIT_RE = re.compile(r"[-./]")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+
+def words(text: str) -> list[str]:
+    """Слова текста в нижнем регистре, пунктуация — разделитель."""
+    return _PUNCT_RE.sub(" ", (text or "").lower()).split()
+
+
+def query_words(query: str, min_len: int = 3) -> list[str]:
+    """Значимые слова запроса: без служебных слов и чисел, не короче min_len."""
+    return [w for w in words(query) if len(w) >= min_len and w not in STOPWORDS and not w.isdigit()]
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Термы текста: нижний регистр, слова от 2 символов, буквенные слова обрезаны до STEM_LEN.
+    Составной код даёт и слитную форму (rb-38 -> rb38), и части.
+    """
+    out: list[str] = []
+    for m in _TOKEN_RE.finditer((text or "").lower()):
+        parts = _SPLIT_RE.split(m.group(0))
+        if len(parts) > 1:
+            out.append("".join(parts))
+        out.extend(parts)
+    return [t[:STEM_LEN] if t.isalpha() else t for t in out if len(t) >= 2]
+
+
+# Служебные слова в виде термов (обрезанные, как при tokenize)
+STOP_TERMS = frozenset(t for w in STOPWORDS for t in tokenize(w))
+
+
+def query_tokens(query: str) -> list[str]:
+    """Термы запроса для лексического поиска и rerank: без служебных слов и чисел (бюджет — это фильтр)."""
+    return [t for t in tokenize(query) if t not in STOP_TERMS and not t.isdigit()]
@@ -0,0 +1,154 @@
+"""
+Прогрев после старта сервиса: категории, индекс, модель и пробные запросы через весь поиск
+(первый вызов модели и первые сканы индекса заметно медленнее последующих).
+Прогресс по фазам отдаётся в /ready; готовность — только когда поиск полностью прогрет.
+Неудачный прогрев (сборка упала, версия повреждена, модель не загрузилась) повторяется
+из IndexWatcher, как только индекс загружен (retry_warm_up).
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+PHASES = ("categories", "index", "model", "inference")
+# Без категорий поиск работает (без подбора категории по запросу) — их сбой готовность не блокирует
+_REQUIRED = ("index", "model", "inference")
+
+# Пробные запросы: разные ветки каталога, с бюджетом и без
+WARMUP_QUERIES = (
+    "холодильная витрина до 500 тысяч",
+    "кофемашина для кофейни",
+    "весы с печатью этикеток",
+    "посудомоечная машина",
+)
+
+
+class WarmUpState:
+    """Статус фаз прогрева: pending / running / building / done / failed, длительность и ошибка."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Прогрев идёт в одном потоке за раз (фоновый старт и повтор из IndexWatcher)
+        self.running = threading.Lock()
+        self.started_at = time.time()
+        self.phases: dict[str, dict[str, Any]] = {p: {"status": "pending"} for p in PHASES}
+
+    def set_status(self, phase: str, status: str, **extra: Any) -> None:
+        with self._lock:
+            self.phases[phase] = {"status": status, **extra}
+
+    def run_phase(self, phase: str, fn: Callable[[], Any]) -> bool:
+        self.set_status(phase, "running")
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            seconds = time.perf_counter() - t0
+            self.set_status(phase, "failed", seconds=round(seconds, 3), error=str(e))
+            logger.warning("Startup phase %s failed after %.2fs: %s", phase, seconds, e)
+            return False
+        seconds = time.perf_counter() - t0
+        self.set_status(phase, "done", seconds=round(seconds, 3))
+        logger.info("Startup phase %s done in %.2fs", phase, seconds)
+        return True
+
+    @property
+    def ready(self) -> bool:
+        return all(self.phases[p]["status"] == "done" for p in _REQUIRED)
+
+    @property
+    def failed(self) -> bool:
+        return any(self.phases[p]["status"] == "failed" for p in _REQUIRED)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            phases = {p: dict(v) for p, v in self.phases.items()}
+        return {
+            "ready": all(phases[p]["status"] == "done" for p in _REQUIRED),
+            "since_start_s": round(time.time() - self.started_at, 1),
+            "phases": phases,
+        }
+
+
+def _load_index() -> None:
+    from retrieval.runtime import get_runtime
+    if get_runtime().snapshot() is None:
+        raise RuntimeError("index is not built yet")
+
+
+def _load_model() -> None:
+    from retrieval.runtime import get_runtime
+    get_runtime().embedder()
+
+
+def _warm_inference() -> None:
+    """Первый батч через модель и полный путь поиска: скан индекса, фильтры, BM25, подбор категории."""
+    from config import RETRIEVAL_TOP_K
+    from retrieval.category_match import match_query_to_category
+    from retrieval.runtime import get_runtime
+    from retrieval.search import SearchSession
+
+    runtime = get_runtime()
+    snapshot = runtime.snapshot()
+    if snapshot is None:
+        raise RuntimeError("index is not loaded")
+    # Напрямую в модель, мимо кэша векторов запросов: прогревается сам вызов модели,
+    # а пробные фразы не оседают в кэше (в том числе на диске)
+    vectors = runtime.embedder().embed(list(WARMUP_QUERIES))
+    for query, vector in zip(WARMUP_QUERIES, vectors):
+        try:
+            match_query_to_category(query)
+        except Exception as e:
+            logger.debug("Category match skipped during warm-up: %s", e)
+        session = SearchSession(query, snapshot, vector)
+        session.search(RETRIEVAL_TOP_K)
+        session.search(RETRIEVAL_TOP_K, in_stock_only=True)
+
+
+def warm_up(state: "WarmUpState | None" = None) -> bool:
+    """
+    Все фазы по очереди; True — поиск прогрет. Пропущенные из-за сбоя фазы остаются pending.
+    Если прогрев уже идёт в другом потоке — не ждёт его и возвращает текущую готовность.
+    """
+    state = state or get_warmup_state()
+    if not state.running.acquire(blocking=False):
+        return state.ready
+    try:
+        t0 = time.perf_counter()
+        from data_access.categories_loader import load_categories
+        state.run_phase("categories", load_categories)
+        ok = state.run_phase("index", _load_index) and state.run_phase("model", _load_model)
+        ok = ok and state.run_phase("inference", _warm_inference)
+        logger.info("Warm-up %s in %.2fs", "finished" if ok else "incomplete", time.perf_counter() - t0)
+        return ok
+    finally:
+        state.running.release()
+
+
+def retry_warm_up(state: "WarmUpState | None" = None) -> bool:
+    """
+    Повторяет прогрев, завершившийся сбоем, когда индекс уже загружен (новая версия после упавшей
+    сборки или повреждённой версии, временный сбой загрузки модели). True — поиск теперь прогрет.
+    Пока индекса нет, не повторяет: загрузкой новой версии занимается IndexWatcher.
+    """
+    from retrieval.runtime import get_runtime
+    state = state or get_warmup_state()
+    if state.ready or not state.failed or get_runtime().current() is None:
+        return False
+    logger.info("Retrying warm-up after a failed start")
+    return warm_up(state)
+
+
+_state: WarmUpState | None = None
+_state_lock = threading.Lock()
+
+
+def get_warmup_state() -> WarmUpState:
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                _state = WarmUpState()
+    return _state
@@ -0,0 +1,55 @@
+"""
+Тесты ANN-бэкендов: numpy kmeans и сохранение параметров поиска вместе с индексом.
+"""
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import numpy as np
+
+from index.faiss_store import add_vectors, describe_index, load_index, save_index, search
+from index.numpy_index import KMeansIndex, NumpyIndex
+from retrieval.embedder import normalize
+
+
+def _vectors(n=3000, dim=24, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(30, dim))
+    return normalize(centers[rng.integers(0, 30, n)] + 0.5 * rng.normal(size=(n, dim)))
+
+
+def test_kmeans_full_probe_is_exact():
+    vectors = _vectors()
+    index = KMeansIndex.train(vectors, nlist=20, nprobe=20, exact_rows_max=0)
+    exact = NumpyIndex(vectors)
+    for q in vectors[:20]:
+        assert index.search(q, 10)[1].tolist() == exact.search(q, 10)[1].tolist()
+    assert sorted(index.list_rows.tolist()) == list(range(len(vectors)))
+
+
+def test_kmeans_filtered_rows():
+    vectors = _vectors()
+    index = KMeansIndex.train(vectors, nlist=20, nprobe=4, exact_rows_max=100)
+    exact = NumpyIndex(vectors)
+    small = np.arange(0, 3000, 40)  # 75 строк — точный перебор
+    large = np.arange(0, 3000, 2)
+    q = vectors[7]
+    assert index.search(q, 5, rows=small)[1].tolist() == exact.search(q, 5, rows=small)[1].tolist()
+    _, got = index.search(q, 5, rows=large)
+    assert set(got.tolist()) <= set(large.tolist())
+
+
+def test_params_persisted(tmp_path):
+    vectors = _vectors(n=1000)
+    meta = [{"product_id": i} for i in range(len(vectors))]
+    index = add_vectors(vectors, meta, backend="kmeans")
+    index.nprobe = 3
+    save_index(index, meta, directory=tmp_path)
+    loaded, loaded_meta = load_index(tmp_path)
+    assert isinstance(loaded, KMeansIndex)
+    assert describe_index(loaded) == describe_index(index)
+    q = vectors[0]
+    assert search(loaded, q, 5)[1].tolist() == search(index, q, 5)[1].tolist()
@@ -0,0 +1,74 @@
+"""
+Тесты планировщика микро-батчей эмбеддингов.
+"""
+import sys
+import threading
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import numpy as np
+import pytest
+
+from retrieval.batcher import EmbeddingBatcher
+
+
+def _encode_len(texts):
+    return np.array([[float(len(t))] for t in texts], dtype=np.float32)
+
+
+def test_concurrent_requests_share_batches():
+    calls = []
+
+    def encode(texts):
+        calls.append(len(texts))
+        return _encode_len(texts)
+
+    batcher = EmbeddingBatcher(encode, max_batch_size=64, max_wait_ms=50)
+    texts = ["a" * (i + 1) for i in range(16)]
+    results: dict[str, float] = {}
+    barrier = threading.Barrier(len(texts))
+
+    def worker(t):
+        barrier.wait()
+        results[t] = float(batcher.submit(t).result()[0])
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in texts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert results == {t: float(len(t)) for t in texts}
+    assert sum(calls) == 16
+    assert len(calls) < 16
+    stats = batcher.stats()
+    assert stats["items"] == 16
+    assert stats["batch_size_histogram"]["le_inf"] == stats["batches"]
+
+
+def test_embed_many_keeps_order_and_dedupes():
+    seen = []
+
+    def encode(texts):
+        seen.append(list(texts))
+        return _encode_len(texts)
+
+    batcher = EmbeddingBatcher(encode, max_batch_size=8, max_wait_ms=20)
+    out = batcher.embed_many(["abc", "a", "abc"])
+    batcher.close()
+    assert [float(v[0]) for v in out] == [3.0, 1.0, 3.0]
+    assert seen == [["abc", "a"]]
+
+
+def test_errors_reach_callers():
+    def encode(texts):
+        raise RuntimeError("boom")
+
+    batcher = EmbeddingBatcher(encode, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher.submit("x").result(timeout=5)
+    batcher.close()
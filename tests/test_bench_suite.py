@@ -0,0 +1,37 @@
+"""
+Тест офлайн-набора бенчмарков: синтетический каталог проходит сборку, поиск и чат без БД и модели.
+"""
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+from benchmarks.bench_suite import run_suite
+from benchmarks.synthetic import HashingEmbedder, synthetic_catalog, synthetic_categories
+from data_access import categories_loader
+
+
+def test_synthetic_catalog_is_deterministic():
+    categories = synthetic_categories()
+    first = list(synthetic_catalog(200, categories, seed=3))
+    assert first == list(synthetic_catalog(200, categories, seed=3))
+    leaves = {c["id"] for c in categories} - {c["parent_id"] for c in categories}
+    assert all(item["category_id"] in leaves for item in first)
+
+    emb = HashingEmbedder(dim=32)
+    v = emb.embed(["холодильный шкаф", "холодильный шкаф", "кофемолка"])
+    assert v.shape == (3, 32)
+    assert (v[0] == v[1]).all() and float(v[0] @ v[2]) < 0.99
+
+
+def test_run_suite_reports_every_mix(tmp_path, monkeypatch):
+    monkeypatch.setattr(categories_loader, "_snapshot", None)
+    runs = run_suite([300], ["flat"], ["float32"], queries=4, chat_queries=2, dim=32, workdir=tmp_path)
+    assert len(runs) == 1
+    run = runs[0]
+    assert run["products"] == 300 and run["build"]["encoded"] == 300
+    assert set(run["search"]) == {"none", "branch", "leaf", "price", "brand_stock", "combined"}
+    assert run["search"]["none"]["count"] == 4 and run["chat"]["count"] == 2
+    assert run["memory"]["index_mb"] > 0
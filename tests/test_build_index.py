@@ -0,0 +1,90 @@
+"""
+Тесты потоковой сборки индекса: партии каталога, промежуточная запись, порядок по дереву категорий.
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import numpy as np
+
+import index.build_index as build_index
+from index.embedding_store import EmbeddingStore
+from index.faiss_store import load_index
+from index.lexical import load_lexical
+from retrieval.tokenizer import tokenize
+from index.partitions import load_partitions
+
+
+class _FakeEmbedder:
+    model_name = "fake"
+
+    def embed(self, texts):
+        return np.array([[float(len(t)), 1.0, 0.0] for t in texts], dtype=np.float32)
+
+
+def _item(pid: int, category_id: int) -> dict:
+    return {
+        "id": pid, "name": f"товар sku-{pid}", "description": "", "category_id": category_id,
+        "category_name": f"кат {category_id}", "brand_id": None, "brand_name": "", "price": 10.0 * pid,
+        "quantity": 1, "slug": f"p{pid}", "image_url": "", "specs_text": "",
+    }
+
+
+def test_streaming_build_orders_rows_by_category_tree(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_index, "BUILD_BATCH_SIZE", 3)
+    categories = [
+        {"id": 1, "name": "A", "parent_id": None},
+        {"id": 2, "name": "B", "parent_id": None},
+        {"id": 3, "name": "A1", "parent_id": 1},
+    ]
+    catalog = (_item(pid, cid) for pid, cid in [(1, 2), (2, 3), (3, 1), (4, 2), (5, 3), (6, 1), (7, 2)])
+    store = EmbeddingStore(tmp_path / "emb.sqlite")
+
+    stats = build_index.build(
+        catalog, categories=categories, embedder=_FakeEmbedder(), store=store, directory=tmp_path / "idx",
+    )
+    assert stats == {"products": 7, "reused": 0, "encoded": 7}
+    assert not (tmp_path / "idx" / "staging").exists()
+
+    index, meta = load_index(tmp_path / "idx")
+    assert [m["product_id"] for m in meta] == [3, 6, 2, 5, 1, 4, 7]
+    assert index.ntotal == 7
+    partitions = load_partitions(tmp_path / "idx" / "partitions.json")
+    assert partitions.rows_for([1, 3]).tolist() == [0, 1, 2, 3]
+    # Лексический индекс в том же порядке строк, что векторы
+    lexical = load_lexical(tmp_path / "idx" / "lexical.npz")
+    _, rows = lexical.search(tokenize("SKU-5"), 1)
+    assert meta[rows[0]]["product_id"] == 5
+
+    # Повторная сборка того же каталога ничего не кодирует
+    stats = build_index.build(
+        [_item(1, 2)], categories=categories, embedder=_FakeEmbedder(), store=store, directory=tmp_path / "idx",
+    )
+    assert stats == {"products": 1, "reused": 1, "encoded": 0}
+
+
+def test_prefetch_stops_loader_when_consumer_fails(monkeypatch):
+    monkeypatch.setattr(build_index, "_PREFETCH_BATCHES", 1)
+    closed = []
+
+    def source():
+        try:
+            for pid in range(1000):
+                yield _item(pid, 1)
+        finally:
+            closed.append(True)
+
+    batches = build_index._prefetch_batches(source(), 2)
+    next(batches)
+    time.sleep(0.05)  # загрузчик заполнил очередь и ждёт места
+    loader = next(t for t in threading.enumerate() if t.name == "catalog-loader")
+    # Ошибка потребителя (эмбеддинг, запись staging) закрывает генератор партий
+    batches.close()
+    loader.join(timeout=2)
+    assert not loader.is_alive()
+    assert closed == [True]
@@ -0,0 +1,67 @@
+"""
+Тесты загрузки каталога одним запросом на SQLite вместо PostgreSQL.
+"""
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+from sqlalchemy import create_engine, text
+
+from data_access.catalog_loader import iter_catalog, load_catalog
+
+SCHEMA = [
+    "CREATE TABLE category (id INTEGER PRIMARY KEY, name TEXT, slug TEXT, parent_id INTEGER, \"order\" INTEGER)",
+    "CREATE TABLE brand (id INTEGER PRIMARY KEY, name TEXT)",
+    """CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, description TEXT, price NUMERIC, quantity INTEGER,
+       slug TEXT, category_id INTEGER, brand_id INTEGER, is_visible BOOLEAN, is_draft BOOLEAN)""",
+    "CREATE TABLE product_media (id INTEGER PRIMARY KEY, product_id INTEGER, url TEXT, media_type TEXT, \"order\" INTEGER)",
+    "CREATE TABLE characteristics_list (id INTEGER PRIMARY KEY, characteristic_key TEXT)",
+    """CREATE TABLE product_characteristic (id INTEGER PRIMARY KEY, product_id INTEGER, key TEXT, value TEXT,
+       sort_order INTEGER)""",
+]
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+    with engine.begin() as conn:
+        for ddl in SCHEMA:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT INTO category VALUES (1, 'Холодильники', 'fridges', NULL, 1)"))
+        conn.execute(text("INSERT INTO brand VALUES (1, 'Atlant')"))
+        conn.execute(text("""INSERT INTO product VALUES
+            (3, 'Холодильник', '  Двухкамерный  ', 150000, 2, 'fridge', 1, 1, 1, 0),
+            (1, 'Без медиа', NULL, NULL, NULL, NULL, NULL, NULL, 1, NULL),
+            (2, 'Скрытый', '', 10, 1, 'hidden', 1, 1, 0, 0),
+            (4, 'Черновик', '', 10, 1, 'draft', 1, 1, 1, 1)"""))
+        conn.execute(text("""INSERT INTO product_media VALUES
+            (1, 3, 'second.jpg', 'image', 2), (2, 3, 'video.mp4', 'video', 0),
+            (3, 3, 'unordered.jpg', 'image', NULL), (4, 3, 'first.jpg', 'image', 1)"""))
+        conn.execute(text("INSERT INTO characteristics_list VALUES (10, 'Объём'), (11, 'Цвет')"))
+        conn.execute(text("""INSERT INTO product_characteristic VALUES
+            (1, 3, '11', 'белый', 2), (2, 3, '10', '300 л', 1), (3, 3, '99', 'без ключа', NULL)"""))
+    return engine
+
+
+def test_catalog_is_assembled_in_one_query(tmp_path):
+    catalog = load_catalog(_engine(tmp_path))
+    assert catalog == [
+        {
+            "id": 1, "name": "Без медиа", "description": "", "category_id": None, "category_name": "",
+            "brand_id": None, "brand_name": "", "price": 0.0, "quantity": 0, "slug": "", "image_url": "",
+            "specs_text": "",
+        },
+        {
+            "id": 3, "name": "Холодильник", "description": "Двухкамерный", "category_id": 1,
+            "category_name": "Холодильники", "brand_id": 1, "brand_name": "Atlant", "price": 150000.0,
+            "quantity": 2, "slug": "fridge", "image_url": "first.jpg",
+            "specs_text": "Объём: 300 л Цвет: белый None: без ключа",
+        },
+    ]
+
+
+def test_small_chunks_stream_the_same_catalog(tmp_path):
+    engine = _engine(tmp_path)
+    assert list(iter_catalog(engine, chunk_size=1)) == load_catalog(engine)
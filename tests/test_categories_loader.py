@@ -0,0 +1,70 @@
+"""
+Тесты версионного снимка категорий на SQLite вместо PostgreSQL.
+"""
+import sys
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from data_access import categories_loader as cl
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(cl, "_snapshot", None)
+    monkeypatch.setattr(cl, "_fingerprint_loaded", None)
+    eng = create_engine(f"sqlite:///{tmp_path / 'cat.db'}")
+    with eng.begin() as conn:
+        conn.execute(text('CREATE TABLE category (id INTEGER PRIMARY KEY, name TEXT, slug TEXT, parent_id INTEGER, "order" INTEGER)'))
+        conn.execute(text("""INSERT INTO category VALUES
+            (1, 'Кухня', 'kitchen', NULL, 1), (2, 'Плиты', 'stoves', 1, 1),
+            (3, 'Газовые', 'gas', 2, 1), (4, 'Холод', 'cold', NULL, 2)"""))
+    yield eng
+    eng.dispose()
+
+
+def test_snapshot_is_replaced_only_when_tree_changes(engine, monkeypatch):
+    snap = cl.get_category_snapshot(engine)
+    assert snap.version == 1
+    assert snap.descendants[1] == (1, 2, 3)
+    assert cl.get_children(1) == [{"id": 2, "name": "Плиты"}]
+
+    # Дерево не менялось — по отпечатку из БД, без полной загрузки
+    fetches = []
+    fetch = cl._fetch_categories
+    monkeypatch.setattr(cl, "_fetch_categories", lambda eng=None: fetches.append(1) or fetch(eng))
+    assert cl.refresh_categories(engine) is False
+    assert cl.get_category_snapshot() is snap
+    assert fetches == []
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO category VALUES (5, 'Электрические', 'electric', 2, 2)"))
+    assert cl.refresh_categories(engine) is True
+    assert fetches == [1]
+    new = cl.get_category_snapshot()
+    assert new.version == 2
+    assert cl.get_descendant_ids(1) == [1, 2, 3, 5]
+    # Старый снимок не изменился — запросы, которые его держат, дорабатывают на нём
+    assert snap.descendants[1] == (1, 2, 3)
+
+
+def test_refresher_picks_up_changes_on_trigger(engine):
+    cl.get_category_snapshot(engine)
+    refresher = cl.CategoryRefresher(interval=0, engine=engine)
+    refresher.start()
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE category SET name = 'Холодильное' WHERE id = 4"))
+        refresher.trigger()
+        deadline = time.monotonic() + 5
+        while cl.get_category_snapshot().version < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert cl.get_category_snapshot().by_id[4]["name"] == "Холодильное"
+    finally:
+        refresher.stop()
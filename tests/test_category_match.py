@@ -0,0 +1,83 @@
+"""
+Эквивалентность CategoryMatcher прежнему полному перебору категорий.
+"""
+import random
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+from retrieval.category_match import CategoryMatcher, _category_terms, _query_terms
+
+STEMS = [
+    "холодильн", "морозильн", "витрин", "плит", "печ", "кофе", "кофемашин", "посуд", "нож", "стол",
+    "стеллаж", "мойк", "шкаф", "ларь", "тест", "миксер", "блендер", "гриль", "фритюр", "сок",
+]
+ENDINGS = ["", "а", "ы", "ое", "ая", "ые", "ик", "ики", "ка", "ки", "ный", "ное"]
+
+
+def _words_match(qt: str, ct: str, min_prefix: int = 4) -> bool:
+    if qt == ct:
+        return True
+    if qt in ct or ct in qt:
+        return True
+    return len(qt) >= min_prefix and len(ct) >= min_prefix and qt[:min_prefix] == ct[:min_prefix]
+
+
+def _reference_match(query: str, categories: list[dict]) -> tuple:
+    """Прежний алгоритм: все слова запроса × все категории × все слова названия."""
+    q_terms = _query_terms(query)
+    if not q_terms:
+        return None, None, []
+    children_map: dict[int, list[int]] = {}
+    for c in categories:
+        if c.get("parent_id") is not None:
+            children_map.setdefault(c["parent_id"], []).append(c["id"])
+    scored = []
+    for c in categories:
+        c_terms = _category_terms(c["name"])
+        if not c_terms:
+            continue
+        score = sum(1 for qt in q_terms if any(_words_match(qt, ct) for ct in c_terms))
+        if score > 0:
+            scored.append((score, 1 if c["id"] in children_map else 0, c))
+    if not scored:
+        return None, None, []
+    scored.sort(key=lambda x: (-x[0], -x[1]))
+    best = scored[0][2]
+    children = [{"id": c["id"], "name": c["name"]} for c in categories if c.get("parent_id") == best["id"]]
+    return best["id"], best["name"], children
+
+
+def _word(rnd: random.Random) -> str:
+    return rnd.choice(STEMS) + rnd.choice(ENDINGS)
+
+
+def _tree(n: int, seed: int = 0) -> list[dict]:
+    rnd = random.Random(seed)
+    categories = []
+    for i in range(1, n + 1):
+        parent = rnd.randint(1, i - 1) if i > 20 else None
+        name = " ".join(_word(rnd) for _ in range(rnd.randint(1, 3)))
+        if rnd.random() < 0.05:
+            name = "и/или"
+        categories.append({"id": i, "name": name.capitalize(), "slug": f"c{i}", "parent_id": parent})
+    rnd.shuffle(categories)
+    return categories
+
+
+def test_matcher_equals_full_scan_on_large_tree():
+    categories = _tree(3000)
+    matcher = CategoryMatcher(categories)
+    rnd = random.Random(1)
+    queries = ["", "до 500 тыс", "кофе", "ножи для кухни", "холодильник холодильник витрина"]
+    for _ in range(150):
+        words = [_word(rnd) for _ in range(rnd.randint(1, 4))]
+        if rnd.random() < 0.3:
+            w = rnd.choice(words)
+            words.append(w[rnd.randint(0, 2):])
+        queries.append(" ".join(words) + rnd.choice(["", " до 300000 тг", "!"]))
+    for q in queries:
+        assert matcher.match(q) == _reference_match(q, categories), q
@@ -0,0 +1,32 @@
+"""
+Тесты общего движка БД: один движок на URL, метрики пула.
+"""
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+from sqlalchemy import text
+
+from data_access import db
+
+
+def test_engine_is_shared_and_pool_is_reported(tmp_path):
+    url = f"sqlite:///{tmp_path / 'a.db'}"
+    try:
+        engine = db.get_engine(url)
+        assert db.get_engine(url) is engine
+        for _ in range(3):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        stats = db.pool_stats()[url]
+        assert stats["connects"] == 1
+        assert stats["checkouts"] == 3
+        assert stats["checkedout"] == 0
+    finally:
+        db.dispose_engines()
+    assert db.pool_stats() == {}
+    assert db.get_engine(url) is not engine
+    db.dispose_engines()
@@ -0,0 +1,46 @@
+"""
+Тесты инкрементального кодирования через хранилище эмбеддингов.
+"""
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import numpy as np
+
+from index.embedding_store import EmbeddingStore, embed_incremental
+
+
+class _FakeEmbedder:
+    def __init__(self):
+        self.encoded: list[str] = []
+
+    def embed(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32).reshape(-1, 2)
+
+
+def test_only_new_texts_are_encoded(tmp_path):
+    store = EmbeddingStore(tmp_path / "emb.sqlite")
+    emb = _FakeEmbedder()
+    vectors, stats = embed_incremental(["aa", "bbb", "aa"], emb, store, "m")
+    assert emb.encoded == ["aa", "bbb"]
+    assert stats == {"reused": 0, "encoded": 2, "unique": 2}
+    assert vectors[:, 0].tolist() == [2.0, 3.0, 2.0]
+
+    emb2 = _FakeEmbedder()
+    vectors, stats = embed_incremental(["aa", "cccc"], emb2, store, "m")
+    assert emb2.encoded == ["cccc"]
+    assert stats == {"reused": 1, "encoded": 1, "unique": 2}
+    assert vectors[:, 0].tolist() == [2.0, 4.0]
+
+
+def test_store_is_keyed_by_model(tmp_path):
+    store = EmbeddingStore(tmp_path / "emb.sqlite")
+    embed_incremental(["aa"], _FakeEmbedder(), store, "m1")
+    emb = _FakeEmbedder()
+    _, stats = embed_incremental(["aa"], emb, store, "m2")
+    assert stats["encoded"] == 1
+    assert store.count() == 2
@@ -0,0 +1,88 @@
+"""
+Тесты версий индекса: сборка в новый каталог, атомарная публикация, переключение рантайма и сборка мусора.
+"""
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import pytest
+
+from benchmarks.synthetic import HashingEmbedder
+from index import build_index
+from index.embedding_store import EmbeddingStore
+from index.versions import VERSIONS_DIR, current_version, read_manifest, verify_version
+from retrieval.runtime import IndexWatcher, SearchRuntime, set_runtime
+
+
+def _catalog(n: int) -> list[dict]:
+    return [
+        {"id": pid, "name": f"витрина sku-{pid}", "description": "", "category_id": 1, "category_name": "витрины",
+         "brand_id": None, "brand_name": "", "price": 10.0 * pid, "quantity": 1, "slug": f"p{pid}",
+         "image_url": "", "specs_text": ""}
+        for pid in range(1, n + 1)
+    ]
+
+
+@pytest.fixture
+def index_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_index, "INDEX_DIR", tmp_path)
+    embedder = HashingEmbedder(dim=16)
+    runtime = SearchRuntime(embedder_factory=lambda: embedder, index_root=tmp_path)
+    set_runtime(runtime)
+    store = EmbeddingStore(tmp_path / "embeddings.sqlite")
+
+    def build(n: int) -> str:
+        return build_index.build(_catalog(n), categories=[], embedder=embedder, store=store)["version"]
+
+    yield tmp_path, runtime, build
+    store.close()
+    set_runtime(None)
+
+
+def test_build_publishes_versions_and_runtime_switches(index_root):
+    root, runtime, build = index_root
+    v1 = build(3)
+    old = runtime.snapshot()
+    assert old.index_version == v1 and old.size == 3
+    manifest = verify_version(root / VERSIONS_DIR / v1, checksums=True)
+    assert manifest["products"] == 3 and manifest["dim"] == 16 and "meta.json" in manifest["files"]
+
+    v2 = build(5)
+    assert current_version(root) == v2 and v2 > v1
+    assert runtime.snapshot().index_version == v2 and runtime.snapshot().size == 5
+    # Снимок, который держит запрос в работе, не меняется
+    assert old.size == 3 and old.index.ntotal == 3
+
+    v3 = build(4)
+    kept = sorted(p.name for p in (root / VERSIONS_DIR).iterdir())
+    assert kept == [v2, v3]
+
+
+def test_watcher_picks_up_version_from_another_process(index_root):
+    root, runtime, build = index_root
+    build(3)
+    other = SearchRuntime(embedder_factory=HashingEmbedder, index_root=root)
+    watcher = IndexWatcher(other, root=root)
+    assert other.snapshot().size == 3
+    assert not watcher.check()
+
+    v2 = build(6)
+    assert watcher.check()
+    assert other.current().index_version == v2 and other.current().size == 6
+
+
+def test_damaged_version_is_not_loaded(index_root):
+    root, runtime, build = index_root
+    v1 = build(3)
+    v2 = build(4)
+    meta = root / VERSIONS_DIR / v2 / "meta.json"
+    meta.write_text(meta.read_text(encoding="utf-8")[:-10], encoding="utf-8")
+    with pytest.raises(ValueError):
+        verify_version(root / VERSIONS_DIR / v2)
+
+    other = SearchRuntime(embedder_factory=HashingEmbedder, index_root=root)
+    assert other.snapshot() is None  # повреждённая активная версия не загружается
+    assert read_manifest(root / VERSIONS_DIR / v1)["products"] == 3
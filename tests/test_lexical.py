@@ -0,0 +1,110 @@
+"""
+Тесты лексического индекса BM25 и его слияния с векторным поиском.
+"""
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import numpy as np
+
+from index.faiss_store import NumpyIndex
+from index.lexical import LexicalBuilder, load_lexical, save_lexical
+from retrieval.tokenizer import tokenize
+from retrieval.embedder import normalize
+from retrieval.runtime import SearchRuntime, set_runtime
+
+TEXTS = [
+    "Холодильная витрина Polair DM-105",
+    "Витрина кондитерская",
+    "Холодильник Atlant XM-4021",
+    "Кофемашина Saeco",
+    "Шкаф холодильный Polair CM-107",
+]
+
+
+def _lexical(order=None):
+    builder = LexicalBuilder()
+    builder.add(TEXTS[:2])
+    builder.add(TEXTS[2:])
+    return builder.finish(order)
+
+
+def test_tokenize_stems_words_and_keeps_codes():
+    assert tokenize("Холодильная витрина DM-105") == ["холоди", "витрин", "dm105", "dm", "105"]
+
+
+def test_bm25_ignores_word_order_and_matches_codes(tmp_path):
+    index = _lexical()
+    a = index.search(tokenize("холодильная витрина"), 3)
+    b = index.search(tokenize("витрина холодильная"), 3)
+    assert a[1].tolist() == b[1].tolist()
+    assert a[1][0] == 0
+    assert index.search(tokenize("xm4021"), 3)[1].tolist() == [2]
+    assert index.search(tokenize("polair"), 5, rows=np.array([1, 4]))[1].tolist() == [4]
+
+    save_lexical(index, tmp_path / "lexical.npz")
+    loaded = load_lexical(tmp_path / "lexical.npz")
+    assert np.allclose(loaded.weights, index.weights)
+
+
+def test_build_order_is_applied():
+    index = _lexical(order=[4, 3, 2, 1, 0])
+    assert index.search(tokenize("кофемашина"), 1)[1].tolist() == [1]
+
+
+def test_hybrid_search_brings_exact_code_to_top():
+    rng = np.random.default_rng(0)
+    vectors = normalize(rng.normal(size=(len(TEXTS), 8)))
+    meta = [{"product_id": i + 1, "name": t, "price": 1.0, "quantity": 1, "slug": ""} for i, t in enumerate(TEXTS)]
+
+    class _Embedder:
+        model_name = "fake"
+
+        def embed_query(self, query):
+            return vectors[3]  # вектор «кофемашины» — векторный поиск ставит её первой
+
+    set_runtime(SearchRuntime(
+        loader=lambda: (NumpyIndex(vectors), meta), embedder_factory=_Embedder,
+        partitions_loader=lambda: None, lexical_loader=_lexical,
+    ))
+    try:
+        from retrieval.search import search_products
+        # Товар есть в обоих списках — по сумме рангов он выше лидера только векторного поиска
+        results = search_products("шкаф cm-107", top_k=5)
+        assert results[0]["product_id"] == 5
+        assert len(results) == 5
+        # В ответе score — косинусная близость, а не балл слияния (тот — в rank_score, для порядка)
+        for r in results:
+            assert r["score"] == round(float(vectors[r["row"]] @ vectors[3]), 4)
+        assert [r["rank_score"] for r in results] == sorted((r["rank_score"] for r in results), reverse=True)
+    finally:
+        set_runtime(None)
+
+
+def test_rerank_grades_name_over_category_over_specs():
+    from retrieval.meta_columns import MetaColumns
+    from retrieval.rerank import rerank
+
+    items = [
+        {"name": "Стол разделочный", "category": "Холодильное оборудование", "specs": ""},
+        {"name": "Шкаф", "category": "Мебель", "specs": "Охлаждение: холодильник встроенный"},
+        {"name": "Холодильник Atlant", "category": "Холодильное оборудование", "specs": ""},
+        {"name": "Кофемашина", "category": "Кофе", "specs": ""},
+    ]
+    builder = LexicalBuilder()
+    builder.add([" ".join(i.values()) for i in items], items)
+    lexical = builder.finish()
+    meta = [{"product_id": 10 + i, "name": it["name"]} for i, it in enumerate(items)]
+    columns = MetaColumns.from_meta(meta)
+    results = [dict(m, row=i, score=0.9 - i * 0.1) for i, m in enumerate(meta)][::-1]
+
+    out = rerank("холодильник", results, lexical=lexical, columns=columns)
+    assert [p["product_id"] for p in out] == [12, 10, 11, 13]
+
+    # Строки не соответствуют снимку (индекс пересобран) — только порядок по score
+    stale = MetaColumns.from_meta(meta[::-1])
+    out = rerank("холодильник", results, lexical=lexical, columns=stale)
+    assert [p["product_id"] for p in out] == [10, 11, 12, 13]
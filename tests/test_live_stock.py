@@ -0,0 +1,89 @@
+"""
+Тесты живого обновления цен и остатков: один запрос к product (SQLite), патч снимка без векторов,
+скрытие товаров в поиске и файл live_stock.npz поверх версии индекса на диске.
+"""
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from index.faiss_store import NumpyIndex, save_index
+from retrieval.embedder import normalize
+from retrieval.live_stock import LIVE_STOCK_FILE, refresh_stock
+from retrieval.runtime import SearchRuntime
+from retrieval.search import SearchSession
+
+
+def _engine(tmp_path, rows):
+    engine = create_engine(f"sqlite:///{tmp_path / 'stock.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("""CREATE TABLE product (id INTEGER PRIMARY KEY, price NUMERIC, quantity INTEGER,
+                             is_visible BOOLEAN, is_draft BOOLEAN)"""))
+        for row in rows:
+            conn.execute(text("INSERT INTO product VALUES (:id, :price, :quantity, :visible, :draft)"), row)
+    return engine
+
+
+def _catalog(n=5):
+    vectors = normalize(np.random.default_rng(0).normal(size=(n, 8)))
+    meta = [
+        {"product_id": i + 1, "name": f"Товар {i}", "price": 1000.0 * (i + 1), "quantity": 1, "category_id": 1}
+        for i in range(n)
+    ]
+    return vectors, meta
+
+
+def test_refresh_patches_snapshot_without_touching_vectors(tmp_path):
+    vectors, meta = _catalog()
+    index = NumpyIndex(vectors)
+    runtime = SearchRuntime(loader=lambda: (index, meta), embedder_factory=object)
+    old = runtime.snapshot()
+    engine = _engine(tmp_path, [
+        {"id": 1, "price": 1000, "quantity": 1, "visible": 1, "draft": 0},    # без изменений
+        {"id": 2, "price": 2500, "quantity": 1, "visible": 1, "draft": 0},    # новая цена
+        {"id": 3, "price": 3000, "quantity": 0, "visible": 1, "draft": None},  # закончился
+        {"id": 4, "price": 4000, "quantity": 1, "visible": 0, "draft": 0},    # скрыт
+        {"id": 9, "price": 10, "quantity": 5, "visible": 1, "draft": 0},      # ещё не в индексе
+    ])                                                                          # id 5 удалён из БД
+
+    counts = refresh_stock(runtime, engine)
+    assert counts == {
+        "rows": 5, "changed": 4, "price": 1, "quantity": 1, "visibility": 2,
+        "hidden": 2, "missing": 1, "not_indexed": 1,
+    }
+    new = runtime.snapshot()
+    assert new.version == old.version + 1
+    assert new.index is index and new.columns.product_id is old.columns.product_id
+    assert new.meta[0] is old.meta[0]
+    assert new.meta[1]["price"] == 2500.0 and old.meta[1]["price"] == 2000.0
+    assert new.columns.quantity.tolist() == [1, 1, 0, 1, 1]
+    assert new.columns.visible.tolist() == [True, True, True, False, False]
+
+    session = SearchSession(query="товар", snapshot=new, query_vector=vectors[3])
+    assert {p["product_id"] for p in session.search(5)} == {1, 2, 3}
+    assert {p["product_id"] for p in session.search(5, in_stock_only=True)} == {1, 2}
+
+    # Повтор без изменений в БД не создаёт новый снимок
+    assert refresh_stock(runtime, engine)["changed"] == 0
+    assert runtime.snapshot() is new
+
+
+def test_saved_stock_applies_on_reload(tmp_path):
+    vectors, meta = _catalog()
+    save_index(NumpyIndex(vectors), meta, tmp_path)
+    runtime = SearchRuntime(embedder_factory=object, index_root=tmp_path)
+    runtime.snapshot()
+    engine = _engine(tmp_path, [
+        {"id": i, "price": 1000 * i, "quantity": 0 if i == 2 else 1, "visible": 1, "draft": 0} for i in range(1, 6)
+    ])
+    refresh_stock(runtime, engine)
+    assert (tmp_path / LIVE_STOCK_FILE).exists()
+
+    restarted = SearchRuntime(embedder_factory=object, index_root=tmp_path).snapshot()
+    assert restarted.columns.quantity.tolist() == [1, 0, 1, 1, 1]
+    assert restarted.meta[1]["quantity"] == 0
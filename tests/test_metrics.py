@@ -0,0 +1,88 @@
+"""
+Тесты замеров этапов: трасса запроса (Server-Timing), гистограммы и текст /metrics.
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+from chat import pipeline
+from observability.metrics import render_metrics
+from observability.timing import Histogram, histograms, server_timing, span, trace
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram(buckets=(1, 10))
+    for ms in (0.5, 5, 5, 50):
+        hist.observe(ms)
+    buckets, count, total = hist.snapshot()
+    assert buckets == [(1, 1), (10, 3)]
+    assert count == 4 and total == 60.5
+
+
+def test_trace_follows_request_into_search_pool(monkeypatch):
+    def retrieve(plan):
+        with span("test_retrieve"):
+            pass
+        with span("test_retrieve"):
+            pass
+        return [], False
+
+    monkeypatch.setattr(pipeline, "prepare_chat", lambda query, **f: {"query": query})
+    monkeypatch.setattr(pipeline, "retrieve_products", retrieve)
+    monkeypatch.setattr(pipeline, "compose_chat", lambda plan, products, fb=False: {"products": products})
+    monkeypatch.setattr(pipeline, "reply_chat", lambda draft: draft)
+    before = histograms()["test_retrieve"].count if "test_retrieve" in histograms() else 0
+
+    async def run():
+        with trace() as stages:
+            await pipeline.run_chat_async("витрина")
+        return stages
+
+    stages = asyncio.run(run())
+    # Этап из потока пула попал в трассу запроса; повторы суммируются, в гистограмме — оба замера
+    assert "test_retrieve" in stages and "retrieve_wait" in stages
+    assert histograms()["test_retrieve"].count == before + 2
+    assert "test_retrieve;dur=" in server_timing(stages)
+
+
+def test_render_metrics_prometheus_text():
+    with span("test_render"):
+        pass
+    text = render_metrics()
+    assert '# TYPE ai_stage_duration_seconds histogram' in text
+    assert 'ai_stage_duration_seconds_bucket{stage="test_render",le="+Inf"} 1' in text
+    assert 'ai_stage_duration_seconds_count{stage="test_render"} 1' in text
+    assert "# TYPE ai_index_size gauge" in text
+    # Каждая метрика описана один раз
+    types = [line for line in text.splitlines() if line.startswith("# TYPE")]
+    assert len(types) == len(set(types))
+
+
+def test_embed_batcher_stats_are_exported(monkeypatch):
+    import numpy as np
+
+    import retrieval.embedder as embedder_module
+    from retrieval.runtime import SearchRuntime, set_runtime
+
+    class _Model:
+        def encode(self, texts, convert_to_numpy=True):
+            return np.ones((len(texts), 4), dtype=np.float32)
+
+    monkeypatch.setitem(embedder_module._models, "fake-batcher", _Model())
+    monkeypatch.setattr(embedder_module, "get_query_cache", lambda: None)
+    runtime = SearchRuntime(loader=lambda: (None, []), embedder_factory=lambda: embedder_module.Embedder("fake-batcher"))
+    set_runtime(runtime)
+    try:
+        assert "ai_embed_queue_depth" not in render_metrics()  # модель не загружена — /metrics её не грузит
+        runtime.embedder().embed_query("витрина")
+        text = render_metrics()
+        assert "ai_embed_queue_depth 0" in text
+        assert 'ai_embed_batch_size_bucket{le="1"} 1' in text
+        assert 'ai_embed_batch_size_bucket{le="+Inf"} 1' in text
+        assert "ai_embed_batch_size_count 1" in text
+    finally:
+        set_runtime(None)
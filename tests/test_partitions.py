@@ -0,0 +1,58 @@
+"""
+Тесты разбиения индекса по дереву категорий.
+"""
+import random
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import numpy as np
+
+from data_access.categories_loader import _build_children_map
+from index.partitions import CategoryPartitions, partition_order
+
+
+def _tree(n: int, seed: int = 0) -> list[dict]:
+    rnd = random.Random(seed)
+    cats = []
+    for i in range(1, n + 1):
+        parent = None if i <= 5 else rnd.randint(1, i - 1)
+        cats.append({"id": i, "name": f"cat{i}", "slug": f"c{i}", "parent_id": parent})
+    rnd.shuffle(cats)
+    return cats
+
+
+def _descendants(cid: int, children: dict[int, list[int]]) -> list[int]:
+    out, stack = [cid], [cid]
+    while stack:
+        for ch in children.get(stack.pop(), []):
+            out.append(ch)
+            stack.append(ch)
+    return out
+
+
+def test_rows_for_matches_mask():
+    categories = _tree(200)
+    rnd = random.Random(1)
+    catalog = [{"id": i, "category_id": rnd.choice([None, 999, *range(1, 201)])} for i in range(3000)]
+    order = partition_order(catalog, categories)
+    assert sorted(order) == list(range(len(catalog)))
+    cat_col = [catalog[i]["category_id"] for i in order]
+    parts = CategoryPartitions.build(cat_col, categories)
+    parts = CategoryPartitions.from_dict(parts.to_dict())
+    children = _build_children_map(categories)
+    col = np.array([-1 if c is None else c for c in cat_col])
+
+    for cid in range(1, 201):
+        ids = _descendants(cid, children)
+        expected = np.flatnonzero(np.isin(col, ids))
+        assert parts.rows_for(ids).tolist() == expected.tolist()
+
+    # Ветка верхнего уровня — один непрерывный блок
+    for root_id in range(1, 6):
+        rows = parts.rows_for(_descendants(root_id, children))
+        assert len(rows) == 0 or rows[-1] - rows[0] + 1 == len(rows)
+    assert parts.rows_for([999]).tolist() == np.flatnonzero(col == 999).tolist()
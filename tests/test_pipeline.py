@@ -0,0 +1,92 @@
+"""
+Тесты асинхронного конвейера /chat: этапы, дедлайн, лимит одновременных запросов.
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import pytest
+
+from chat import pipeline
+
+
+@pytest.fixture
+def fake_stages(monkeypatch):
+    delay = {"retrieve": 0.0, "llm": 0.0}
+
+    def prepare(query, **filters):
+        return {"query": query, **filters}
+
+    def retrieve(plan):
+        time.sleep(delay["retrieve"])
+        return [{"product_id": 1, "name": plan["query"]}], False
+
+    def compose(plan, products, fallback_used=False):
+        return {"products": products}
+
+    def reply(draft):
+        time.sleep(delay["llm"])
+        return {"message": "ok", "products": draft["products"], "clarifying_question": None}
+
+    monkeypatch.setattr(pipeline, "prepare_chat", prepare)
+    monkeypatch.setattr(pipeline, "retrieve_products", retrieve)
+    monkeypatch.setattr(pipeline, "compose_chat", compose)
+    monkeypatch.setattr(pipeline, "reply_chat", reply)
+    return delay
+
+
+def test_run_chat_async_runs_stages(fake_stages):
+    result = asyncio.run(pipeline.run_chat_async("витрина", price_max=100))
+    assert result["products"][0]["name"] == "витрина"
+    stats = pipeline.pipeline_stats()
+    assert stats["inflight"] == 0
+    assert stats["stages"]["retrieve"]["running"] == 0
+
+
+def test_deadline_cancels_slow_request(fake_stages):
+    fake_stages["retrieve"] = 0.3
+    before = pipeline.pipeline_stats()["timed_out"]
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(pipeline.run_chat_async("витрина", timeout=0.05))
+    assert pipeline.pipeline_stats()["timed_out"] == before + 1
+    assert pipeline.pipeline_stats()["inflight"] == 0
+
+
+def test_overload_rejected(fake_stages, monkeypatch):
+    monkeypatch.setattr(pipeline, "CHAT_MAX_INFLIGHT", 0)
+    with pytest.raises(pipeline.ChatOverloaded):
+        asyncio.run(pipeline.run_chat_async("витрина"))
+
+
+@pytest.mark.parametrize("slow_stage", ["prepare", "llm"])
+def test_slow_stages_do_not_block_event_loop(fake_stages, monkeypatch, slow_stage):
+    # Холодный снимок категорий (prepare ждёт БД) и внешний LLM: loop в это время обслуживает другие задачи
+    if slow_stage == "prepare":
+        def slow_prepare(query, **filters):
+            time.sleep(0.2)
+            return {"query": query, **filters}
+
+        monkeypatch.setattr(pipeline, "prepare_chat", slow_prepare)
+    else:
+        fake_stages["llm"] = 0.2
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await pipeline.run_chat_async("витрина")
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 5
@@ -0,0 +1,137 @@
+"""
+Тесты поиска с предфильтром: результат — точный top-k среди строк, прошедших фильтры.
+"""
+import sys
+import zlib
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import numpy as np
+import pytest
+
+from index.faiss_store import NumpyIndex
+from retrieval.embedder import normalize
+from retrieval.runtime import SearchRuntime, set_runtime
+
+DIM = 16
+
+
+class _FakeEmbedder:
+    """Детерминированный вектор по тексту запроса."""
+    model_name = "fake"
+
+    def embed_query(self, query):
+        return self.embed_queries([query])[0]
+
+    def embed_queries(self, queries):
+        out = []
+        for q in queries:
+            rng = np.random.default_rng(zlib.crc32(q.encode("utf-8")))
+            out.append(normalize(rng.normal(size=(1, DIM)))[0])
+        return out
+
+
+@pytest.fixture
+def catalog():
+    rng = np.random.default_rng(0)
+    n = 400
+    vectors = normalize(rng.normal(size=(n, DIM)))
+    meta = [
+        {
+            "product_id": i + 1,
+            "name": f"Товар {i}",
+            "price": float(rng.integers(1, 100) * 10_000),
+            "quantity": int(rng.integers(0, 3)),
+            "category_id": int(rng.integers(1, 10)),
+            "brand_id": int(rng.integers(1, 5)),
+            "slug": f"p{i}",
+            "image_url": "",
+        }
+        for i in range(n)
+    ]
+    runtime = SearchRuntime(loader=lambda: (NumpyIndex(vectors), meta), embedder_factory=_FakeEmbedder)
+    set_runtime(runtime)
+    yield vectors, meta
+    set_runtime(None)
+
+
+def test_numpy_index_rows_exact():
+    rng = np.random.default_rng(1)
+    vectors = normalize(rng.normal(size=(100, DIM)))
+    index = NumpyIndex(vectors)
+    q = vectors[3]
+    for rows in (np.arange(0, 100, 7), np.arange(0, 90)):
+        scores, idx = index.search(q, 5, rows=rows)
+        expected = rows[np.argsort(-(vectors[rows] @ q))[:5]]
+        assert idx.tolist() == expected.tolist()
+        assert np.allclose(scores, vectors[idx] @ q)
+
+
+def test_search_products_filtered_top_k_is_exact(catalog):
+    from retrieval.search import search_products
+
+    vectors, meta = catalog
+    query = "холодильник"
+    results = search_products(query, top_k=10, price_max=300_000, category_ids=[2, 3], in_stock_only=True)
+
+    qv = _FakeEmbedder().embed_query(query)
+    allowed = [
+        i for i, m in enumerate(meta)
+        if m["price"] <= 300_000 and m["category_id"] in (2, 3) and m["quantity"] > 0
+    ]
+    expected = sorted(allowed, key=lambda i: -float(vectors[i] @ qv))[:10]
+    assert [r["product_id"] - 1 for r in results] == expected
+
+
+def test_search_products_no_matching_rows(catalog):
+    from retrieval.search import search_products
+
+    assert search_products("холодильник", top_k=5, price_min=10**9) == []
+
+
+def test_session_reuses_query_vector_and_scores(catalog, monkeypatch):
+    from retrieval import search as search_module
+    from retrieval.search import SearchSession, search_products
+
+    session = SearchSession.open("холодильник")
+    calls = []
+    real_search = search_module.search
+    monkeypatch.setattr(search_module, "search", lambda *a, **kw: calls.append(1) or real_search(*a, **kw))
+
+    # Узкая ветка сканируется напрямую, дальше — полный скан один раз на все повторные поиски
+    branch = session.search(10, category_ids=[2])
+    full = session.search(10)
+    relaxed = session.search(10, price_max=500_000, in_stock_only=True)
+    more = session.search(5, offset=5)
+    assert len(calls) == 1
+    monkeypatch.setattr(search_module, "search", real_search)
+
+    assert branch == search_products("холодильник", top_k=10, category_ids=[2])
+    assert full == search_products("холодильник", top_k=10)
+    assert relaxed == search_products("холодильник", top_k=10, price_max=500_000, in_stock_only=True)
+    assert more == full[5:10]
+
+
+def test_search_products_batch_matches_single_queries(catalog, monkeypatch):
+    from retrieval import search as search_module
+    from retrieval.search import search_products, search_products_batch
+
+    requests = [
+        {"query": "холодильник"},
+        {"query": "плита", "category_ids": [3, 4], "price_max": 600_000},
+        {"query": "весы", "brand_id": 2, "in_stock_only": True},
+        {"query": "холодильник", "price_min": 300_000},
+    ]
+    expected = [search_products(top_k=10, **r) for r in requests]
+    # Маленький шаг — пакет считается несколькими порциями матричного умножения
+    monkeypatch.setattr(search_module, "_BATCH_SCORE_ELEMENTS", 2 * 400)
+    results, timing = search_products_batch(requests, top_k=10, workers=3)
+    # rank_score не округляется: матричное умножение пакета и одного запроса расходятся в последних битах float32
+    rank = [[p.pop("rank_score") for p in r] for r in results]
+    expected_rank = [[p.pop("rank_score") for p in r] for r in expected]
+    assert results == expected
+    assert all(np.allclose(a, b, atol=1e-6) for a, b in zip(rank, expected_rank))
+    assert timing["queries"] == len(requests)
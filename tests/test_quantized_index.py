@@ -0,0 +1,75 @@
+"""
+Тесты numpy-индекса со сжатым хранением (float16 / int8) и отображением файла в память.
+"""
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import numpy as np
+import pytest
+
+from index.faiss_store import NumpyIndex, load_numpy_index, save_index
+from index.quantize import quantize_int8, to_float16
+from retrieval.embedder import normalize
+
+
+def _data(n=2000, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = normalize(rng.normal(size=(n, dim)))
+    queries = normalize(vectors[:50] + 0.3 * rng.normal(size=(50, dim)))
+    return vectors, queries
+
+
+def _recall(index, exact, queries, k=10, rows=None):
+    hits = 0
+    for q in queries:
+        _, got = index.search(q, k, rows=rows)
+        _, want = exact.search(q, k, rows=rows)
+        hits += len(set(got.tolist()) & set(want.tolist()))
+    return hits / (k * len(queries))
+
+
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_quantized_recall(storage):
+    vectors, queries = _data()
+    exact = NumpyIndex(vectors)
+    if storage == "int8":
+        codes, scale = quantize_int8(vectors)
+        index = NumpyIndex(vectors, codes=codes, scale=scale)
+    else:
+        index = NumpyIndex(vectors, codes=to_float16(vectors))
+    assert index.storage == storage
+    assert _recall(index, exact, queries) >= 0.98
+    rows = np.arange(0, len(vectors), 3)
+    assert _recall(index, exact, queries, rows=rows) >= 0.98
+    # Скоры после пересчёта — точные float32
+    scores, idx = index.search(queries[0], 5)
+    assert np.allclose(scores, vectors[idx] @ queries[0], atol=1e-5)
+
+
+def test_mmap_load(tmp_path):
+    vectors, queries = _data(n=300)
+    save_index(NumpyIndex(vectors), [{"product_id": i} for i in range(300)], directory=tmp_path)
+    index = load_numpy_index(tmp_path, storage="float32", mmap=True)
+    assert isinstance(index.vectors, np.memmap)
+    assert index.search(queries[0], 5)[1].tolist() == NumpyIndex(vectors).search(queries[0], 5)[1].tolist()
+    index8 = load_numpy_index(tmp_path, storage="int8", mmap=False)
+    assert index8.storage == "int8"
+    assert isinstance(index8.vectors, np.memmap)
+
+
+def test_flat_vectors_only_for_exact_float32():
+    from index.faiss_store import add_vectors, flat_vectors
+    from index.numpy_index import KMeansIndex
+
+    vectors, _ = _data(n=200)
+    # Пакетный поиск умножает на эту матрицу: сжатые и приближённые индексы её не отдают
+    assert flat_vectors(NumpyIndex(vectors)) is not None
+    assert flat_vectors(NumpyIndex(vectors, codes=to_float16(vectors))) is None
+    assert flat_vectors(KMeansIndex.train(vectors, nlist=4, nprobe=1, exact_rows_max=0)) is None
+    # Плоский индекс сборки (faiss IndexFlatIP или NumpyIndex) — те же векторы
+    exact = flat_vectors(add_vectors(vectors, [{}] * len(vectors), backend="flat"))
+    assert np.allclose(exact, vectors)
@@ -0,0 +1,101 @@
+"""
+Тесты кэша эмбеддингов запросов: LRU, TTL, смена модели, уровень на диске.
+"""
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import numpy as np
+
+from retrieval.query_cache import QueryEmbeddingCache, normalize_query
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_query():
+    assert normalize_query("  Моечная   ВАННА ") == "моечная ванна"
+
+
+def test_lru_eviction_and_stats():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put("m", "a", np.ones(3))
+    cache.put("m", "b", np.ones(3))
+    assert cache.get("m", "a") is not None  # a теперь самый свежий
+    cache.put("m", "c", np.ones(3))
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "A ") is not None
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+
+def test_ttl_expiry():
+    clock = _Clock()
+    cache = QueryEmbeddingCache(max_size=10, ttl_seconds=60, clock=clock)
+    cache.put("m", "q", np.ones(3))
+    clock.now += 61
+    assert cache.get("m", "q") is None
+
+
+def test_model_change_invalidates():
+    cache = QueryEmbeddingCache(max_size=10)
+    cache.put("m1", "q", np.ones(3))
+    assert cache.get("m2", "q") is None
+    assert len(cache) == 0
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = tmp_path / "qc.sqlite"
+    QueryEmbeddingCache(disk_path=path).put("m", "q", np.arange(3, dtype=np.float32))
+    cache = QueryEmbeddingCache(disk_path=path)
+    v = cache.get("m", "q")
+    assert v is not None and v.tolist() == [0.0, 1.0, 2.0]
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_memory_hits_do_not_wait_for_disk(tmp_path):
+    import threading
+
+    cache = QueryEmbeddingCache(disk_path=tmp_path / "q.sqlite")
+    cache.put("m", "горячий", np.ones(2))
+    result = {}
+    # Пока SQLite занят (медленный commit другого put), попадания в память отдаются сразу
+    with cache._db_lock:
+        worker = threading.Thread(target=lambda: result.update(v=cache.get("m", "Горячий")))
+        worker.start()
+        worker.join(timeout=2)
+        assert not worker.is_alive()
+    assert result["v"].tolist() == [1.0, 1.0]
+
+
+def test_embedder_encodes_original_query_and_caches_by_normalized_key(monkeypatch):
+    import retrieval.embedder as embedder_module
+
+    class _Model:
+        def __init__(self):
+            self.seen = []
+
+        def encode(self, texts, convert_to_numpy=True):
+            self.seen.extend(texts)
+            return np.ones((len(texts), 4), dtype=np.float32)
+
+    model = _Model()
+    monkeypatch.setitem(embedder_module._models, "fake", model)
+    cache = QueryEmbeddingCache(max_size=8)
+    monkeypatch.setattr(embedder_module, "get_query_cache", lambda: cache)
+    embedder = embedder_module.Embedder("fake", batching=False)
+
+    embedder.embed_query("  Моечная   ВАННА ")
+    embedder.embed_query("моечная ванна")
+    # В модель — исходный текст (регистр важен для токенизатора), повтор — из кэша по нормализованному ключу
+    assert model.seen == ["  Моечная   ВАННА "]
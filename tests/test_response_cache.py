@@ -0,0 +1,55 @@
+"""
+Тесты кэша готовых ответов /chat.
+"""
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+from chat.response_cache import ResponseCache, response_key
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_key_ignores_case_spaces_and_empty_filters():
+    a = response_key("  Моечная  ВАННА ", {"price_max": 100, "brand_id": None, "in_stock_only": False})
+    b = response_key("моечная ванна", {"price_max": 100.0})
+    assert a == b
+    assert a != response_key("моечная ванна", {"price_max": 100.0, "in_stock_only": True})
+
+
+def test_lru_ttl_and_byte_budget():
+    clock = _Clock()
+    cache = ResponseCache(max_items=3, max_bytes=10, ttl_seconds=60, clock=clock)
+    v = (1, 1)
+    cache.put("a", v, b"aaaa")
+    cache.put("b", v, b"bbbb")
+    assert cache.get("a", v) == b"aaaa"
+    cache.put("c", v, b"cccc")  # 12 байт > 10: вытесняется самый давний — b
+    assert cache.get("b", v) is None
+    assert cache.get("a", v) == b"aaaa"
+    assert cache.stats()["bytes"] == 8
+    clock.now += 61
+    assert cache.get("a", v) is None
+    assert cache.stats()["bytes"] == 4
+
+
+def test_new_versions_invalidate_and_stale_results_are_not_stored():
+    cache = ResponseCache()
+    cache.put("q", (1, 1), b"old")
+    assert cache.get("q", (2, 1)) is None
+    assert cache.stats()["invalidations"] == 1
+    # Ответ, посчитанный до пересборки, не попадает в кэш новой версии
+    cache.put("q", (1, 1), b"old")
+    assert cache.get("q", (2, 1)) is None
+    cache.put("q", (2, 1), b"new")
+    assert cache.get("q", (2, 1)) == b"new"
+    assert cache.get("q", (2, 2)) is None
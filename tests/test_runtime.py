@@ -0,0 +1,51 @@
+"""
+Тесты резидентного рантайма поиска: один раз загружает индекс и модель, атомарно подменяет снимок.
+"""
+import sys
+import threading
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+from retrieval.runtime import SearchRuntime
+
+
+class _CountingLoader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return object(), [{"product_id": self.calls}]
+
+
+def test_snapshot_loaded_once():
+    loader = _CountingLoader()
+    runtime = SearchRuntime(loader=loader, embedder_factory=object)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(runtime.snapshot())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loader.calls == 1
+    assert all(s is results[0] for s in results)
+    assert runtime.embedder() is runtime.embedder()
+
+
+def test_reload_swaps_snapshot():
+    loader = _CountingLoader()
+    runtime = SearchRuntime(loader=loader, embedder_factory=object)
+    old = runtime.snapshot()
+    new = runtime.reload()
+    assert new is runtime.snapshot()
+    assert new.version == old.version + 1
+    assert old.meta == [{"product_id": 1}]
+    assert new.meta == [{"product_id": 2}]
+
+
+def test_missing_index_returns_none():
+    runtime = SearchRuntime(loader=lambda: (None, []), embedder_factory=object)
+    assert runtime.snapshot() is None
@@ -51,3 +51,36 @@ def test_search_products_returns_list():
     for item in result:
         assert "product_id" in item or "name" in item
         assert "score" in item
+
+
+def _random_meta(n: int, seed: int = 0) -> list[dict]:
+    import random
+    rnd = random.Random(seed)
+    return [
+        {
+            "product_id": i + 1,
+            "price": rnd.choice([None, 0, rnd.randint(1, 1_000_000)]),
+            "quantity": rnd.choice([None, 0, rnd.randint(1, 50)]),
+            "category_id": rnd.choice([None, *range(1, 20)]),
+            "brand_id": rnd.choice([None, *range(1, 10)]),
+            "name": f"Товар {i}",
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"price_min": 100_000, "price_max": 600_000},
+    {"category_ids": [1, 2, 3, 7]},
+    {"category_id": 5, "in_stock_only": True},
+    {"brand_id": 3, "price_max": 500_000},
+])
+def test_apply_filters_columnar_matches_dicts(filters):
+    from retrieval.meta_columns import MetaColumns
+
+    meta = _random_meta(500)
+    columns = MetaColumns.from_meta(meta)
+    indices = list(range(-2, 510, 3))
+    scores = [1.0 - i / 1000 for i in range(len(indices))]
+    assert apply_filters(columns, indices, scores, **filters) == apply_filters(meta, indices, scores, **filters)
@@ -0,0 +1,77 @@
+"""
+Тесты прогрева: фазы по очереди, готовность только после пробных запросов.
+"""
+import sys
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+if str(root) not in sys.path:
+    sys.path.insert(0, str(root))
+
+import pytest
+
+from benchmarks.synthetic import HashingEmbedder
+from data_access import categories_loader
+from index.faiss_store import NumpyIndex
+from retrieval.runtime import SearchRuntime, get_runtime, set_runtime
+from retrieval.warmup import WarmUpState, retry_warm_up, warm_up
+
+
+@pytest.fixture
+def no_categories(monkeypatch):
+    monkeypatch.setattr(categories_loader, "_snapshot", categories_loader.CategorySnapshot.build([]))
+    yield
+    set_runtime(None)
+
+
+def test_warm_up_runs_search_before_ready(no_categories):
+    embedder = HashingEmbedder(dim=16)
+    meta = [{"product_id": i, "name": f"витрина {i}", "price": 1.0, "quantity": 1, "category_id": 1,
+             "brand_id": 1, "slug": "", "image_url": ""} for i in range(20)]
+    vectors = embedder.embed([m["name"] for m in meta])
+    embedded = []
+    original = embedder.embed
+    embedder.embed = lambda texts: embedded.append(list(texts)) or original(texts)
+    set_runtime(SearchRuntime(
+        loader=lambda: (NumpyIndex(vectors), meta), embedder_factory=lambda: embedder,
+        partitions_loader=lambda: None, lexical_loader=lambda: None,
+    ))
+    state = WarmUpState()
+    assert not state.ready
+    assert warm_up(state)
+    stats = state.stats()
+    assert stats["ready"] and all(p["status"] == "done" for p in stats["phases"].values())
+    assert embedded  # пробный батч прошёл через модель
+
+
+def test_not_ready_without_index(no_categories):
+    set_runtime(SearchRuntime(loader=lambda: (None, []), embedder_factory=HashingEmbedder))
+    state = WarmUpState()
+    assert not warm_up(state)
+    stats = state.stats()
+    assert not stats["ready"]
+    assert stats["phases"]["index"]["status"] == "failed"
+    assert stats["phases"]["model"]["status"] == "pending"
+
+
+def test_failed_warm_up_is_retried_once_index_is_loaded(no_categories, monkeypatch):
+    import retrieval.search as search_module
+    embedder = HashingEmbedder(dim=16)
+    meta = [{"product_id": i, "name": f"витрина {i}", "price": 1.0, "quantity": 1, "category_id": 1,
+             "brand_id": 1, "slug": "", "image_url": ""} for i in range(20)]
+    vectors = embedder.embed([m["name"] for m in meta])
+    loaded = {"index": False}
+    set_runtime(SearchRuntime(
+        loader=lambda: (NumpyIndex(vectors), meta) if loaded["index"] else (None, []),
+        embedder_factory=lambda: embedder, partitions_loader=lambda: None, lexical_loader=lambda: None,
+    ))
+    # Прогрев не должен идти через кэш векторов запросов (пробные фразы не оседают на диске)
+    monkeypatch.setattr(search_module.SearchSession, "open", None)
+    state = WarmUpState()
+    assert not warm_up(state)
+    assert not retry_warm_up(state)  # индекса всё ещё нет — повторять нечего
+
+    loaded["index"] = True
+    get_runtime().reload()  # IndexWatcher загрузил новую версию
+    assert retry_warm_up(state)
+    assert state.ready